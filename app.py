@@ -2,45 +2,178 @@ import os
 import time
 import asyncio
 import logging
-import math
+import json
+import hmac
 import uuid
-from typing import Dict, List, Optional
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
 from fastapi import FastAPI, Request, Response
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
 from google.adk.sessions.in_memory_session_service import InMemorySessionService
 from google.genai import types
 from dotenv import load_dotenv
 
-from my_agent.secret_manager import load_secret_into_env
+from my_agent.secret_manager import get_rotation_watcher, load_secrets_into_env
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Per-phase cold start timings, reported by `python -m my_agent.startup_profile`.
+startup_timings: Dict[str, float] = {}
+
 # Populate sensitive environment variables from Google Secret Manager when
 # available. This allows deployments to provide secret IDs instead of raw
 # values. Missing secrets silently fall back to any already-set environment
-# variables to keep local development simple.
-for env_var, secret_env in (
-    ("GOOGLE_API_KEY", "GOOGLE_API_KEY_SECRET_ID"),
-    ("TELEGRAM_BOT_TOKEN", "TELEGRAM_BOT_TOKEN_SECRET_ID"),
-):
-    load_secret_into_env(env_var, secret_env)
+# variables to keep local development simple. Secrets are fetched
+# concurrently and the time spent is logged as part of cold start.
+secret_hydration = load_secrets_into_env(
+    {
+        "GOOGLE_API_KEY": "GOOGLE_API_KEY_SECRET_ID",
+        "TELEGRAM_BOT_TOKEN": "TELEGRAM_BOT_TOKEN_SECRET_ID",
+    },
+    logger=logger,
+    watch=True,
+)
+startup_timings["secret_hydration_ms"] = secret_hydration["elapsed_ms"]
 
 from my_agent.agent import agent
+from my_agent.devops_agent import devops_agent
+from my_agent.devops_tools import warm_devops_clients
+from my_agent.env_util import env_number
 from my_agent.session_monitor import session_monitor
+from my_agent.search_cache import search_cache
+from my_agent.lazy_import import preload_all
+from my_agent.loop_watchdog import loop_watchdog
+from my_agent.model_backend import model_name, refresh_model_clients
+from my_agent.sampling_profiler import MODES as PROFILE_MODES, SamplingProfiler, profile_lock
+from my_agent.static_assets import PrecompressedStaticFiles
+from my_agent.stats_util import percentile
+from my_agent.token_usage import usage_ledger
+from my_agent.tool_metrics import tool_metrics
+from my_agent import token_usage, tracing
+from my_agent.stats_broadcaster import StatsBroadcaster
+from my_agent.vertex_tools import drop_credentialed_backends, get_search_metrics, warm_search_backend
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Warm-up progress; /health reports ready only once status is "ready".
+warmup_state = {
+    "status": "pending",
+    "duration_ms": None,
+    "steps": {},
+    "errors": {},
+}
+
+
+async def _warm_model_clients() -> None:
+    """Create each agent's model client on this event loop, optionally priming it."""
+    prime = os.getenv("WARMUP_PRIME_MODEL", "false").lower() == "true"
+    for llm_agent in (agent, devops_agent):
+        llm = llm_agent.canonical_model
+        client = getattr(llm, "api_client", None)
+        if client is not None and prime:
+            # A one-token call completes the TLS/HTTP setup the first real
+            # request would otherwise pay for.
+            await client.aio.models.generate_content(
+                model=llm.model,
+                contents="ping",
+                config=types.GenerateContentConfig(max_output_tokens=1),
+            )
+
+
+async def warm_up() -> None:
+    """Pre-create model and tool clients, then mark the instance ready.
+
+    Step failures are recorded and logged but do not block readiness; the
+    affected client is simply created on first use instead.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    warmup_state["status"] = "warming"
+
+    async def step(name, func, blocking=True):
+        step_start = time.perf_counter()
+        try:
+            if blocking:
+                await loop.run_in_executor(None, func)
+            else:
+                await func()
+        except Exception as exc:
+            warmup_state["errors"][name] = str(exc)
+            logger.warning("Warm-up step %s failed: %s", name, exc)
+        finally:
+            warmup_state["steps"][name] = round((time.perf_counter() - step_start) * 1000, 2)
+
+    if os.getenv("PRELOAD_TOOL_SDKS", "true").lower() == "true":
+        await step("tool_sdks", preload_all)
+    await asyncio.gather(
+        step("model_clients", _warm_model_clients, blocking=False),
+        step("search_backend", warm_search_backend),
+        step("devops_clients", warm_devops_clients),
+    )
+    warmup_state["duration_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    warmup_state["status"] = "ready"
+    logger.info("warmup_complete", extra={"duration_ms": warmup_state["duration_ms"], "steps": warmup_state["steps"]})
+
+
+async def _warm_up_with_timeout() -> None:
+    timeout = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30"))
+    try:
+        await asyncio.wait_for(warm_up(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Warm-up exceeded %.0fs; serving traffic anyway", timeout)
+        warmup_state["errors"]["timeout"] = f"exceeded {timeout}s"
+        warmup_state["status"] = "ready"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm-up runs once the server is accepting connections so startup is not
+    # delayed; /health returns 503 until it finishes so load balancers keep
+    # traffic away from cold instances.
+    warm_task = None
+    if (
+        os.getenv("ADK_TEST_MODE", "").lower() == "true"
+        or os.getenv("WARMUP_ENABLED", "true").lower() != "true"
+    ):
+        warmup_state["status"] = "ready"
+    else:
+        warm_task = asyncio.create_task(_warm_up_with_timeout())
+    if os.getenv("TELEGRAM_WEBHOOK_INPROCESS", "false").lower() == "true":
+        await start_telegram_inprocess()
+    tracing.tracer.configure_from_env()
+    if os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() == "true":
+        loop_watchdog.start()
+    rotation_watcher = get_rotation_watcher()
+    if rotation_watcher is not None:
+        loop = asyncio.get_running_loop()
+
+        def on_rotation(env_var: str, value: str) -> None:
+            # Called from the watcher thread; rebuild clients on the loop.
+            loop.call_soon_threadsafe(apply_secret_rotation, env_var)
+
+        rotation_watcher.add_listener(on_rotation)
+    yield
+    if rotation_watcher is not None:
+        rotation_watcher.remove_listener(on_rotation)
+    await loop_watchdog.stop()
+    if warm_task and not warm_task.done():
+        warm_task.cancel()
+    await stop_telegram_inprocess()
+    if tracing.tracer.exporter is not None:
+        await asyncio.get_running_loop().run_in_executor(None, tracing.tracer.exporter.flush)
 
 # Initialize FastAPI app
-app = FastAPI(title="ADK Agent with Monitoring")
+app = FastAPI(title="ADK Agent with Monitoring", lifespan=lifespan)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -58,48 +191,108 @@ stats = {
     "request_count": 0,
     "error_count": 0,
     "latencies": [],
-    "tool_calls_total": 0,
-    "tool_calls_by_name": {}
 }
 
-# Mount static files for dashboard
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount static files for dashboard. A `python -m my_agent.static_assets build`
+# output is served precompressed with long-lived caching; without one this
+# behaves like a plain StaticFiles mount.
+static_files = PrecompressedStaticFiles(
+    directory="static", build_dir=os.getenv("STATIC_BUILD_DIR", ".static_build")
+)
+app.mount("/static", static_files, name="static")
 
 @app.get("/")
-async def root():
-    return FileResponse("static/index.html")
+async def root(request: Request):
+    return static_files.response_for("index.html", request.headers) or FileResponse("static/index.html")
 
-@app.get("/health")
-async def health_check():
-    uptime = time.time() - stats["start_time"]
+def build_health() -> dict:
+    ready = warmup_state["status"] == "ready"
     return {
-        "status": "healthy",
-        "uptime_seconds": uptime,
-        "timestamp": time.time()
+        "status": "healthy" if ready else "warming_up",
+        "ready": ready,
+        "uptime_seconds": time.time() - stats["start_time"],
+        "timestamp": time.time(),
+        "warmup": warmup_state,
     }
 
-@app.get("/stats")
-async def get_stats():
+
+@app.get("/health")
+async def health_check():
+    health = build_health()
+    if not health["ready"]:
+        return JSONResponse(status_code=503, content=health)
+    return health
+
+
+def build_stats() -> dict:
     uptime = time.time() - stats["start_time"]
     latencies = stats.get("latencies", [])
     latency_avg = sum(latencies) / len(latencies) if latencies else 0.0
-    latency_p95 = 0.0
-    if latencies:
-        sorted_lats = sorted(latencies)
-        idx = min(len(sorted_lats) - 1, math.ceil(0.95 * len(sorted_lats)) - 1)
-        latency_p95 = sorted_lats[idx]
+    latency_p95 = percentile(latencies, 0.95) if latencies else 0.0
     return {
         "request_count": stats["request_count"],
         "error_count": stats["error_count"],
         "uptime_seconds": uptime,
         "agent_name": agent.name,
-        "model": str(agent.model),
+        "model": model_name(agent.model),
         "latency_avg_ms": round(latency_avg * 1000, 2),
         "latency_p95_ms": round(latency_p95 * 1000, 2),
-        "tool_calls_total": stats.get("tool_calls_total", 0),
-        "tool_calls_by_name": stats.get("tool_calls_by_name", {}),
+        "tool_calls_total": tool_metrics.calls_total,
+        "tool_calls_by_name": tool_metrics.calls_by_name(),
+        "tools": tool_metrics.get_stats(),
+        "token_usage": usage_ledger.get_stats(),
+        "event_loop": loop_watchdog.get_stats(),
+        "knowledge_base_search": get_search_metrics(),
+        "knowledge_base_cache": search_cache.get_stats(),
+        "telegram": _telegram_stats(),
     }
 
+
+@app.get("/stats")
+async def get_stats():
+    return build_stats()
+
+
+def _dashboard_snapshot() -> dict:
+    health = build_health()
+    snapshot = build_stats()
+    snapshot["status"] = health["status"]
+    snapshot["ready"] = health["ready"]
+    # Whole seconds, so idle ticks only change one small field.
+    snapshot["uptime_seconds"] = int(snapshot["uptime_seconds"])
+    return snapshot
+
+
+stats_broadcaster = StatsBroadcaster(
+    _dashboard_snapshot, interval=float(os.getenv("STATS_STREAM_INTERVAL_SECONDS", "2"))
+)
+STATS_STREAM_KEEPALIVE_SECONDS = 15
+
+
+@app.get("/api/stats/stream")
+async def stats_stream():
+    """Server-Sent Events: a ``snapshot`` event, then ``delta`` events with changed fields.
+
+    All connections share one snapshot per interval, so dashboards add no
+    per-tab stats work.
+    """
+    async def events():
+        queue = stats_broadcaster.subscribe()
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=STATS_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            stats_broadcaster.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Middleware to count requests
 @app.middleware("http")
 async def count_requests(request: Request, call_next):
@@ -108,7 +301,9 @@ async def count_requests(request: Request, call_next):
     
     try:
         response = await call_next(request)
-        if response.status_code >= 500:
+        # A 503 from /health only means warm-up is still running.
+        warming = request.url.path == "/health" and response.status_code == 503
+        if response.status_code >= 500 and not warming:
             stats["error_count"] += 1
         return response
     except Exception as e:
@@ -117,31 +312,90 @@ async def count_requests(request: Request, call_next):
 
 # --- ADK Runner Setup ---
 
+_runner_start = time.perf_counter()
 session_service = InMemorySessionService()
 runner = Runner(
     app_name="adk_agent_app",
     agent=agent,
     session_service=session_service
 )
+startup_timings["runner_init_ms"] = round((time.perf_counter() - _runner_start) * 1000, 2)
 
 # --- Chat Implementation ---
 
 class ChatRequest(BaseModel):
     message: str
     session_id: str
+    user_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     response: str
 
-@app.post("/api/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, response: Response):
+@dataclass
+class ChatResult:
+    text: str
+    trace_id: str
+    duration_ms: float
+    error: bool = False
+    model_calls: int = 0
+
+
+ERROR_REPLY = "I'm sorry, I encountered an error processing your request."
+BUDGET_REPLY = (
+    "This conversation has used up its token budget. Please start a new session to continue."
+)
+
+
+async def compact_session(session_id: str, user_id: str) -> None:
+    """Drop a session's conversation history, keeping its state, and restart its budget."""
+    session = await session_service.get_session(
+        app_name="adk_agent_app", user_id=user_id, session_id=session_id
+    )
+    if session is not None:
+        await session_service.delete_session(
+            app_name="adk_agent_app", user_id=user_id, session_id=session_id
+        )
+        await session_service.create_session(
+            app_name="adk_agent_app", user_id=user_id, session_id=session_id, state=dict(session.state)
+        )
+    session_monitor.reset_budget(session_id)
+    session_monitor.log_event(
+        session_id=session_id,
+        user_id=user_id,
+        agent_name=agent.name,
+        event_type="compacted",
+        detail="History dropped after reaching the session token budget",
+    )
+
+
+async def run_chat(
+    user_message: str,
+    session_id: str,
+    user_id: Optional[str] = None,
+    on_text: Optional[Callable[[str], None]] = None,
+) -> ChatResult:
+    """Run one user turn through the agent and return its reply.
+
+    Shared by ``/api/chat`` and the in-process Telegram webhook, so both
+    transports get the same session handling, monitoring and stats. With
+    ``on_text`` the model is run in streaming mode and each piece of reply
+    text is passed to it as soon as it arrives; the returned text is the same
+    either way. ``user_id`` keys usage accounting; callers that do not know
+    the user share ``"default_user"``.
+    """
+    user_id = user_id or "default_user"
     stats["request_count"] += 1
-    session_id = request.session_id
-    user_id = "default_user"
-    user_message = request.message
     trace_id = str(uuid.uuid4())
     start_time = time.time()
-    response.headers["X-Trace-Id"] = trace_id
+
+    def result(text: str, error: bool = False, model_calls: int = 0) -> ChatResult:
+        return ChatResult(
+            text=text,
+            trace_id=trace_id,
+            duration_ms=(time.time() - start_time) * 1000,
+            error=error,
+            model_calls=model_calls,
+        )
 
     # Monitor session creation/message
     session_monitor.log_event(
@@ -165,8 +419,35 @@ async def chat_endpoint(request: ChatRequest, response: Response):
 
     # In test mode, short-circuit to avoid real model calls
     if os.getenv("ADK_TEST_MODE", "").lower() == "true":
-        return ChatResponse(response=f"[test-mode] {user_message or ''}")
-    
+        if on_text:
+            on_text(f"[test-mode] {user_message or ''}")
+        return result(f"[test-mode] {user_message or ''}")
+
+    budget = env_number("SESSION_TOKEN_BUDGET", 0, int)
+    if session_monitor.over_budget(session_id, budget):
+        if os.getenv("SESSION_BUDGET_ACTION", "reject").lower() == "compact":
+            await compact_session(session_id, user_id)
+        else:
+            session_monitor.log_event(
+                session_id=session_id,
+                user_id=user_id,
+                agent_name=agent.name,
+                event_type="budget_exceeded",
+                detail=f"Session token budget of {budget} reached",
+            )
+            if on_text:
+                on_text(BUDGET_REPLY)
+            return result(BUDGET_REPLY)
+
+    # Model calls and tools (including the nested devops run) become child
+    # spans of this one through the agents' tracing callbacks.
+    chat_span = tracing.tracer.start_span(
+        "chat", trace_id=trace_id, session_id=session_id, user_id=user_id, agent=agent.name
+    )
+    span_token = tracing.current_span.set(chat_span)
+    # Collects usage from this turn's events, including delegated devops runs.
+    turn_usage = token_usage.TurnUsage()
+    usage_token = token_usage.current_turn.set(turn_usage)
     try:
         # Ensure session exists
         session = await session_service.get_session(
@@ -183,40 +464,50 @@ async def chat_endpoint(request: ChatRequest, response: Response):
 
         # Run the agent
         response_text = ""
+        streamed = False
+        turn_tool_calls = 0
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE) if on_text else None
         async for event in runner.run_async(
             user_id=user_id,
             session_id=session_id,
             new_message=types.Content(
                 role="user",
                 parts=[types.Part(text=user_message)]
-            )
+            ),
+            run_config=run_config,
         ):
-            tool_name = None
-            tool_attr = getattr(event, "tool", None)
-            if tool_attr:
-                tool_name = getattr(tool_attr, "name", None) or str(tool_attr)
-            tool_call = getattr(event, "tool_call", None)
-            if not tool_name and tool_call:
-                tool_name = getattr(tool_call, "name", None)
-            if tool_name:
-                stats["tool_calls_total"] += 1
-                stats["tool_calls_by_name"][tool_name] = stats["tool_calls_by_name"].get(tool_name, 0) + 1
+            token_usage.record_event(event)
+            # Tool counts and timings come from the instrumented tools
+            # (my_agent.tool_metrics); this only logs what the model asked for.
+            for call in event.get_function_calls():
+                turn_tool_calls += 1
                 logger.info(
                     "tool_call",
                     extra={
                         "trace_id": trace_id,
                         "session_id": session_id,
                         "user_id": user_id,
-                        "tool": tool_name,
+                        "tool": call.name,
                     },
                 )
 
             # Collect model response text
             # We look for events authored by the agent (or 'model') that have content
             if event.content and event.content.parts:
-                for part in event.content.parts:
-                    if part.text:
-                        response_text += part.text
+                text = "".join(part.text for part in event.content.parts if part.text)
+                if text:
+                    chat_span.mark("first_token")
+                if event.partial:
+                    # Streaming chunks; the final event repeats them in full.
+                    if text:
+                        on_text(text)
+                        streamed = True
+                    continue
+                response_text += text
+                if on_text and text and not streamed:
+                    on_text(text)
+            if not event.partial:
+                streamed = False
         latency = time.time() - start_time
         stats["latencies"].append(latency)
         if len(stats["latencies"]) > 200:
@@ -235,12 +526,14 @@ async def chat_endpoint(request: ChatRequest, response: Response):
                 "session_id": session_id,
                 "user_id": user_id,
                 "latency_ms": round(latency * 1000, 2),
-                "tool_calls": stats.get("tool_calls_total", 0),
+                "tool_calls": turn_tool_calls,
+                "prompt_tokens": turn_usage.prompt_tokens,
+                "completion_tokens": turn_usage.completion_tokens,
             },
         )
         # Drain alerts so they don't accumulate, but keep user response clean
         session_monitor.pop_alerts(session_id)
-        return ChatResponse(response=response_text)
+        return result(response_text, model_calls=turn_usage.model_calls)
         
     except Exception as e:
         # Log detailed error information with stack trace
@@ -263,4 +556,251 @@ async def chat_endpoint(request: ChatRequest, response: Response):
                 "error": str(e),
             },
         )
-        return ChatResponse(response="I'm sorry, I encountered an error processing your request.")
+        chat_span.set(error=type(e).__name__)
+        chat_span.end("error")
+        return result(ERROR_REPLY, error=True, model_calls=turn_usage.model_calls)
+    finally:
+        token_usage.current_turn.reset(usage_token)
+        if turn_usage.model_calls:
+            # Failed turns still spent their tokens.
+            usage_ledger.record_turn(user_id, turn_usage)
+            session_monitor.record_usage(
+                session_id,
+                user_id,
+                agent.name,
+                turn_usage.prompt_tokens,
+                turn_usage.completion_tokens,
+                turn_usage.model_calls,
+            )
+            chat_span.set(
+                prompt_tokens=turn_usage.prompt_tokens, completion_tokens=turn_usage.completion_tokens
+            )
+        tracing.current_span.reset(span_token)
+        chat_span.end()
+
+
+@app.post("/api/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, response: Response):
+    result = await run_chat(request.message, request.session_id, user_id=request.user_id)
+    response.headers["X-Trace-Id"] = result.trace_id
+    # Lets clients separate server processing time from network/connect time.
+    response.headers["Server-Timing"] = f"app;dur={result.duration_ms:.2f}"
+    response.headers["X-Model-Calls"] = str(result.model_calls)
+    if result.error:
+        # The reply is still a 200 with apology text; this lets clients and
+        # the load test tell it apart from a real answer.
+        response.headers["X-Chat-Error"] = "true"
+    return ChatResponse(response=result.text)
+
+
+@app.post("/api/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """Stream the reply as NDJSON: ``{"delta": ...}`` lines, then a final
+    ``{"done": true, "response": ..., "trace_id": ..., "duration_ms": ..., "error": ...,
+    "model_calls": ...}``."""
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> ChatResult:
+        try:
+            return await run_chat(
+                request.message, request.session_id, user_id=request.user_id, on_text=queue.put_nowait
+            )
+        finally:
+            queue.put_nowait(None)
+
+    task = asyncio.create_task(produce())
+
+    async def body():
+        try:
+            while (delta := await queue.get()) is not None:
+                yield json.dumps({"delta": delta}) + "\n"
+            result = await task
+            yield json.dumps({
+                "done": True,
+                "response": result.text,
+                "trace_id": result.trace_id,
+                "duration_ms": round(result.duration_ms, 2),
+                "error": result.error,
+                "model_calls": result.model_calls,
+            }) + "\n"
+        finally:
+            # Client went away mid-stream: stop the turn instead of finishing it unseen.
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+# --- Debug endpoints ---
+# Off unless DEBUG_ENDPOINTS_ENABLED=true, and even then callers must send
+# DEBUG_TOKEN in X-Debug-Token; without a configured token they stay closed.
+
+def _debug_denied(request: Request) -> Optional[JSONResponse]:
+    if os.getenv("DEBUG_ENDPOINTS_ENABLED", "false").lower() != "true":
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    token = os.getenv("DEBUG_TOKEN", "")
+    if not token:
+        return JSONResponse(status_code=403, content={"detail": "DEBUG_TOKEN is not configured"})
+    if not hmac.compare_digest(request.headers.get("X-Debug-Token", "").encode(), token.encode()):
+        return JSONResponse(status_code=403, content={"detail": "Invalid debug token"})
+    return None
+
+
+@app.get("/debug/traces")
+async def list_traces(request: Request, limit: int = 20):
+    if (denied := _debug_denied(request)) is not None:
+        return denied
+    return {"traces": tracing.tracer.recent(limit), "tracer": tracing.tracer.get_stats()}
+
+
+@app.get("/debug/traces/{trace_id}")
+async def get_trace(request: Request, trace_id: str, format: str = "html"):
+    """Spans of one chat turn: an HTML waterfall, or JSON with ``format=json``."""
+    if (denied := _debug_denied(request)) is not None:
+        return denied
+    spans = tracing.tracer.get_trace(trace_id)
+    if spans is None:
+        return JSONResponse(status_code=404, content={"detail": "Unknown or expired trace"})
+    if format == "json":
+        return {"trace_id": trace_id, "spans": spans}
+    return HTMLResponse(tracing.render_waterfall(trace_id, spans))
+
+
+@app.get("/debug/profile")
+async def debug_profile(
+    request: Request,
+    seconds: float = 5.0,
+    mode: str = "wall",
+    hz: Optional[float] = None,
+    format: str = "collapsed",
+):
+    """Sample this process for ``seconds`` and return collapsed stacks.
+
+    ``mode`` is ``cpu``, ``wall`` or ``asyncio`` (coroutine chains of the
+    event loop's tasks); ``format=json`` returns the top stacks with the
+    sampling stats instead.
+    """
+    if (denied := _debug_denied(request)) is not None:
+        return denied
+    if mode not in PROFILE_MODES:
+        return JSONResponse(status_code=400, content={"detail": f"mode must be one of {', '.join(PROFILE_MODES)}"})
+    seconds = min(max(seconds, 0.1), float(os.getenv("PROFILE_MAX_SECONDS", "60")))
+    if not profile_lock.acquire(blocking=False):
+        return JSONResponse(status_code=409, content={"detail": "A profile is already running"})
+    try:
+        profiler = SamplingProfiler.from_env()
+        if hz:
+            profiler.hz = min(max(hz, 1.0), 1000.0)
+        loop = asyncio.get_running_loop()
+        # Samples from an executor thread so the loop keeps serving (and is
+        # what gets sampled).
+        result = await loop.run_in_executor(
+            None, profiler.run, seconds, mode, loop, asyncio.current_task()
+        )
+    finally:
+        profile_lock.release()
+    headers = {
+        "X-Profile-Samples": str(result.samples),
+        "X-Profile-Effective-Hz": str(result.effective_hz),
+        "X-Profile-Overhead-Pct": str(result.overhead_pct),
+    }
+    if format == "json":
+        return JSONResponse(result.to_dict(), headers=headers)
+    return PlainTextResponse(result.collapsed(), headers=headers)
+
+
+# --- In-process Telegram webhook ---
+# With TELEGRAM_WEBHOOK_INPROCESS=true the bot runs inside this app: Telegram
+# posts updates here and /chat goes straight to run_chat instead of through a
+# separate bridge service and a second HTTP hop.
+
+TELEGRAM_WEBHOOK_PATH = os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram/webhook")
+telegram_state = {"application": None}
+
+
+async def start_telegram_inprocess() -> None:
+    # Imported here so the API does not load python-telegram-bot unless needed.
+    from my_agent.telegram_bot import InProcessAgentTransport, build_application, read_token
+
+    application = build_application(
+        read_token(), transport=InProcessAgentTransport(run_chat), with_updater=False
+    )
+    await application.initialize()
+    await application.start()
+    webhook_url = os.getenv("TELEGRAM_WEBHOOK_URL")
+    if webhook_url:
+        await application.bot.set_webhook(
+            webhook_url, secret_token=os.getenv("TELEGRAM_WEBHOOK_SECRET") or None
+        )
+    telegram_state["application"] = application
+    logger.info("Telegram webhook mounted in-process at %s", TELEGRAM_WEBHOOK_PATH)
+
+
+def _telegram_stats() -> Optional[dict]:
+    application = telegram_state["application"]
+    processor = getattr(application, "update_processor", None)
+    if processor is None or not hasattr(processor, "get_stats"):
+        return None
+    limiter = getattr(application.bot, "rate_limiter", None)
+    coalescer = application.bot_data.get("coalescer")
+    ingress = application.bot_data.get("ingress")
+    return {
+        "webhook": ingress.get_stats() if ingress is not None else None,
+        "updates": processor.get_stats(),
+        "rate_limiter": limiter.get_stats() if hasattr(limiter, "get_stats") else None,
+        "coalescer": coalescer.get_stats() if coalescer is not None else None,
+    }
+
+
+async def stop_telegram_inprocess() -> None:
+    application = telegram_state["application"]
+    if application is None:
+        return
+    telegram_state["application"] = None
+    coalescer = application.bot_data.get("coalescer")
+    if coalescer is not None:
+        await coalescer.drain()
+    await application.stop()
+    await application.shutdown()
+
+
+async def restart_telegram_inprocess() -> None:
+    await stop_telegram_inprocess()
+    await start_telegram_inprocess()
+
+
+# --- Secret rotation ---
+# The rotation watcher only rewrites os.environ. Clients built from the old
+# value are rebuilt here so a rotation needs no restart.
+
+def apply_secret_rotation(env_var: str) -> None:
+    if env_var == "GOOGLE_API_KEY":
+        refresh_model_clients((agent, devops_agent))
+        drop_credentialed_backends()
+        logger.info("Rebuilt model and search clients after %s rotated", env_var)
+    elif env_var == "TELEGRAM_BOT_TOKEN" and telegram_state["application"] is not None:
+        # The token is baked into the Bot; restart the application with it.
+        telegram_state["restart"] = asyncio.create_task(restart_telegram_inprocess())
+        logger.info("Restarting the in-process Telegram bot after %s rotated", env_var)
+
+
+@app.post(TELEGRAM_WEBHOOK_PATH)
+async def telegram_webhook(request: Request):
+    application = telegram_state["application"]
+    if application is None:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    secret = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+    if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+        return JSONResponse(status_code=403, content={"detail": "Invalid secret token"})
+
+    from telegram import Update
+
+    update = Update.de_json(await request.json(), application.bot)
+    ingress = application.bot_data.get("ingress")
+    if ingress is not None and not ingress.accept(update):
+        # Telegram retried a delivery we already queued; ack and drop it.
+        return {"ok": True, "duplicate": True}
+    # Ack right away; the application's worker pool handles the update. A
+    # slow agent turn would otherwise make Telegram time out and redeliver.
+    await application.update_queue.put(update)
+    return {"ok": True}
@@ -74,6 +74,8 @@ from google.adk.sessions.in_memory_session_service import InMemorySessionService
 from google.genai import types
 from my_agent.devops_agent import devops_agent
 from my_agent.session_monitor import session_monitor
+from my_agent.token_usage import record_event
+from my_agent.tracing import AGENT_CALLBACKS, span
 
 # Reuse one session service/runner so delegated calls can retain history per session_id
 _devops_session_service = InMemorySessionService()
@@ -116,6 +118,8 @@ async def ask_devops(
             session_id=session,
             new_message=types.Content(role="user", parts=[types.Part(text=request)]),
         ):
+            # Counts toward the calling chat turn's token usage.
+            record_event(event)
             if event.content and event.content.parts:
                 for part in event.content.parts:
                     if part.text:
@@ -123,7 +127,10 @@ async def ask_devops(
         return response_text
 
     try:
-        return await asyncio.wait_for(_run(), timeout=timeout_seconds)
+        # The nested runner inherits this span, so its model and tool spans
+        # land in the caller's trace.
+        with span("devops_delegation", agent="devops_agent", session_id=session):
+            return await asyncio.wait_for(_run(), timeout=timeout_seconds)
     except asyncio.TimeoutError:
         return "DevOps agent timed out while processing the request."
     except Exception as exc:  # pragma: no cover - defensive
@@ -141,14 +148,16 @@ def get_session_details(session_id: str) -> dict:
     return {"status": "success", "report": session_monitor.get_details(session_id)}
 
 from google.adk.models.google_llm import GoogleLLMVariant
-from my_agent.vertex_tools import search_knowledge_base
+from my_agent.model_backend import resolve_model
+from my_agent.tool_metrics import instrument_tools
+from my_agent.vertex_tools import search_knowledge_base, search_knowledge_base_many
 
 # Create the ADK Agent
 # Note: Vertex AI backend is configured via GOOGLE_APPLICATION_CREDENTIALS
 # and GCP_PROJECT_ID/GCP_LOCATION environment variables
 agent = Agent(
     name="gemini_adk_agent",
-    model="gemini-2.0-flash-exp",
+    model=resolve_model("gemini_adk_agent", "gemini-2.0-flash-exp"),
     description=(
         "A helpful agent that can answer questions, check weather/time, and search the knowledge base. "
         "It can also delegate DevOps tasks to a specialized DevOps agent."
@@ -158,16 +167,19 @@ agent = Agent(
         "You can answer general questions and use your tools to provide specific information "
         "about weather and time when asked. "
         "Use 'search_knowledge_base' if the user asks for information that might be in the docs. "
+        "If you want to try several phrasings, call 'search_knowledge_base_many' once with all of them. "
         "If the user asks for DevOps tasks like creating Pub/Sub topics or writing logs, "
         "use the 'ask_devops' tool to delegate the request. "
         "Always be polite and concise."
     ),
-    tools=[
+    tools=instrument_tools("gemini_adk_agent", [
         get_weather,
         get_current_time,
         ask_devops,
         search_knowledge_base,
+        search_knowledge_base_many,
         get_session_summary,
         get_session_details,
-    ],
+    ]),
+    **AGENT_CALLBACKS,
 )
@@ -0,0 +1,456 @@
+"""Dense embedding index for semantic knowledge base search.
+
+Chunks (see :func:`my_agent.local_index.iter_chunks`) are embedded and stored
+as an L2-normalised ``embeddings.npy`` matrix (float16 or float32) that is
+memory-mapped at load. Queries are embedded the same way and ranked by cosine
+similarity using one matrix multiply per block plus ``argpartition``.
+
+For large corpora an optional IVF coarse quantizer groups rows by spherical
+k-means centroid; rows are stored in cluster order so probing a cluster reads
+one contiguous slice of the matrix.
+
+Files written to the index directory:
+
+- ``dense_meta.json``: dimension, dtype, embedder name and IVF settings
+- ``embeddings.npy``: ``(rows, dim)`` normalised embeddings
+- ``docs.json``: chunk title, link and text, same shape as the BM25 index
+- ``row_ids.npy``, ``ivf_centroids.npy``, ``ivf_offsets.npy``: IVF only
+
+Build an index and benchmark queries with::
+
+    python -m my_agent.dense_index build docs/ --out .kb_dense_index --nlist 64
+    python -m my_agent.dense_index bench --sizes 100000,1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Iterable, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+from my_agent.local_index import Chunk, best_snippet, iter_chunks, tokenize
+from my_agent.stats_util import percentile
+
+
+INDEX_VERSION = 1
+DEFAULT_DIM = 256
+SEARCH_BLOCK_ROWS = 65536
+
+
+class Embedder(Protocol):
+    """Anything that maps texts to a ``(len(texts), dim)`` float32 matrix."""
+
+    name: str
+    dim: int
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        ...
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder for offline use and tests.
+
+    Word tokens and in-word character trigrams are hashed into ``dim`` signed
+    buckets, so texts sharing vocabulary or word stems land close together.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+
+    def _features(self, text: str) -> Iterable[Tuple[str, float]]:
+        for token in tokenize(text):
+            yield token, 1.0
+            padded = f"<{token}>"
+            for i in range(len(padded) - 2):
+                yield padded[i : i + 3], 0.5
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                out[row, (value >> 1) % self.dim] += sign * weight
+        return _normalize(out)
+
+
+class GenAIEmbedder:
+    """Embeddings from the Gemini API via ``google.genai``."""
+
+    name = "genai"
+
+    def __init__(self, model: Optional[str] = None, batch_size: int = 100):
+        from google import genai
+
+        self.model = model or os.getenv("KNOWLEDGE_BASE_EMBEDDING_MODEL", "text-embedding-004")
+        self.batch_size = batch_size
+        self._client = genai.Client()
+        self.dim = len(self.embed(["dimension probe"])[0])
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self._client.models.embed_content(
+                model=self.model, contents=texts[start : start + self.batch_size]
+            )
+            rows.extend(e.values for e in response.embeddings)
+        return _normalize(np.asarray(rows, dtype=np.float32))
+
+
+def get_embedder(name: Optional[str] = None, dim: int = DEFAULT_DIM) -> Embedder:
+    """Resolve an embedder by name: ``hashing``, ``genai`` or ``package.module:factory``."""
+    name = name or os.getenv("KNOWLEDGE_BASE_EMBEDDER", "hashing")
+    if name == "hashing":
+        return HashingEmbedder(dim=dim)
+    if name == "genai":
+        return GenAIEmbedder()
+    module_name, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown embedder {name!r}; use hashing, genai or module:factory")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+def _topk(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Row-wise top-k of a ``(queries, rows)`` score matrix, best first."""
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty, empty.astype(np.int64)
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+def _spherical_kmeans(data: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Cluster normalised rows by cosine similarity and return unit centroids."""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(data), max(nlist * 256, 10000))
+    sample = np.asarray(data[rng.choice(len(data), sample_size, replace=False)], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = ~sums.any(axis=1)
+        sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _assign(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assign = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), SEARCH_BLOCK_ROWS):
+        block = np.asarray(data[start : start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+        assign[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def write_matrix_index(
+    embeddings: np.ndarray,
+    out_dir: str,
+    *,
+    dtype: str = "float16",
+    nlist: int = 0,
+    embedder_name: str = "hashing",
+) -> dict:
+    """Persist normalised ``embeddings`` (optionally IVF-ordered) and return metadata.
+
+    ``nlist`` is capped at the number of rows.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    nlist = min(nlist, len(embeddings))
+    if nlist:
+        centroids = _spherical_kmeans(embeddings, nlist)
+        assign = _assign(embeddings, centroids)
+        row_ids = np.argsort(assign, kind="stable")
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assign, minlength=nlist), out=offsets[1:])
+        np.save(os.path.join(out_dir, "ivf_centroids.npy"), centroids.astype(np.float32))
+        np.save(os.path.join(out_dir, "ivf_offsets.npy"), offsets)
+        np.save(os.path.join(out_dir, "row_ids.npy"), row_ids.astype(np.int64))
+    else:
+        row_ids = None
+
+    out = np.lib.format.open_memmap(
+        os.path.join(out_dir, "embeddings.npy"), mode="w+", dtype=dtype, shape=embeddings.shape
+    )
+    for start in range(0, len(embeddings), SEARCH_BLOCK_ROWS):
+        rows = slice(start, start + SEARCH_BLOCK_ROWS)
+        source = embeddings[row_ids[rows]] if row_ids is not None else embeddings[rows]
+        out[rows] = source
+    out.flush()
+    del out
+
+    meta = {
+        "version": INDEX_VERSION,
+        "num_chunks": int(embeddings.shape[0]),
+        "dim": int(embeddings.shape[1]),
+        "dtype": dtype,
+        "embedder": embedder_name,
+        "nlist": nlist,
+    }
+    with open(os.path.join(out_dir, "dense_meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def build_dense_index(
+    chunks: Iterable[Chunk],
+    out_dir: str,
+    embedder: Embedder,
+    *,
+    dtype: str = "float16",
+    nlist: int = 0,
+    batch_size: int = 256,
+) -> dict:
+    """Embed ``chunks`` and write a dense index into ``out_dir``."""
+    docs = [{"title": c.title, "link": c.link, "text": c.text} for c in chunks]
+    embeddings = np.zeros((len(docs), embedder.dim), dtype=np.float32)
+    for start in range(0, len(docs), batch_size):
+        batch = docs[start : start + batch_size]
+        embeddings[start : start + len(batch)] = embedder.embed(
+            [f"{d['title']}\n{d['text']}" for d in batch]
+        )
+    nlist = min(nlist, len(docs))
+    meta = write_matrix_index(embeddings, out_dir, dtype=dtype, nlist=nlist, embedder_name=embedder.name)
+    with open(os.path.join(out_dir, "docs.json"), "w", encoding="utf-8") as f:
+        json.dump(docs, f, ensure_ascii=False, separators=(",", ":"))
+    return meta
+
+
+class DenseMatrix:
+    """Memory-mapped embedding matrix with flat and IVF top-k search."""
+
+    def __init__(self, index_dir: str, nprobe: Optional[int] = None):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "dense_meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported dense index version in {index_dir}: {self.meta.get('version')}")
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        self.nlist = self.meta.get("nlist") or 0
+        self.nprobe = nprobe or int(os.getenv("KNOWLEDGE_BASE_IVF_NPROBE", "8"))
+        if self.nlist:
+            self.centroids = np.load(os.path.join(index_dir, "ivf_centroids.npy"))
+            self.offsets = np.load(os.path.join(index_dir, "ivf_offsets.npy"))
+            self.row_ids = np.load(os.path.join(index_dir, "row_ids.npy"), mmap_mode="r")
+
+    def search_vectors(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(scores, chunk ids)`` of shape ``(len(queries), k)`` for unit queries."""
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.nlist:
+            return self._search_ivf(queries, k)
+        return self._search_flat(queries, k)
+
+    def _search_flat(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.embeddings), SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.embeddings[start : start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores, ids = _topk(queries @ block.T, k)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_ids = np.concatenate([best_ids, ids + start], axis=1)
+            if best_scores.shape[1] > k:
+                best_scores, keep = _topk(best_scores, k)
+                best_ids = np.take_along_axis(best_ids, keep, axis=1)
+        return best_scores, best_ids
+
+    def _search_ivf(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        # The whole batch is scored against the union of the probed clusters
+        # in one product; rows from clusters a query did not probe are masked.
+        nprobe = min(self.nprobe, self.nlist)
+        _, probes = _topk(queries @ self.centroids.T, nprobe)
+        probed = np.zeros((len(queries), self.nlist), dtype=bool)
+        np.put_along_axis(probed, probes, True, axis=1)
+        clusters = np.flatnonzero(probed.any(axis=0))
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        sizes = self.offsets[clusters + 1] - self.offsets[clusters]
+        if not sizes.sum():
+            return all_scores, all_ids
+        rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in clusters])
+        candidates = np.asarray(self.embeddings[rows], dtype=np.float32)
+        scores = queries @ candidates.T
+        scores[~probed[:, np.repeat(clusters, sizes)]] = -np.inf
+        top_scores, idx = _topk(scores, k)
+        ids = np.asarray(self.row_ids[rows[idx].ravel()], dtype=np.int64).reshape(idx.shape)
+        ids[~np.isfinite(top_scores)] = -1
+        n = top_scores.shape[1]
+        all_scores[:, :n] = top_scores
+        all_ids[:, :n] = ids
+        return all_scores, all_ids
+
+
+class DenseIndexBackend:
+    """Semantic search over an index written by :func:`build_dense_index`."""
+
+    def __init__(self, index_dir: str, embedder: Optional[Embedder] = None):
+        self.index_dir = index_dir
+        self.matrix = DenseMatrix(index_dir)
+        meta = self.matrix.meta
+        self.embedder = embedder or get_embedder(
+            os.getenv("KNOWLEDGE_BASE_EMBEDDER") or meta["embedder"], dim=meta["dim"]
+        )
+        if self.embedder.dim != meta["dim"]:
+            raise ValueError(
+                f"Embedder dimension {self.embedder.dim} does not match index dimension {meta['dim']}"
+            )
+        with open(os.path.join(index_dir, "docs.json"), "r", encoding="utf-8") as f:
+            self.docs: List[dict] = json.load(f)
+
+    def close(self) -> None:
+        # np.memmap releases its mapping when the array is garbage collected.
+        self.matrix = None
+
+    def search_many(self, queries: List[str], page_size: int) -> List[List[dict]]:
+        """Embed ``queries`` as one batch and return hits for each."""
+        scores, ids = self.matrix.search_vectors(self.embedder.embed(queries), page_size)
+        out = []
+        for query, row_scores, row_ids in zip(queries, scores, ids):
+            terms = set(tokenize(query))
+            hits = []
+            for score, doc_id in zip(row_scores, row_ids):
+                if doc_id < 0 or not np.isfinite(score):
+                    continue
+                doc = self.docs[doc_id]
+                hits.append(
+                    {
+                        "title": doc["title"],
+                        "snippet": best_snippet(doc["text"], terms),
+                        "link": doc["link"],
+                        "id": str(int(doc_id)),
+                    }
+                )
+            out.append(hits)
+        return out
+
+    def search(self, query: str, page_size: int, timeout: Optional[float] = None) -> List[dict]:
+        """Return the ``page_size`` most similar chunks as ``title``/``snippet``/``link`` dicts."""
+        return self.search_many([query], page_size)[0]
+
+
+def benchmark(
+    sizes: List[int],
+    *,
+    dim: int = DEFAULT_DIM,
+    dtype: str = "float16",
+    k: int = 3,
+    num_queries: int = 64,
+    batch: int = 16,
+    nlist: int = 0,
+    nprobe: int = 8,
+) -> List[dict]:
+    """Time flat (and optionally IVF) search over random unit matrices of each size."""
+    rng = np.random.default_rng(0)
+    reports = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            data = np.lib.format.open_memmap(
+                os.path.join(tmp, "source.npy"), mode="w+", dtype=np.float32, shape=(size, dim)
+            )
+            for start in range(0, size, SEARCH_BLOCK_ROWS):
+                block = rng.standard_normal((min(SEARCH_BLOCK_ROWS, size - start), dim), dtype=np.float32)
+                data[start : start + len(block)] = _normalize(block)
+            queries = _normalize(rng.standard_normal((num_queries, dim), dtype=np.float32))
+
+            variants = [("flat", 0)] + ([("ivf", min(nlist, size))] if nlist else [])
+            for label, variant_nlist in variants:
+                out_dir = os.path.join(tmp, label)
+                start = time.perf_counter()
+                write_matrix_index(data, out_dir, dtype=dtype, nlist=variant_nlist)
+                build_seconds = time.perf_counter() - start
+                matrix = DenseMatrix(out_dir, nprobe=nprobe)
+                matrix.search_vectors(queries[:batch], k)  # fault in the mapping
+                per_query_ms = []
+                for q in range(0, num_queries, batch):
+                    start = time.perf_counter()
+                    matrix.search_vectors(queries[q : q + batch], k)
+                    elapsed = (time.perf_counter() - start) * 1000
+                    per_query_ms.extend([elapsed / len(queries[q : q + batch])] * len(queries[q : q + batch]))
+                reports.append(
+                    {
+                        "chunks": size,
+                        "dim": dim,
+                        "dtype": dtype,
+                        "index": label,
+                        "nlist": variant_nlist,
+                        "nprobe": nprobe if variant_nlist else None,
+                        "batch": batch,
+                        "build_seconds": round(build_seconds, 2),
+                        "mean_ms_per_query": round(statistics.fmean(per_query_ms), 3),
+                        "p95_ms_per_query": round(percentile(per_query_ms, 0.95), 3),
+                    }
+                )
+                del matrix
+            del data
+    return reports
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or benchmark the dense knowledge base index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Embed a directory of Markdown/text docs.")
+    build.add_argument("docs_dir")
+    build.add_argument("--out", default=os.getenv("KNOWLEDGE_BASE_DENSE_INDEX_DIR", ".kb_dense_index"))
+    build.add_argument("--link-prefix", default="")
+    build.add_argument("--embedder", default=None, help="hashing (default), genai or module:factory")
+    build.add_argument("--dim", type=int, default=DEFAULT_DIM, help="Dimension for the hashing embedder.")
+    build.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    build.add_argument("--nlist", type=int, default=0, help="IVF clusters; 0 disables the coarse quantizer.")
+
+    bench = sub.add_parser("bench", help="Measure search latency on synthetic corpora.")
+    bench.add_argument("--sizes", default="100000,1000000")
+    bench.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    bench.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    bench.add_argument("--queries", type=int, default=64)
+    bench.add_argument("--batch", type=int, default=16)
+    bench.add_argument("--nlist", type=int, default=1024, help="IVF clusters to compare against; 0 skips IVF.")
+    bench.add_argument("--nprobe", type=int, default=8)
+
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        start = time.perf_counter()
+        meta = build_dense_index(
+            iter_chunks(args.docs_dir, link_prefix=args.link_prefix),
+            args.out,
+            get_embedder(args.embedder, dim=args.dim),
+            dtype=args.dtype,
+            nlist=args.nlist,
+        )
+        meta["build_seconds"] = round(time.perf_counter() - start, 3)
+        print(json.dumps(meta, indent=2))
+    else:
+        sizes = [int(s) for s in args.sizes.split(",") if s]
+        reports = benchmark(
+            sizes,
+            dim=args.dim,
+            dtype=args.dtype,
+            num_queries=args.queries,
+            batch=args.batch,
+            nlist=args.nlist,
+            nprobe=args.nprobe,
+        )
+        print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
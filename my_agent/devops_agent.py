@@ -1,10 +1,13 @@
 from google.adk.agents import Agent
 from my_agent.devops_tools import create_pubsub_topic, write_log_entry
+from my_agent.model_backend import resolve_model
+from my_agent.tool_metrics import instrument_tools
+from my_agent.tracing import AGENT_CALLBACKS
 
 # Create the DevOps Agent
 devops_agent = Agent(
     name="devops_agent",
-    model="gemini-2.0-flash-exp",
+    model=resolve_model("devops_agent", "gemini-2.0-flash-exp"),
     description=(
         "A specialized agent that handles DevOps tasks on Google Cloud Platform."
     ),
@@ -13,5 +16,6 @@ devops_agent = Agent(
         "Google Cloud Platform resources. You can create Pub/Sub topics and write "
         "logs to Cloud Logging. Always confirm the action you took."
     ),
-    tools=[create_pubsub_topic, write_log_entry],
+    tools=instrument_tools("devops_agent", [create_pubsub_topic, write_log_entry]),
+    **AGENT_CALLBACKS,
 )
@@ -1,7 +1,58 @@
 import os
-from google.api_core import exceptions
-from google.cloud import pubsub_v1
-from google.cloud import logging
+import threading
+from my_agent.lazy_import import lazy_import
+
+# Client SDKs load on first tool call rather than at import time.
+exceptions = lazy_import("google.api_core.exceptions")
+pubsub_v1 = lazy_import("google.cloud.pubsub_v1")
+logging = lazy_import("google.cloud.logging")
+
+# Clients are reused across calls (one per Pub/Sub endpoint) so each tool
+# call does not pay for a new channel and auth handshake.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _pubsub_region():
+    return os.getenv("PUBSUB_REGION") or os.getenv("GCP_LOCATION")
+
+
+def get_publisher(region=None):
+    """Return the shared Pub/Sub publisher for ``region`` (global endpoint if None)."""
+    key = ("pubsub", region)
+    with _clients_lock:
+        if key not in _clients:
+            client_options = None
+            if region:
+                client_options = {"api_endpoint": f"{region}-pubsub.googleapis.com"}
+            _clients[key] = pubsub_v1.PublisherClient(client_options=client_options)
+        return _clients[key]
+
+
+def get_logging_client():
+    """Return the shared Cloud Logging client."""
+    with _clients_lock:
+        if "logging" not in _clients:
+            _clients["logging"] = logging.Client()
+        return _clients["logging"]
+
+
+def reset_clients() -> None:
+    """Drop cached clients (used by tests and after credential changes)."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def warm_devops_clients() -> bool:
+    """Create the Pub/Sub and Logging clients ahead of the first tool call.
+
+    Only runs when ``GCP_PROJECT_ID`` is set, i.e. in a GCP deployment.
+    """
+    if not os.getenv("GCP_PROJECT_ID"):
+        return False
+    get_publisher(_pubsub_region())
+    get_logging_client()
+    return True
 
 def create_pubsub_topic(project_id: str, topic_id: str) -> dict:
     """Creates a Pub/Sub topic in the specified project.
@@ -14,12 +65,7 @@ def create_pubsub_topic(project_id: str, topic_id: str) -> dict:
         dict: status and result or error msg.
     """
     try:
-        region = os.getenv("PUBSUB_REGION") or os.getenv("GCP_LOCATION")
-        client_options = None
-        if region:
-            client_options = {"api_endpoint": f"{region}-pubsub.googleapis.com"}
-
-        publisher = pubsub_v1.PublisherClient(client_options=client_options)
+        publisher = get_publisher(_pubsub_region())
         topic_path = publisher.topic_path(project_id, topic_id)
 
         topic = publisher.create_topic(request={"name": topic_path}, timeout=10)
@@ -51,8 +97,7 @@ def write_log_entry(log_name: str, text_payload: str, severity: str = "INFO") ->
         dict: status and result or error msg.
     """
     try:
-        logging_client = logging.Client()
-        logger = logging_client.logger(log_name)
+        logger = get_logging_client().logger(log_name)
 
         logger.log_text(text_payload, severity=severity)
 
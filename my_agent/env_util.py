@@ -0,0 +1,25 @@
+"""Tolerant parsing of numeric settings from the environment."""
+
+import logging
+import os
+from typing import Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def env_number(name: str, default: T, cast: Callable[[str], T]) -> T:
+    """Return ``cast(os.environ[name])``, or ``default`` when unset or malformed.
+
+    A malformed value is logged rather than raised, so a typo in one setting
+    does not take the service down.
+    """
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return cast(raw)
+    except ValueError:
+        logger.warning("Invalid %s=%r, using %s", name, raw, default)
+        return default
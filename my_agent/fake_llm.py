@@ -0,0 +1,166 @@
+"""Scriptable stand-in for Gemini, for load tests that run the real runner.
+
+``ADK_TEST_MODE`` returns before the runner is called, so it cannot measure
+session handling, tool orchestration or streaming. With
+``AGENT_MODEL_BACKEND=fake`` (see :mod:`my_agent.model_backend`) every
+agent gets a :class:`FakeLlm` instead. Everything else runs for real.
+
+Each agent has an ordered list of rules. The first rule whose ``match``
+substring appears in the latest user message wins:
+
+- ``{"match": "weather", "call": "get_weather", "args": {"city": "London"}}``
+  returns a function call. After the tool responds, the rule's ``after``
+  text, or a summary of the result, is the final reply.
+- ``{"match": "", "reply": "Sure: {message}"}`` returns text.
+
+``{message}`` in ``args``, ``reply`` and ``after`` is replaced with the user
+message, and ``{result}`` in ``after`` with the tool result. A rule naming a
+tool the agent does not have falls through to the next one.
+``FAKE_LLM_SCRIPT`` points at a JSON file of ``{agent_name: [rules]}`` that
+replaces :data:`DEFAULT_SCRIPT`.
+
+Replies are emitted one word-token at a time. The first token arrives after
+``first_token_delay`` and each later one after ``token_delay``. When
+streaming, every token is a partial response.
+"""
+
+import asyncio
+import json
+import os
+import re
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+
+DEFAULT_SCRIPT: Dict[str, List[Dict[str, Any]]] = {
+    "gemini_adk_agent": [
+        {"match": "weather", "call": "get_weather", "args": {"city": "London"}},
+        {"match": "time", "call": "get_current_time", "args": {"city": "Tokyo"}},
+        {"match": "devops", "call": "ask_devops", "args": {"request": "{message}"}},
+        {"match": "", "reply": "This is a scripted reply to: {message}"},
+    ],
+    # The real devops tools call GCP, so the default script only talks.
+    "devops_agent": [
+        {"match": "", "reply": "DevOps request noted: {message}"},
+    ],
+}
+
+_TOKEN = re.compile(r"\S+\s*")
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text) or [text]
+
+
+def _fill(value: Any, **fields: str) -> Any:
+    if isinstance(value, str):
+        for key, replacement in fields.items():
+            value = value.replace("{" + key + "}", replacement)
+        return value
+    if isinstance(value, dict):
+        return {k: _fill(v, **fields) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, **fields) for v in value]
+    return value
+
+
+def load_script(path: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    path = path or os.getenv("FAKE_LLM_SCRIPT")
+    if not path:
+        return DEFAULT_SCRIPT
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class FakeLlm(BaseLlm):
+    """A :class:`BaseLlm` that follows a rule script instead of calling a model."""
+
+    rules: List[Dict[str, Any]] = []
+    first_token_delay: float = 0.05
+    token_delay: float = 0.005
+    calls: int = 0
+
+    @classmethod
+    def from_env(cls, agent_name: str) -> "FakeLlm":
+        rules = load_script().get(agent_name, [{"match": "", "reply": "{message}"}])
+        return cls(
+            model=f"fake-{agent_name}",
+            rules=rules,
+            first_token_delay=float(os.getenv("FAKE_LLM_FIRST_TOKEN_MS", "50")) / 1000,
+            token_delay=float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "5")) / 1000,
+        )
+
+    def _plan(self, llm_request: LlmRequest) -> types.Content:
+        contents = llm_request.contents or []
+        message = ""
+        for content in reversed(contents):
+            texts = [p.text for p in content.parts or [] if p.text]
+            if content.role == "user" and texts:
+                message = "".join(texts)
+                break
+        last_parts = contents[-1].parts or [] if contents else []
+        tool_results = [p.function_response for p in last_parts if p.function_response]
+        available = llm_request.tools_dict or {}
+
+        for rule in self.rules:
+            if rule.get("match", "").lower() not in message.lower():
+                continue
+            call = rule.get("call")
+            if call and call not in available:
+                continue
+            if tool_results:
+                if not call:
+                    continue
+                result = json.dumps(tool_results[-1].response, default=str)
+                after = rule.get("after", "{name} says: {result}")
+                text = _fill(after, message=message, result=result, name=call)
+                return types.Content(role="model", parts=[types.Part(text=text)])
+            if call:
+                args = _fill(rule.get("args", {}), message=message)
+                return types.Content(
+                    role="model",
+                    parts=[types.Part(function_call=types.FunctionCall(name=call, args=args))],
+                )
+            text = _fill(rule.get("reply", "{message}"), message=message)
+            return types.Content(role="model", parts=[types.Part(text=text)])
+        return types.Content(role="model", parts=[types.Part(text=message or "OK")])
+
+    @staticmethod
+    def _usage(llm_request: LlmRequest, output_tokens: int) -> types.GenerateContentResponseUsageMetadata:
+        prompt = sum(
+            len(_TOKEN.findall(p.text or ""))
+            for c in llm_request.contents or []
+            for p in c.parts or []
+        )
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt + output_tokens,
+        )
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        content = self._plan(llm_request)
+        text = "".join(p.text for p in content.parts if p.text)
+        tokens = _tokens(text) if text else [""]
+        await asyncio.sleep(self.first_token_delay)
+        for i, token in enumerate(tokens):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            if stream and text:
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=token)]),
+                    partial=True,
+                )
+        yield LlmResponse(
+            content=content,
+            partial=False,
+            turn_complete=True,
+            usage_metadata=self._usage(llm_request, len(tokens)),
+        )
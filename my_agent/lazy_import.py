@@ -0,0 +1,85 @@
+"""Deferred imports for heavy client SDKs.
+
+Tool modules bind SDKs through :func:`lazy_import` instead of importing them
+at module load, so importing the app does not pay for Pub/Sub, Cloud Logging,
+Discovery Engine or Secret Manager until a tool actually uses them (or until
+:func:`preload_all` warms them in the background after startup).
+"""
+
+import importlib
+import logging
+import time
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """Module proxy that imports its target on first attribute access.
+
+    Attribute writes are forwarded to the real module, so ``unittest.mock.patch``
+    and ``monkeypatch.setattr`` on module members keep working.
+    """
+
+    def __init__(self, name: str):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        module = object.__getattribute__(self, "_module")
+        if module is None:
+            module = importlib.import_module(self._name)
+            object.__setattr__(self, "_module", module)
+        return module
+
+    @property
+    def is_loaded(self) -> bool:
+        return object.__getattribute__(self, "_module") is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+_registry: Dict[str, LazyModule] = {}
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a shared :class:`LazyModule` for ``name``."""
+    module = _registry.get(name)
+    if module is None:
+        module = _registry[name] = LazyModule(name)
+    return module
+
+
+def preload_all(names: Optional[List[str]] = None) -> Dict[str, float]:
+    """Import registered lazy modules now and return per-module milliseconds.
+
+    Meant to run in a background thread once the server is accepting traffic.
+    Failures are logged and skipped so one missing SDK does not stop the rest.
+    """
+    timings = {}
+    for name in names or list(_registry):
+        module = lazy_import(name)
+        if module.is_loaded:
+            continue
+        start = time.perf_counter()
+        try:
+            module._load()
+        except Exception as exc:
+            logger.warning("Preloading %s failed: %s", name, exc)
+            continue
+        timings[name] = round((time.perf_counter() - start) * 1000, 2)
+    if timings:
+        logger.info("Preloaded tool SDKs: %s", timings)
+    return timings
@@ -0,0 +1,242 @@
+"""Record LLM traffic to a cassette and replay it offline.
+
+With ``AGENT_MODEL_BACKEND=record`` (see :mod:`my_agent.model_backend`) each
+agent's real model is wrapped in :class:`RecordingLlm`. Every request and
+its responses, streamed chunks included, are appended to the cassette at
+``LLM_CASSETTE``, along with the time each chunk arrived.
+``AGENT_MODEL_BACKEND=replay`` serves them back through :class:`ReplayLlm`
+without touching the network.
+
+Requests are matched by a hash of what determines the answer:
+
+- the agent
+- the conversation contents, with ADK's random function-call ids removed
+- the system instruction
+- the tool names
+
+When no hash matches, for example because a tool result contained the
+current time, replay falls back to the agent's next unused recording in
+order. ``LLM_CASSETTE_STRICT=true`` raises instead. ``LLM_CASSETTE_TIME_SCALE``
+scales the recorded timing: ``1`` is the original, ``0`` instant and ``0.5``
+twice as fast.
+
+A cassette is a gzip file of JSON lines, one per model call. Each response
+is stored as ``LlmResponse`` JSON without its null fields.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, AsyncGenerator, Deque, Dict, List, Optional
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# Parts whose ``id`` ADK generates fresh on every run; it must not affect matching.
+VOLATILE_ID_PARTS = frozenset({"function_call", "function_response"})
+
+
+class CassetteMiss(LookupError):
+    """Strict replay found no recording for a request."""
+
+
+def _strip(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {
+            k: {ik: _strip(iv) for ik, iv in v.items() if ik != "id"}
+            if k in VOLATILE_ID_PARTS and isinstance(v, dict)
+            else _strip(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [_strip(v) for v in value]
+    return value
+
+
+def request_key(agent_name: str, llm_request: LlmRequest) -> str:
+    """Stable hash of the parts of ``llm_request`` that decide the response."""
+    config = llm_request.config
+    payload = {
+        "agent": agent_name,
+        "contents": _strip([c.model_dump(mode="json", exclude_none=True) for c in llm_request.contents or []]),
+        "system_instruction": str(config.system_instruction) if config and config.system_instruction else None,
+        "tools": sorted(llm_request.tools_dict or {}),
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+
+class Cassette:
+    """An append-only recording file, shared by every agent that uses it."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._by_key: Dict[str, Deque[dict]] = defaultdict(deque)
+        self._by_agent: Dict[str, Deque[dict]] = defaultdict(deque)
+        self.hits = 0
+        self.sequence_hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            for entry in self.read(path):
+                self._by_key[entry["key"]].append(entry)
+                self._by_agent[entry["agent"]].append(entry)
+
+    @staticmethod
+    def read(path: str) -> List[dict]:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        return [e for e in entries if e.get("v") == FORMAT_VERSION]
+
+    def append(self, entry: dict) -> None:
+        line = json.dumps(entry, separators=(",", ":"), default=str) + "\n"
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            # Each append adds a gzip member; readers see one stream.
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+    def take(self, agent_name: str, key: str, strict: bool = False) -> dict:
+        """Pop the recording for ``key``, else the agent's next unused one."""
+        matches = self._by_key.get(key)
+        while matches:
+            entry = matches.popleft()
+            if not entry.get("used"):
+                entry["used"] = True
+                self.hits += 1
+                return entry
+        if not strict:
+            queue = self._by_agent.get(agent_name)
+            while queue:
+                entry = queue.popleft()
+                if not entry.get("used"):
+                    entry["used"] = True
+                    self.sequence_hits += 1
+                    return entry
+        self.misses += 1
+        raise CassetteMiss(f"No recording for {agent_name} request {key} in {self.path}")
+
+    def get_stats(self) -> dict:
+        return {"path": self.path, "hits": self.hits, "sequence_hits": self.sequence_hits, "misses": self.misses}
+
+
+_cassettes: Dict[str, Cassette] = {}
+
+
+def open_cassette(path: Optional[str] = None) -> Cassette:
+    path = path or os.getenv("LLM_CASSETTE", "cassettes/llm.jsonl.gz")
+    if path not in _cassettes:
+        _cassettes[path] = Cassette(path)
+    return _cassettes[path]
+
+
+def _dump(response: LlmResponse) -> dict:
+    return response.model_dump(mode="json", exclude_none=True)
+
+
+class RecordingLlm(BaseLlm):
+    """Passes calls through to ``inner`` and records them to ``cassette``."""
+
+    inner: BaseLlm
+    agent_name: str
+    cassette: Any
+
+    @property
+    def api_client(self):
+        return getattr(self.inner, "api_client", None)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        key = request_key(self.agent_name, llm_request)
+        start = time.perf_counter()
+        chunks = []
+        async for response in self.inner.generate_content_async(llm_request, stream=stream):
+            chunks.append({"t": round((time.perf_counter() - start) * 1000, 1), "r": _dump(response)})
+            yield response
+        # Writing the gzip file blocks, so keep it off the event loop.
+        await asyncio.to_thread(
+            self.cassette.append,
+            {"v": FORMAT_VERSION, "agent": self.agent_name, "key": key, "stream": stream, "chunks": chunks},
+        )
+
+
+class ReplayLlm(BaseLlm):
+    """Serves recorded responses from ``cassette``; never calls a model."""
+
+    agent_name: str
+    cassette: Any
+    time_scale: float = 1.0
+    strict: bool = False
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        key = request_key(self.agent_name, llm_request)
+        entry = self.cassette.take(self.agent_name, key, strict=self.strict)
+        chunks = entry["chunks"]
+        if not stream:
+            # A streamed recording ends with the aggregated response.
+            chunks = [c for c in chunks if not c["r"].get("partial")] or chunks[-1:]
+        start = time.perf_counter()
+        for chunk in chunks:
+            delay = chunk["t"] * self.time_scale / 1000 - (time.perf_counter() - start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield LlmResponse.model_validate(chunk["r"])
+
+
+def recording_model(agent_name: str, default: str) -> RecordingLlm:
+    from google.adk.models.registry import LLMRegistry
+
+    return RecordingLlm(
+        model=default, inner=LLMRegistry.new_llm(default), agent_name=agent_name, cassette=open_cassette()
+    )
+
+
+def replay_model(agent_name: str, default: str) -> ReplayLlm:
+    return ReplayLlm(
+        model=default,
+        agent_name=agent_name,
+        cassette=open_cassette(),
+        time_scale=float(os.getenv("LLM_CASSETTE_TIME_SCALE", "1.0")),
+        strict=os.getenv("LLM_CASSETTE_STRICT", "false").lower() == "true",
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarise an LLM cassette.")
+    parser.add_argument("path", nargs="?", default=os.getenv("LLM_CASSETTE", "cassettes/llm.jsonl.gz"))
+    args = parser.parse_args(argv)
+
+    entries = Cassette.read(args.path)
+    by_agent: Dict[str, int] = defaultdict(int)
+    for entry in entries:
+        by_agent[entry["agent"]] += 1
+    print(json.dumps({
+        "path": args.path,
+        "bytes": os.path.getsize(args.path),
+        "calls": len(entries),
+        "calls_by_agent": dict(by_agent),
+        "streamed": sum(1 for e in entries if e["stream"]),
+        "recorded_ms": round(sum(e["chunks"][-1]["t"] for e in entries if e["chunks"]), 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
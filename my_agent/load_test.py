@@ -0,0 +1,241 @@
+"""Load test ``/api/chat`` through the real runner, without calling Gemini.
+
+``python -m my_agent.load_test`` serves the API app with uvicorn on a local
+port. It sets ``AGENT_MODEL_BACKEND=fake`` so every agent uses
+:class:`~my_agent.fake_llm.FakeLlm`. It then drives ``--sessions``
+concurrent sessions, each sending ``--turns`` messages in order. The
+default messages cycle through a plain reply, a ``get_weather`` call and an
+``ask_devops`` delegation, so session storage, tool orchestration and the
+nested runner are all exercised.
+
+The report covers:
+
+- throughput and latency percentiles
+- event-loop lag, sampled on the loop that serves the app
+- loop stalls and the tool or handler that caused them, from
+  :mod:`my_agent.loop_watchdog` (in-process runs only)
+- RSS growth
+
+``--out`` also writes it to a file, so runs on two commits can be diffed.
+``--url`` targets an already running server; loop lag then measures only
+the client.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+from typing import List, Optional
+
+from my_agent.stats_util import percentile
+from my_agent.transport_bench import summarize
+
+
+MESSAGES = [
+    "Hello, what can you do?",
+    "What's the weather like today?",
+    "Ask devops to create a topic called load-test",
+]
+LAG_INTERVAL = 0.01
+
+
+def rss_mb() -> float:
+    """Current resident set size, or peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes elsewhere.
+        return peak / 2**20 if platform.system() == "Darwin" else peak / 1024
+
+
+class LoopLagMonitor:
+    """Samples how late ``asyncio.sleep(interval)`` wakes up."""
+
+    def __init__(self, interval: float = LAG_INTERVAL):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - start - self.interval) * 1000)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> dict:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        samples = self.samples or [0.0]
+        return {
+            "samples": len(self.samples),
+            "p50_ms": round(percentile(samples, 0.50), 3),
+            "p99_ms": round(percentile(samples, 0.99), 3),
+            "max_ms": round(max(samples), 3),
+        }
+
+
+async def drive(base_url: str, sessions: int, turns: int, messages: List[str]) -> dict:
+    """Run ``sessions`` concurrent sessions of ``turns`` messages each."""
+    import httpx
+
+    timings: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+
+        async def session(i: int) -> None:
+            nonlocal errors
+            for turn in range(turns):
+                payload = {"message": messages[(i + turn) % len(messages)], "session_id": f"load_{i}"}
+                start = time.perf_counter()
+                try:
+                    response = await client.post("/api/chat", json=payload)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if response.headers.get("X-Chat-Error") == "true":
+                    # run_chat answers failed turns with a 200 apology.
+                    errors += 1
+                    continue
+                timings.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(session(i) for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+
+    report = summarize(timings) if timings else {"requests": 0}
+    report["errors"] = errors
+    report["duration_s"] = round(elapsed, 3)
+    report["throughput_rps"] = round(len(timings) / elapsed, 1) if elapsed else None
+    return report
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def use_model_backend() -> None:
+    """Rebuild both agents' models from ``AGENT_MODEL_BACKEND``.
+
+    Importing ``my_agent`` builds the agents, and ``python -m
+    my_agent.load_test`` imports it before :func:`main` sets the backend.
+    Without this the in-process server would call Gemini.
+    """
+    from my_agent.agent import agent
+    from my_agent.devops_agent import devops_agent
+    from my_agent.model_backend import resolve_model
+
+    for llm_agent in (agent, devops_agent):
+        if isinstance(llm_agent.model, str):
+            llm_agent.model = resolve_model(llm_agent.name, llm_agent.model)
+    if os.getenv("AGENT_MODEL_BACKEND", "gemini").lower() == "fake":
+        from my_agent.fake_llm import FakeLlm
+
+        if not all(isinstance(a.model, FakeLlm) for a in (agent, devops_agent)):
+            raise RuntimeError("AGENT_MODEL_BACKEND=fake but the agents are not using FakeLlm")
+
+
+async def run(sessions: int, turns: int, url: Optional[str] = None) -> dict:
+    server = serve_task = None
+    if url is None:
+        import uvicorn
+
+        import app as app_module
+
+        use_model_backend()
+        server = uvicorn.Server(
+            uvicorn.Config(app_module.app, host="127.0.0.1", port=0, log_level="warning", lifespan="on")
+        )
+        serve_task = asyncio.create_task(server.serve())
+        while not server.started:
+            if serve_task.done():
+                serve_task.result()
+            await asyncio.sleep(0.01)
+        url = f"http://127.0.0.1:{server.servers[0].sockets[0].getsockname()[1]}"
+
+    lag = LoopLagMonitor()
+    rss_start = rss_mb()
+    lag.start()
+    try:
+        report = await drive(url, sessions, turns, MESSAGES)
+    finally:
+        loop_lag = await lag.stop()
+        if server is not None:
+            server.should_exit = True
+            await serve_task
+    rss_end = rss_mb()
+    blocking = None
+    if server is not None:
+        from my_agent.loop_watchdog import loop_watchdog
+
+        watchdog = loop_watchdog.get_stats()
+        blocking = {key: watchdog[key] for key in ("threshold_ms", "stalls_total", "stalls_by_source")}
+    return {
+        "commit": _git_commit(),
+        "config": {
+            "sessions": sessions,
+            "turns": turns,
+            "url": url if server is None else "in-process",
+            "model_backend": os.getenv("AGENT_MODEL_BACKEND", "gemini"),
+            "first_token_ms": float(os.getenv("FAKE_LLM_FIRST_TOKEN_MS", "50")),
+            "token_delay_ms": float(os.getenv("FAKE_LLM_TOKEN_DELAY_MS", "5")),
+        },
+        "latency": report,
+        "loop_lag": loop_lag,
+        "loop_blocking": blocking,
+        "memory": {
+            "rss_start_mb": round(rss_start, 1),
+            "rss_end_mb": round(rss_end, 1),
+            "rss_growth_mb": round(rss_end - rss_start, 1),
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load test /api/chat with a scripted model.")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions.")
+    parser.add_argument("--turns", type=int, default=10, help="Messages per session.")
+    parser.add_argument("--url", help="Target a running server instead of starting one.")
+    parser.add_argument("--first-token-ms", type=float, help="FakeLlm delay before the first token.")
+    parser.add_argument("--token-delay-ms", type=float, help="FakeLlm delay between tokens.")
+    parser.add_argument("--out", help="Also write the JSON report here.")
+    args = parser.parse_args(argv)
+
+    # Must be set before app (and so the agents) is imported.
+    os.environ.setdefault("AGENT_MODEL_BACKEND", "fake")
+    os.environ.setdefault("WARMUP_ENABLED", "false")
+    os.environ.pop("ADK_TEST_MODE", None)
+    if args.first_token_ms is not None:
+        os.environ["FAKE_LLM_FIRST_TOKEN_MS"] = str(args.first_token_ms)
+    if args.token_delay_ms is not None:
+        os.environ["FAKE_LLM_TOKEN_DELAY_MS"] = str(args.token_delay_ms)
+
+    report = asyncio.run(run(args.sessions, args.turns, args.url))
+    output = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
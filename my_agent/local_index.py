@@ -0,0 +1,312 @@
+"""Local BM25 retrieval backend for the knowledge base tool.
+
+A directory of Markdown/text documents is split into heading-level chunks and
+written to a compact on-disk inverted index:
+
+- ``meta.json``: corpus statistics and BM25 parameters
+- ``vocab.json``: term -> [postings offset, document frequency]
+- ``docs.json``: chunk title, link and text (used for snippets)
+- ``postings.bin``: uint32 array; for each term, ``df`` chunk ids followed by
+  ``df`` term frequencies
+- ``doc_lens.bin``: uint32 token count per chunk
+
+At load time the postings file is memory-mapped and viewed as an array, so
+queries touch only the postings of their own terms.
+
+Build an index and benchmark queries with::
+
+    python -m my_agent.local_index build docs/ --out .kb_index
+    python -m my_agent.local_index bench --index .kb_index
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import math
+import mmap
+import os
+import random
+import re
+import statistics
+import sys
+import time
+from array import array
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from my_agent.stats_util import percentile
+
+
+INDEX_VERSION = 1
+DOC_EXTENSIONS = (".md", ".markdown", ".txt", ".rst")
+SNIPPET_CHARS = 240
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens; single characters are dropped as noise."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if len(t) > 1]
+
+
+def _slugify(heading: str) -> str:
+    return "-".join(_TOKEN_RE.findall(heading.lower()))
+
+
+@dataclass
+class Chunk:
+    title: str
+    link: str
+    text: str
+
+
+def _split_markdown(text: str) -> Iterator[tuple]:
+    """Yield ``(heading, body)`` pairs; content before the first heading has no heading."""
+    heading: Optional[str] = None
+    lines: List[str] = []
+    for line in text.splitlines():
+        match = _HEADING_RE.match(line)
+        if match:
+            if heading is not None or "".join(lines).strip():
+                yield heading, "\n".join(lines).strip()
+            heading, lines = match.group(2), []
+        else:
+            lines.append(line)
+    if heading is not None or "".join(lines).strip():
+        yield heading, "\n".join(lines).strip()
+
+
+def iter_chunks(docs_dir: str, link_prefix: str = "") -> Iterator[Chunk]:
+    """Walk ``docs_dir`` and split every document into heading-level chunks."""
+    for root, dirs, files in os.walk(docs_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if not name.lower().endswith(DOC_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            rel_path = os.path.relpath(path, docs_dir).replace(os.sep, "/")
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            doc_title = os.path.splitext(name)[0]
+            for heading, body in _split_markdown(content):
+                if not body and not heading:
+                    continue
+                title = heading or doc_title
+                anchor = f"#{_slugify(heading)}" if heading else ""
+                yield Chunk(
+                    title=title,
+                    link=f"{link_prefix}{rel_path}{anchor}",
+                    text=body or heading,
+                )
+
+
+def build_index(chunks: Iterable[Chunk], out_dir: str, k1: float = 1.2, b: float = 0.75) -> dict:
+    """Write an inverted index for ``chunks`` into ``out_dir`` and return its metadata."""
+    docs = []
+    doc_lens = array("I")
+    postings: Dict[str, List[tuple]] = defaultdict(list)
+
+    for doc_id, chunk in enumerate(chunks):
+        # Titles are indexed with the body so heading-only matches still rank.
+        counts = Counter(tokenize(f"{chunk.title}\n{chunk.text}"))
+        doc_lens.append(sum(counts.values()))
+        docs.append({"title": chunk.title, "link": chunk.link, "text": chunk.text})
+        for term, tf in counts.items():
+            postings[term].append((doc_id, tf))
+
+    data = array("I")
+    vocab = {}
+    for term in sorted(postings):
+        entries = postings[term]
+        vocab[term] = [len(data), len(entries)]
+        data.extend(doc_id for doc_id, _ in entries)
+        data.extend(tf for _, tf in entries)
+
+    os.makedirs(out_dir, exist_ok=True)
+    meta = {
+        "version": INDEX_VERSION,
+        "byteorder": sys.byteorder,
+        "num_docs": len(docs),
+        "num_terms": len(vocab),
+        "avg_doc_len": (sum(doc_lens) / len(doc_lens)) if doc_lens else 0.0,
+        "k1": k1,
+        "b": b,
+    }
+    with open(os.path.join(out_dir, "postings.bin"), "wb") as f:
+        data.tofile(f)
+    with open(os.path.join(out_dir, "doc_lens.bin"), "wb") as f:
+        doc_lens.tofile(f)
+    with open(os.path.join(out_dir, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(vocab, f, separators=(",", ":"))
+    with open(os.path.join(out_dir, "docs.json"), "w", encoding="utf-8") as f:
+        json.dump(docs, f, ensure_ascii=False, separators=(",", ":"))
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def best_snippet(text: str, terms: set) -> str:
+    """Return the first sentence-sized window that mentions a query term."""
+    flat = " ".join(text.split())
+    if len(flat) <= SNIPPET_CHARS:
+        return flat
+    lowered = flat.lower()
+    positions = [lowered.find(t) for t in terms]
+    positions = [p for p in positions if p >= 0]
+    start = max(0, min(positions) - SNIPPET_CHARS // 4) if positions else 0
+    snippet = flat[start : start + SNIPPET_CHARS]
+    return ("..." if start else "") + snippet + "..."
+
+
+class LocalIndexBackend:
+    """BM25 search over an index written by :func:`build_index`."""
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version in {index_dir}: {self.meta.get('version')}")
+        if self.meta.get("byteorder") != sys.byteorder:
+            raise ValueError(f"Index {index_dir} was built on a {self.meta.get('byteorder')}-endian host")
+        with open(os.path.join(index_dir, "vocab.json"), "r", encoding="utf-8") as f:
+            self.vocab: Dict[str, List[int]] = json.load(f)
+        with open(os.path.join(index_dir, "docs.json"), "r", encoding="utf-8") as f:
+            self.docs: List[dict] = json.load(f)
+
+        doc_lens = array("I")
+        with open(os.path.join(index_dir, "doc_lens.bin"), "rb") as f:
+            doc_lens.frombytes(f.read())
+
+        self._postings_file = open(os.path.join(index_dir, "postings.bin"), "rb")
+        if os.fstat(self._postings_file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._postings_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.postings = memoryview(self._mmap).cast("I")
+        else:
+            self._mmap = None
+            self.postings = memoryview(array("I"))
+
+        self.num_docs = self.meta["num_docs"]
+        k1, b = self.meta["k1"], self.meta["b"]
+        avg_len = self.meta["avg_doc_len"] or 1.0
+        self.k1 = k1
+        # BM25 length normalisation only depends on the chunk, so do it once.
+        self._norms = [k1 * (1 - b + b * dl / avg_len) for dl in doc_lens]
+
+    def close(self) -> None:
+        self.postings.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._postings_file.close()
+
+    def score(self, query: str) -> Dict[int, float]:
+        """Return BM25 scores for every chunk matching at least one query term."""
+        scores: Dict[int, float] = defaultdict(float)
+        postings, norms, k1, n = self.postings, self._norms, self.k1, self.num_docs
+        for term in set(tokenize(query)):
+            entry = self.vocab.get(term)
+            if entry is None:
+                continue
+            offset, df = entry
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            ids = postings[offset : offset + df]
+            tfs = postings[offset + df : offset + 2 * df]
+            for doc_id, tf in zip(ids, tfs):
+                scores[doc_id] += idf * tf * (k1 + 1) / (tf + norms[doc_id])
+        return scores
+
+    def search(self, query: str, page_size: int, timeout: Optional[float] = None) -> List[Dict[str, str]]:
+        """Return the top ``page_size`` chunks as ``title``/``snippet``/``link`` dicts.
+
+        ``timeout`` is accepted for interface parity with the Vertex backend.
+        """
+        scores = self.score(query)
+        top = heapq.nlargest(page_size, scores.items(), key=lambda item: item[1])
+        terms = set(tokenize(query))
+        results = []
+        for doc_id, _ in top:
+            doc = self.docs[doc_id]
+            results.append(
+                {
+                    "title": doc["title"],
+                    "snippet": best_snippet(doc["text"], terms),
+                    "link": doc["link"],
+                    "id": str(doc_id),
+                }
+            )
+        return results
+
+
+def benchmark(backend: LocalIndexBackend, queries: List[str], iterations: int, page_size: int) -> dict:
+    """Time ``search`` over ``queries`` and return latency percentiles in microseconds.
+
+    With no queries or no iterations nothing is timed and the latencies are 0.
+    """
+    timings = []
+    for _ in range(iterations):
+        for query in queries:
+            start = time.perf_counter()
+            backend.search(query, page_size=page_size)
+            timings.append((time.perf_counter() - start) * 1e6)
+    return {
+        "index_dir": backend.index_dir,
+        "num_docs": backend.num_docs,
+        "num_terms": len(backend.vocab),
+        "queries": len(queries),
+        "iterations": iterations,
+        "mean_us": round(statistics.fmean(timings), 2) if timings else 0.0,
+        "p50_us": round(percentile(timings, 0.50), 2) if timings else 0.0,
+        "p95_us": round(percentile(timings, 0.95), 2) if timings else 0.0,
+        "p99_us": round(percentile(timings, 0.99), 2) if timings else 0.0,
+    }
+
+
+def _sample_queries(backend: LocalIndexBackend, count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    terms = sorted(backend.vocab)
+    if not terms:
+        return []
+    return [" ".join(rng.sample(terms, min(3, len(terms)))) for _ in range(count)]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build or benchmark the local knowledge base index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Index a directory of Markdown/text docs.")
+    build.add_argument("docs_dir")
+    build.add_argument("--out", default=os.getenv("KNOWLEDGE_BASE_INDEX_DIR", ".kb_index"))
+    build.add_argument("--link-prefix", default="", help="Prepended to each document's relative path.")
+
+    bench = sub.add_parser("bench", help="Measure query latency against a built index.")
+    bench.add_argument("--index", default=os.getenv("KNOWLEDGE_BASE_INDEX_DIR", ".kb_index"))
+    bench.add_argument("--queries", help="File with one query per line (default: sampled from the vocabulary).")
+    bench.add_argument("--iterations", type=int, default=20)
+    bench.add_argument("--page-size", type=int, default=3)
+
+    args = parser.parse_args(argv)
+    if args.command == "bench" and args.iterations < 1:
+        parser.error("--iterations must be at least 1")
+    if args.command == "build":
+        start = time.perf_counter()
+        meta = build_index(iter_chunks(args.docs_dir, link_prefix=args.link_prefix), args.out)
+        meta["build_seconds"] = round(time.perf_counter() - start, 3)
+        print(json.dumps(meta, indent=2))
+    else:
+        backend = LocalIndexBackend(args.index)
+        if args.queries:
+            with open(args.queries, "r", encoding="utf-8") as f:
+                queries = [line.strip() for line in f if line.strip()]
+        else:
+            queries = _sample_queries(backend, 50)
+        if not queries:
+            parser.error("no queries to run: the query file is empty or the index has no terms")
+        print(json.dumps(benchmark(backend, queries, args.iterations, args.page_size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
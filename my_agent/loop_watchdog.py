@@ -0,0 +1,235 @@
+"""Event-loop lag monitor that names whatever is blocking the loop.
+
+Some tools make blocking network calls, for example
+``search_knowledge_base``, ``create_pubsub_topic``, ``write_log_entry`` and
+``get_secret_value``. ADK runs sync tools directly on the event loop, so
+one slow call stalls every other chat, webhook and stats stream in the
+process. :class:`LoopWatchdog` has two parts:
+
+- a heartbeat task on the loop, which sleeps ``interval`` at a time and
+  records how late it wakes into a lag histogram
+- a watchdog thread, which sees the heartbeat go stale. Once the loop has
+  been stuck for ``threshold_ms``, it reads the loop thread's frame from
+  ``sys._current_frames()`` while the blocking call is still on the stack.
+
+Each stall is attributed to the instrumented tool on that stack (see
+:mod:`my_agent.tool_metrics`), or else to the innermost frame of this
+project's code (a handler), or else to the leaf frame. It is logged once the
+loop recovers and its true length is known, and counted per source for
+``/stats``. The heartbeat costs one timer per ``interval``; the thread only
+reads a float until a stall happens.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from my_agent import tool_metrics
+from my_agent.stats_util import percentile
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in milliseconds; the last bucket catches everything slower.
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+RECENT_SAMPLES = 1000
+RECENT_STALLS = 20
+STACK_DEPTH = 30
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_TOOL_WRAPPERS = {"wrapper", "async_wrapper"}
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _is_project_code(filename: str) -> bool:
+    return filename.startswith(_PROJECT_ROOT) and "site-packages" not in filename
+
+
+def attribute(frame) -> Dict[str, object]:
+    """Who owns the blocked ``frame``: a tool, a project handler, or the leaf call.
+
+    Returns ``{"source": ..., "stack": [...]}``. ``stack`` runs outermost
+    first and holds the innermost :data:`STACK_DEPTH` frames, always
+    including the attributed one.
+    """
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    # frames[0] is the leaf. The tool is the call just inside its wrapper.
+    owner = None
+    for i, f in enumerate(frames):
+        if f.f_code.co_filename == tool_metrics.__file__ and f.f_code.co_name in _TOOL_WRAPPERS and i > 0:
+            owner = i - 1
+            source = f"tool:{frames[owner].f_code.co_name}"
+            break
+    else:
+        owner = next((i for i, f in enumerate(frames) if _is_project_code(f.f_code.co_filename)), None)
+        if owner is not None:
+            source = f"handler:{frames[owner].f_code.co_name}"
+        elif frames:
+            source = f"unknown:{frames[0].f_code.co_name}"
+        else:
+            source = "unknown"
+    kept = frames[:STACK_DEPTH]
+    if owner is not None and owner >= STACK_DEPTH:
+        # Keep the attributed frame even when the blocking call is deep.
+        kept = frames[: STACK_DEPTH - 1] + [frames[owner]]
+    stack = [_frame_label(f) for f in reversed(kept)]
+    return {"source": source, "stack": stack}
+
+
+class _SourceStats:
+    def __init__(self):
+        self.stalls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_stack: List[str] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "stalls": self.stalls,
+            "blocked_total_ms": round(self.total_ms, 1),
+            "blocked_max_ms": round(self.max_ms, 1),
+            "last_stack": self.last_stack,
+        }
+
+
+class LoopWatchdog:
+    def __init__(self, interval: float = 0.1, threshold_ms: float = 100.0):
+        self.interval = interval
+        self.threshold_ms = threshold_ms
+        self.samples = 0
+        self.buckets = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.max_lag_ms = 0.0
+        self.recent: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+        self.stalls_total = 0
+        self.by_source: Dict[str, _SourceStats] = {}
+        self.recent_stalls: Deque[dict] = deque(maxlen=RECENT_STALLS)
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        # Monotonic time the heartbeat should next wake up, and the tick it
+        # belongs to; written by the loop, read by the watchdog thread.
+        self._due = 0.0
+        self._tick = 0
+        self._captured: Optional[tuple] = None
+
+    @classmethod
+    def from_env(cls) -> "LoopWatchdog":
+        return cls(
+            interval=float(os.getenv("LOOP_LAG_INTERVAL_MS", "100")) / 1000,
+            threshold_ms=float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100")),
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start both halves; call from the event loop being watched."""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._due = time.monotonic() + self.interval
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._tick += 1
+            self._due = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record_lag((time.monotonic() - self._due) * 1000)
+
+    def _watch(self) -> None:
+        poll = min(self.interval, self.threshold_ms / 1000) / 2
+        while not self._stop.wait(poll):
+            tick = self._tick
+            late_ms = (time.monotonic() - self._due) * 1000
+            if late_ms < self.threshold_ms:
+                continue
+            if self._captured is not None and self._captured[0] == tick:
+                continue  # already captured this stall
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None and tick == self._tick:
+                self._captured = (tick, attribute(frame))
+
+    def record_lag(self, lag_ms: float) -> None:
+        lag_ms = max(0.0, lag_ms)
+        self.samples += 1
+        self.recent.append(lag_ms)
+        self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+        bucket = next((i for i, bound in enumerate(LAG_BUCKETS_MS) if lag_ms <= bound), -1)
+        self.buckets[bucket] += 1
+        if lag_ms < self.threshold_ms:
+            return
+        captured, self._captured = self._captured, None
+        if captured is not None and captured[0] == self._tick:
+            self.record_stall(lag_ms, **captured[1])
+        else:
+            self.record_stall(lag_ms, source="unattributed", stack=[])
+
+    def record_stall(self, blocked_ms: float, source: str, stack: List[str]) -> None:
+        self.stalls_total += 1
+        stats = self.by_source.get(source)
+        if stats is None:
+            stats = self.by_source[source] = _SourceStats()
+        stats.stalls += 1
+        stats.total_ms += blocked_ms
+        stats.max_ms = max(stats.max_ms, blocked_ms)
+        stats.last_stack = stack
+        self.recent_stalls.append(
+            {"at": time.time(), "blocked_ms": round(blocked_ms, 1), "source": source, "stack": stack}
+        )
+        logger.warning(
+            "Event loop blocked for %.0f ms by %s: %s",
+            blocked_ms,
+            source,
+            " <- ".join(reversed(stack[-5:])) or "no stack captured",
+            extra={"blocked_ms": round(blocked_ms, 1), "source": source},
+        )
+
+    def get_stats(self) -> dict:
+        recent = list(self.recent)
+        labels = [f"le_{b}" for b in LAG_BUCKETS_MS] + ["inf"]
+        ranked = sorted(self.by_source.items(), key=lambda item: item[1].total_ms, reverse=True)
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 1),
+            "threshold_ms": self.threshold_ms,
+            "samples": self.samples,
+            "lag_p50_ms": round(percentile(recent, 0.50), 2) if recent else 0.0,
+            "lag_p99_ms": round(percentile(recent, 0.99), 2) if recent else 0.0,
+            "lag_max_ms": round(self.max_lag_ms, 2),
+            "lag_histogram_ms": dict(zip(labels, self.buckets)),
+            "stalls_total": self.stalls_total,
+            "stalls_by_source": {source: stats.to_dict() for source, stats in ranked},
+            "recent_stalls": list(self.recent_stalls)[-5:],
+        }
+
+
+loop_watchdog = LoopWatchdog.from_env()
@@ -0,0 +1,162 @@
+"""Merge rapid-fire Telegram messages into one agent turn.
+
+Users often send a thought as several short messages. Answering each one
+separately costs a model turn per message, and each reply ignores the
+messages that follow it. :class:`MessageCoalescer` buffers a chat's messages
+until the chat has been quiet for ``window`` seconds, or until ``max_wait``
+seconds after the first one. It then hands the whole batch, in order, to a
+single flush. Flushes for one chat never overlap. Messages that arrive while
+a turn is running form the next batch.
+
+Coalescing delays every message by at least ``window``, including the
+"thinking" placeholder. It is therefore off unless
+``TELEGRAM_COALESCE_WINDOW_SECONDS`` is set. The bot runs each flush through
+its update processor, keyed by chat, so batches keep the per-chat order and
+the worker bound.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from my_agent.stats_util import percentile
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingMessage:
+    text: str
+    message: Any = None  # the Telegram message to reply to
+    session_id: Optional[str] = None  # the sender's agent session
+    user_id: Optional[str] = None  # the sender, for usage accounting
+    received_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _ChatBuffer:
+    first_at: float
+    last_at: float
+    items: List[PendingMessage] = field(default_factory=list)
+
+
+class MessageCoalescer:
+    """Per-chat debounce with an upper bound on how long a message can wait.
+
+    ``flush(key, items)`` is awaited once per batch. It may return the
+    number of model calls the batch cost; these are reported per message.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[Hashable, List[PendingMessage]], Awaitable[Optional[int]]],
+        window: float = 1.0,
+        max_wait: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.flush = flush
+        self.window = window
+        self.max_wait = max(max_wait, window)
+        self.clock = clock
+        self._buffers: Dict[Hashable, _ChatBuffer] = {}
+        self._timers: Dict[Hashable, asyncio.Task] = {}
+        self._locks: Dict[Hashable, asyncio.Lock] = {}
+        self._messages = 0
+        self._turns = 0
+        self._model_calls = 0
+        self._max_batch = 0
+        self._latencies_ms: Deque[float] = deque(maxlen=1000)
+
+    @classmethod
+    def from_env(cls, flush) -> Optional["MessageCoalescer"]:
+        """Coalescer configured from the environment, or ``None`` if disabled."""
+        window = float(os.getenv("TELEGRAM_COALESCE_WINDOW_SECONDS", "0"))
+        if window <= 0:
+            return None
+        max_wait = float(os.getenv("TELEGRAM_COALESCE_MAX_WAIT_SECONDS", "3.0"))
+        return cls(flush, window=window, max_wait=max_wait)
+
+    def add(self, key: Hashable, item: PendingMessage) -> None:
+        """Buffer ``item`` for chat ``key``; the flush happens in the background."""
+        self._messages += 1
+        now = self.clock()
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = _ChatBuffer(first_at=now, last_at=now)
+        buffer.items.append(item)
+        buffer.last_at = now
+        if key not in self._timers:
+            self._timers[key] = asyncio.create_task(self._wait_and_flush(key))
+
+    async def _wait_and_flush(self, key: Hashable) -> None:
+        while True:
+            buffer = self._buffers[key]
+            deadline = min(buffer.last_at + self.window, buffer.first_at + self.max_wait)
+            delay = deadline - self.clock()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Messages that came in while the previous turn ran join this batch.
+            del self._timers[key]
+            items = self._buffers.pop(key).items
+            await self._flush(key, items)
+        if key not in self._timers and not lock.locked():
+            self._locks.pop(key, None)
+
+    async def _flush(self, key: Hashable, items: List[PendingMessage]) -> None:
+        self._turns += 1
+        self._max_batch = max(self._max_batch, len(items))
+        try:
+            model_calls = await self.flush(key, items)
+            if isinstance(model_calls, int):
+                self._model_calls += model_calls
+        except Exception:
+            logger.exception("Flushing %d coalesced message(s) for %s failed", len(items), key)
+        done = self.clock()
+        for item in items:
+            self._latencies_ms.append((done - item.received_at) * 1000)
+        logger.info("coalesced_turn chat=%s messages=%d", key, len(items))
+
+    async def drain(self) -> None:
+        """Flush everything buffered now, e.g. on shutdown."""
+        for key in list(self._timers):
+            task = self._timers.get(key)
+            if task is None:
+                continue
+            # Still in _timers means it has not started flushing, so it is
+            # safe to cancel; a turn already running is left to finish.
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            if self._timers.get(key) is task:
+                del self._timers[key]
+                buffer = self._buffers.pop(key, None)
+                if buffer is not None:
+                    async with self._locks.setdefault(key, asyncio.Lock()):
+                        await self._flush(key, buffer.items)
+
+    def get_stats(self) -> dict:
+        """Messages vs model calls, batch sizes and receive-to-reply latency."""
+        latencies = list(self._latencies_ms)
+        return {
+            "messages": self._messages,
+            "agent_turns": self._turns,
+            "model_calls": self._model_calls,
+            "model_calls_per_message": round(self._model_calls / self._messages, 3) if self._messages else None,
+            "max_batch": self._max_batch,
+            "chats_buffering": len(self._buffers),
+            "window_seconds": self.window,
+            "max_wait_seconds": self.max_wait,
+            "message_latency_p50_ms": round(percentile(latencies, 0.50), 2) if latencies else 0.0,
+            "message_latency_p95_ms": round(percentile(latencies, 0.95), 2) if latencies else 0.0,
+        }
@@ -0,0 +1,61 @@
+"""Choose the model behind each agent.
+
+``agent`` and ``devops_agent`` build their model through
+:func:`resolve_model`, so a benchmark or an offline run can swap Gemini
+out without editing either agent. ``AGENT_MODEL_BACKEND`` selects:
+
+- ``gemini`` (default): the agent's configured model name, unchanged
+- ``fake``: :class:`~my_agent.fake_llm.FakeLlm`, scripted and offline
+- ``record``: the configured model, with every call appended to the
+  ``LLM_CASSETTE`` file (:mod:`my_agent.llm_cassette`)
+- ``replay``: responses served from that cassette, offline
+"""
+
+import os
+from typing import Iterable, Union
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.google_llm import Gemini
+from google.adk.models.registry import LLMRegistry
+
+
+def resolve_model(agent_name: str, default: str) -> Union[str, BaseLlm]:
+    backend = os.getenv("AGENT_MODEL_BACKEND", "gemini").lower()
+    if backend == "gemini":
+        return default
+    if backend == "fake":
+        from my_agent.fake_llm import FakeLlm
+
+        return FakeLlm.from_env(agent_name)
+    if backend == "record":
+        from my_agent.llm_cassette import recording_model
+
+        return recording_model(agent_name, default)
+    if backend == "replay":
+        from my_agent.llm_cassette import replay_model
+
+        return replay_model(agent_name, default)
+    raise ValueError(f"Unknown AGENT_MODEL_BACKEND {backend!r}")
+
+
+def model_name(model: Union[str, BaseLlm]) -> str:
+    """Display name for an agent's ``model`` field."""
+    return model if isinstance(model, str) else model.model
+
+
+def refresh_model_clients(agents: Iterable) -> None:
+    """Give each Gemini-backed agent a fresh model, and so a fresh client.
+
+    ADK caches the genai client on the resolved model, so a rotated
+    ``GOOGLE_API_KEY`` would otherwise only take effect after a restart.
+    A recording model gets a fresh inner model. Scripted and replayed
+    models have no client and are left alone.
+    """
+    for llm_agent in agents:
+        model = llm_agent.model
+        if isinstance(model, str):
+            llm_agent.model = LLMRegistry.new_llm(model)
+        elif isinstance(model, Gemini):
+            llm_agent.model = LLMRegistry.new_llm(model.model)
+        elif isinstance(getattr(model, "inner", None), Gemini):
+            model.inner = LLMRegistry.new_llm(model.inner.model)
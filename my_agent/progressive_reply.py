@@ -0,0 +1,156 @@
+"""Progressive Telegram replies built from streamed agent text.
+
+:class:`ProgressiveReply` sends a placeholder as soon as a message arrives.
+It then edits that message in place as agent text streams in, so the user
+sees the answer forming after the first token instead of after the whole
+turn. Edits are throttled to Telegram's limits; deltas that arrive between
+edits are coalesced into the next one. The final text is committed at the
+end and split into several messages if it exceeds Telegram's 4096-character
+limit.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import List, Optional
+
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_CHARS = 4096
+PLACEHOLDER = "…"
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_CHARS) -> List[str]:
+    """Split ``text`` into chunks of at most ``limit`` characters.
+
+    Splits prefer paragraph breaks, then line breaks, then spaces, and only
+    cut mid-word when a chunk has none of them.
+    """
+    chunks = []
+    while len(text) > limit:
+        window = text[:limit]
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = window.rfind(separator)
+            if cut > limit // 2:
+                break
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    chunks.append(text)
+    return [chunk for chunk in chunks if chunk] or [""]
+
+
+class ProgressiveReply:
+    """One reply message that is edited as agent text arrives.
+
+    ``feed`` is synchronous so it can be passed straight to a transport as
+    its ``on_text`` callback; edits happen on background tasks.
+    """
+
+    def __init__(self, message, min_interval: Optional[float] = None, placeholder: str = PLACEHOLDER):
+        self.message = message
+        self.min_interval = (
+            min_interval
+            if min_interval is not None
+            else float(os.getenv("TELEGRAM_EDIT_INTERVAL_SECONDS", "1.0"))
+        )
+        self.placeholder = placeholder
+        self.sent = None
+        self.text = ""
+        self.shown = ""
+        self.edits = 0
+        self.started_at: Optional[float] = None
+        self.first_text_at: Optional[float] = None
+        self._next_edit_at = 0.0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        """Milliseconds from the placeholder to the first streamed text."""
+        if self.started_at is None or self.first_text_at is None:
+            return None
+        return round((self.first_text_at - self.started_at) * 1000, 2)
+
+    async def start(self) -> None:
+        self.started_at = time.monotonic()
+        self.sent = await self.message.reply_text(self.placeholder)
+        self.shown = self.placeholder
+        self._next_edit_at = time.monotonic() + self.min_interval
+
+    def feed(self, delta: str) -> None:
+        if not delta:
+            return
+        if self.first_text_at is None:
+            self.first_text_at = time.monotonic()
+        self.text += delta
+        if self.sent is not None and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        delay = self._next_edit_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        # Only the first chunk is previewed; the rest is sent on finish.
+        await self._edit(split_message(self.text)[0])
+
+    async def _edit(self, text: str) -> None:
+        async with self._lock:
+            if not text or text == self.shown:
+                return
+            try:
+                await self.sent.edit_text(text)
+                self.shown = text
+                self.edits += 1
+                self._next_edit_at = time.monotonic() + self.min_interval
+            except RetryAfter as exc:
+                retry_after = exc.retry_after
+                if not isinstance(retry_after, (int, float)):
+                    retry_after = retry_after.total_seconds()
+                self._next_edit_at = time.monotonic() + retry_after
+                logger.warning("Telegram asked to slow down edits for %.1fs", retry_after)
+            except BadRequest as exc:
+                if "not modified" in str(exc).lower():
+                    self.shown = text
+                    return
+                # e.g. the message was deleted; finish() sends a new one.
+                logger.debug("Skipping reply edit: %s", exc)
+            except TelegramError as exc:
+                # NetworkError, TimedOut and the like; never let them escape
+                # the background flush task. finish() retries, then falls back.
+                logger.warning("Reply edit failed: %s", exc)
+
+    async def finish(self, final_text: str) -> None:
+        """Commit ``final_text``, replacing the streamed preview."""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        chunks = split_message(final_text or "(no response)")
+        if self.sent is None:
+            self.sent = await self.message.reply_text(chunks[0])
+            self.shown = chunks[0]
+        elif chunks[0] != self.shown:
+            delay = self._next_edit_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self._edit(chunks[0])
+            if self.shown != chunks[0]:
+                # Rate limited or a transient error; retry once rather than lose the answer.
+                await asyncio.sleep(max(self._next_edit_at - time.monotonic(), 0))
+                await self._edit(chunks[0])
+            if self.shown != chunks[0]:
+                # The placeholder can no longer be edited; send the answer fresh.
+                logger.warning("Could not edit the reply; sending the answer as a new message")
+                self.sent = await self.message.reply_text(chunks[0])
+                self.shown = chunks[0]
+        for chunk in chunks[1:]:
+            await self.message.reply_text(chunk)
@@ -0,0 +1,252 @@
+"""Outbound rate limiting for the Telegram bots.
+
+Telegram enforces a bot-wide send limit (about 30 requests per second) and
+per-chat limits (about one message per second in a private chat and 20 per
+minute in a group). :class:`TelegramRateLimiter` keeps a token bucket for each
+of them and delays requests until both have a token, so bursts are smoothed
+out instead of failing with ``429 Too Many Requests``.
+
+- Each chat's requests wait for that chat's bucket in FIFO order.
+- They then queue for the global bucket by priority. Callback answers go
+  first, messages next and progressive-reply edits last.
+- A ``RetryAfter`` pauses the chat, or every chat when the request has no
+  chat. The pause is the requested delay plus jitter, after which the
+  request is queued again, up to ``max_retries`` times.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Callable, Coroutine, Deque, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from my_agent.stats_util import percentile
+
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+MAX_TRACKED_CHATS = 10_000
+
+# Lower value is sent first when the global bucket is the bottleneck.
+ENDPOINT_PRIORITIES = {
+    "answerCallbackQuery": PRIORITY_HIGH,
+    "answerInlineQuery": PRIORITY_HIGH,
+    "editMessageText": PRIORITY_LOW,
+    "sendChatAction": PRIORITY_LOW,
+}
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, at most ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_idle(self) -> bool:
+        self._refill(self.clock())
+        return self.tokens >= self.capacity and self.paused_until <= self.updated
+
+    def delay(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+        now = self.clock()
+        self._refill(now)
+        wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+        return max(wait, self.paused_until - now)
+
+    def consume(self) -> None:
+        self._refill(self.clock())
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+class TelegramRateLimiter(BaseRateLimiter[Union[int, Dict[str, Any]]]):
+    """Global and per-chat token buckets with a priority queue and 429 retries.
+
+    ``rate_limit_args`` on a bot call may be an int priority or
+    ``{"priority": n}``; otherwise the priority comes from the endpoint.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate: float = 20 / 60,
+        max_retries: int = 3,
+        retry_jitter: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.retry_jitter = retry_jitter
+        self.clock = clock
+        self._global = TokenBucket(global_rate, global_rate, clock)
+        self._chats: Dict[Any, TokenBucket] = {}
+        self._chat_locks: Dict[Any, asyncio.Lock] = {}
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._queue_latencies: Deque[float] = deque(maxlen=1000)
+        self._counters = {"sent": 0, "queued": 0, "retry_after": 0, "gave_up": 0}
+
+    @classmethod
+    def from_env(cls) -> "TelegramRateLimiter":
+        return cls(
+            global_rate=float(os.getenv("TELEGRAM_GLOBAL_RATE", "30")),
+            chat_rate=float(os.getenv("TELEGRAM_CHAT_RATE", "1")),
+            chat_burst=float(os.getenv("TELEGRAM_CHAT_BURST", "3")),
+            group_rate=float(os.getenv("TELEGRAM_GROUP_RATE_PER_MINUTE", "20")) / 60,
+            max_retries=int(os.getenv("TELEGRAM_MAX_RETRIES", "3")),
+        )
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for *_, future in self._waiters:
+            if not future.done():
+                future.cancel()
+        self._waiters.clear()
+
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= MAX_TRACKED_CHATS:
+                self._prune_idle_chats()
+            # Group and channel ids are negative and have a much lower limit.
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst, self.clock)
+            self._chat_locks[chat_id] = asyncio.Lock()
+        return bucket
+
+    def _prune_idle_chats(self) -> None:
+        # A full, unpaused, unlocked bucket behaves exactly like a new one.
+        for chat_id in [c for c, b in self._chats.items() if b.is_idle() and not self._chat_locks[c].locked()]:
+            del self._chats[chat_id]
+            del self._chat_locks[chat_id]
+
+    @staticmethod
+    def _priority(endpoint: str, rate_limit_args: Any) -> int:
+        if isinstance(rate_limit_args, int):
+            return rate_limit_args
+        if isinstance(rate_limit_args, dict) and "priority" in rate_limit_args:
+            return int(rate_limit_args["priority"])
+        return ENDPOINT_PRIORITIES.get(endpoint, PRIORITY_NORMAL)
+
+    async def _acquire_global(self, priority: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        # Re-checks the heap after every wait so a later high-priority request
+        # can overtake queued low-priority ones.
+        while self._waiters:
+            wait = self._global.delay()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self._global.consume()
+            future.set_result(None)
+
+    async def _acquire(self, chat_id: Any, priority: int) -> None:
+        if chat_id is None:
+            await self._acquire_global(priority)
+            return
+        bucket = self._chat_bucket(chat_id)
+        async with self._chat_locks[chat_id]:
+            while (wait := bucket.delay()) > 0:
+                await asyncio.sleep(wait)
+            bucket.consume()
+            await self._acquire_global(priority)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Union[int, Dict[str, Any]]],
+    ) -> Any:
+        chat_id = data.get("chat_id")
+        priority = self._priority(endpoint, rate_limit_args)
+        for attempt in range(self.max_retries + 1):
+            queued_at = self.clock()
+            self._counters["queued"] += 1
+            try:
+                await self._acquire(chat_id, priority)
+            finally:
+                self._counters["queued"] -= 1
+            self._queue_latencies.append(self.clock() - queued_at)
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                self._counters["retry_after"] += 1
+                retry_after = exc.retry_after
+                if not isinstance(retry_after, (int, float)):
+                    retry_after = retry_after.total_seconds()
+                pause = retry_after + random.uniform(0, self.retry_jitter)
+                if chat_id is None:
+                    self._global.pause(pause)
+                else:
+                    self._chat_bucket(chat_id).pause(pause)
+                if attempt == self.max_retries:
+                    self._counters["gave_up"] += 1
+                    logger.warning(
+                        "Telegram %s hit a flood limit (chat %s); giving up after %d attempts",
+                        endpoint, chat_id, self.max_retries + 1,
+                    )
+                    raise
+                logger.warning(
+                    "Telegram %s hit a flood limit (chat %s); retrying in %.2fs (attempt %d/%d)",
+                    endpoint, chat_id, pause, attempt + 1, self.max_retries + 1,
+                )
+                continue
+            self._counters["sent"] += 1
+            return result
+
+    def get_stats(self) -> dict:
+        """Queue depth, send/retry counts and queue latency percentiles (ms)."""
+        latencies = [v * 1000 for v in self._queue_latencies]
+        return {
+            **self._counters,
+            "waiting_for_global": len(self._waiters),
+            "chats_tracked": len(self._chats),
+            "queue_latency_p50_ms": round(percentile(latencies, 0.50), 2) if latencies else 0.0,
+            "queue_latency_p95_ms": round(percentile(latencies, 0.95), 2) if latencies else 0.0,
+            "queue_latency_max_ms": round(max(latencies), 2) if latencies else 0.0,
+        }
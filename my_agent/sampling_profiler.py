@@ -0,0 +1,220 @@
+"""Sampling profiler for a live instance, served by ``/debug/profile``.
+
+A background thread takes stack samples ``hz`` times per second for the
+requested number of seconds. It returns them as collapsed stacks, one
+``frame;frame;frame count`` line per distinct stack, ready for
+``flamegraph.pl`` or speedscope. Modes:
+
+- ``wall``: every thread's stack from ``sys._current_frames()``, running
+  or not
+- ``cpu``: only threads that used CPU since the previous sample, judged
+  from ``/proc/self/task/<tid>/stat``. Without ``/proc``, threads parked
+  in a known wait are skipped instead.
+- ``asyncio``: every task on the event loop, as the chain of coroutines it
+  is awaiting through. The running task ends in ``[running]``, the others
+  in ``[awaiting]``.
+
+A sampling thread only sees another thread's stack once that thread
+drops the GIL. A busy thread drops it every switch interval (5 ms by
+default), but the event loop also drops it at once whenever it enters
+``select``. Samples of the loop thread are therefore biased toward I/O
+waits. Short CPU bursts between waits are under-counted; longer ones,
+such as a blocking tool call, still show. The switch interval is left
+alone: lowering it would slow the whole process in a way the overhead
+figure cannot see.
+
+Overhead is bounded. The sampler measures its own CPU time, and while that
+exceeds ``max_overhead`` of wall time it stretches the interval.
+The result reports the effective rate and overhead. Only one profile runs
+at a time.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+MODES = ("cpu", "wall", "asyncio")
+# Leaf functions of threads that are waiting rather than working.
+IDLE_FUNCTIONS = frozenset({"wait", "select", "poll", "epoll", "_worker", "get", "sleep", "accept", "_wait_for_tstate_lock"})
+
+profile_lock = threading.Lock()
+
+
+@dataclass
+class ProfileResult:
+    mode: str
+    seconds: float
+    ticks: int = 0
+    samples: int = 0
+    sample_time: float = 0.0
+    requested_hz: float = 0.0
+    stacks: Counter = field(default_factory=Counter)
+
+    @property
+    def overhead_pct(self) -> float:
+        return round(self.sample_time / self.seconds * 100, 2) if self.seconds else 0.0
+
+    @property
+    def effective_hz(self) -> float:
+        return round(self.ticks / self.seconds, 1) if self.seconds else 0.0
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def to_dict(self, top: int = 50) -> dict:
+        return {
+            "mode": self.mode,
+            "seconds": round(self.seconds, 3),
+            "ticks": self.ticks,
+            "samples": self.samples,
+            "requested_hz": self.requested_hz,
+            "effective_hz": self.effective_hz,
+            "overhead_pct": self.overhead_pct,
+            "stacks": dict(self.stacks.most_common(top)),
+        }
+
+
+def _label(code) -> str:
+    filename = code.co_filename
+    for marker in ("site-packages" + os.sep, "lib" + os.sep + "python"):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    else:
+        filename = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _frame_stack(frame, max_depth: int) -> List[str]:
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+def _task_stack(task: asyncio.Task, running: bool, max_depth: int) -> List[str]:
+    labels = [f"task:{task.get_name()}"]
+    coro = task.get_coro()
+    while coro is not None and len(labels) < max_depth:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        labels.append(_label(frame.f_code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    labels.append("[running]" if running else "[awaiting]")
+    return labels
+
+
+def _thread_cpu_ticks(native_id: int) -> Optional[int]:
+    try:
+        with open(f"/proc/self/task/{native_id}/stat", "rb") as f:
+            fields = f.read().rsplit(b")", 1)[1].split()
+        # utime and stime are fields 14 and 15; fields[0] here is field 3.
+        return int(fields[11]) + int(fields[12])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class SamplingProfiler:
+    def __init__(self, hz: float = 100.0, max_overhead: float = 0.05, max_depth: int = 64):
+        self.hz = hz
+        self.max_overhead = max_overhead
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_env(cls) -> "SamplingProfiler":
+        return cls(
+            hz=float(os.getenv("PROFILE_SAMPLE_HZ", "100")),
+            max_overhead=float(os.getenv("PROFILE_MAX_OVERHEAD", "0.05")),
+        )
+
+    def run(
+        self,
+        seconds: float,
+        mode: str = "wall",
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        exclude_task: Optional[asyncio.Task] = None,
+    ) -> ProfileResult:
+        """Sample for ``seconds`` from the calling thread (blocking).
+
+        ``asyncio`` mode needs ``loop``; ``exclude_task`` (usually the
+        request doing the profiling) is left out of the samples.
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if mode == "asyncio" and loop is None:
+            raise ValueError("asyncio mode needs the event loop to sample")
+        result = ProfileResult(mode=mode, seconds=seconds, requested_hz=self.hz)
+        interval = 1.0 / self.hz
+        own = threading.get_ident()
+        names: Dict[int, str] = {}
+        native: Dict[int, Optional[int]] = {}
+        cpu_seen: Dict[int, Optional[int]] = {}
+        start = time.perf_counter()
+        deadline = start + seconds
+
+        while True:
+            tick_start = time.perf_counter()
+            if tick_start >= deadline:
+                break
+            cpu_start = time.thread_time()
+            if mode == "asyncio":
+                self._sample_tasks(result, loop, exclude_task)
+            else:
+                if len(names) != threading.active_count():
+                    for thread in threading.enumerate():
+                        names[thread.ident] = thread.name
+                        native[thread.ident] = getattr(thread, "native_id", None)
+                self._sample_threads(result, mode, own, names, native, cpu_seen)
+            result.ticks += 1
+            result.sample_time += time.thread_time() - cpu_start
+            spent = time.perf_counter() - tick_start
+            elapsed = time.perf_counter() - start
+            # Stretch the interval while sampling costs more than its budget.
+            if result.sample_time > self.max_overhead * elapsed:
+                interval = min(interval * 1.5, 1.0)
+            elif interval > 1.0 / self.hz:
+                interval = max(interval / 1.2, 1.0 / self.hz)
+            time.sleep(max(0.0, min(interval - spent, deadline - time.perf_counter())))
+
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def _sample_threads(self, result, mode, own, names, native, cpu_seen) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            if mode == "cpu":
+                native_id = native.get(ident)
+                ticks = _thread_cpu_ticks(native_id) if native_id else None
+                if ticks is None:
+                    if frame.f_code.co_name in IDLE_FUNCTIONS:
+                        continue
+                else:
+                    previous = cpu_seen.get(ident)
+                    cpu_seen[ident] = ticks
+                    if previous is None or ticks == previous:
+                        continue
+            stack = [f"thread:{names.get(ident, ident)}"] + _frame_stack(frame, self.max_depth)
+            result.stacks[";".join(stack)] += 1
+            result.samples += 1
+
+    def _sample_tasks(self, result, loop, exclude_task) -> None:
+        try:
+            tasks = asyncio.all_tasks(loop)
+        except RuntimeError:
+            return  # the task set changed under us; skip this tick
+        running = asyncio.current_task(loop)
+        for task in tasks:
+            if task is exclude_task or task.done():
+                continue
+            stack = _task_stack(task, task is running, self.max_depth)
+            result.stacks[";".join(stack)] += 1
+            result.samples += 1
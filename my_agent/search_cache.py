@@ -0,0 +1,203 @@
+"""In-memory result cache for knowledge base searches.
+
+Entries are evicted by TTL and by LRU order once ``max_entries`` is reached.
+Concurrent lookups for the same key share a single load (single-flight), and
+entries past their TTL but inside the stale window are served immediately
+while one background refresh runs.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from my_agent.env_util import env_number
+
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace so trivial variants share an entry."""
+    return " ".join(query.casefold().split())
+
+
+def estimate_size(value: Any) -> int:
+    """Rough payload size in bytes for cached search results."""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    return len(str(value).encode("utf-8"))
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    stored_at: float
+
+
+class QueryResultCache:
+    """TTL + LRU cache with request coalescing and stale-while-revalidate."""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 300.0,
+        stale_seconds: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._refresher: Optional[ThreadPoolExecutor] = None
+        self._bytes = 0
+        self.counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    @classmethod
+    def from_env(cls) -> "QueryResultCache":
+        return cls(
+            max_entries=env_number("KNOWLEDGE_BASE_CACHE_MAX_ENTRIES", 512, int),
+            ttl_seconds=env_number("KNOWLEDGE_BASE_CACHE_TTL_SECONDS", 300.0, float),
+            stale_seconds=env_number("KNOWLEDGE_BASE_CACHE_STALE_SECONDS", 60.0, float),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @staticmethod
+    def make_key(query: str, data_store_id: str, page_size: int) -> Tuple[str, str, int]:
+        return (normalize_query(query), data_store_id, page_size)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key`` or compute it with ``loader``.
+
+        Exceptions raised by ``loader`` propagate to every coalesced caller and
+        are never cached.
+        """
+        if not self.enabled:
+            return loader()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self._clock() - entry.stored_at
+                if age < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry.value
+                if age < self.ttl_seconds + self.stale_seconds:
+                    self._entries.move_to_end(key)
+                    self.counters["stale_hits"] += 1
+                    if key not in self._inflight:
+                        self._inflight[key] = Future()
+                        self._start_refresh(key, loader)
+                    return entry.value
+                self._remove(key)
+                self.counters["expirations"] += 1
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.counters["coalesced"] += 1
+                owner = False
+            else:
+                self.counters["misses"] += 1
+                future = self._inflight[key] = Future()
+                owner = True
+
+        if not owner:
+            return future.result()
+
+        self._load(key, loader, future)
+        return future.result()
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], future: Future) -> None:
+        try:
+            value = loader()
+        except BaseException as exc:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(exc)
+            return
+        with self._lock:
+            self._store(key, value)
+            self._inflight.pop(key, None)
+        future.set_result(value)
+
+    def _start_refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        # Called with the lock held.
+        if self._refresher is None:
+            self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="kb-cache-refresh")
+        self.counters["refreshes"] += 1
+        future = self._inflight[key]
+        self._refresher.submit(self._refresh, key, loader, future)
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], future: Future) -> None:
+        self._load(key, loader, future)
+        exc = future.exception()
+        if exc is not None:
+            # Keep serving the stale entry until it falls out of the window.
+            with self._lock:
+                self.counters["refresh_errors"] += 1
+            logger.warning("Knowledge base cache refresh failed: %s", exc)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(value=value, size=estimate_size(value), stored_at=self._clock())
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.counters["evictions"] += 1
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for name in self.counters:
+                self.counters[name] = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            entries = len(self._entries)
+            bytes_held = self._bytes
+        served = counters["hits"] + counters["stale_hits"] + counters["coalesced"]
+        lookups = served + counters["misses"]
+        return {
+            **counters,
+            "entries": entries,
+            "bytes": bytes_held,
+            "hit_rate": round(served / lookups, 4) if lookups else 0.0,
+            "enabled": self.enabled,
+        }
+
+
+# Global cache instance to be reused across app
+search_cache = QueryResultCache.from_env()
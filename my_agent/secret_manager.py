@@ -7,11 +7,18 @@ credentials to the repository or .env files.
 
 from __future__ import annotations
 
+import json
 import logging
 import os
-from typing import Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 
-from google.cloud import secretmanager
+from my_agent.lazy_import import lazy_import
+
+# Only loaded when a secret is actually fetched.
+secretmanager = lazy_import("google.cloud.secretmanager")
 
 
 def _build_secret_name(secret_id: str, project_id: str, version: str) -> str:
@@ -32,6 +39,7 @@ def get_secret_value(
     *,
     project_id: Optional[str] = None,
     version: str = "latest",
+    client=None,
 ) -> str:
     """Fetch a secret value from Google Secret Manager.
 
@@ -41,19 +49,23 @@ def get_secret_value(
             qualified, this value (or the ``GCP_PROJECT_ID`` environment
             variable) is used to build the resource name.
         version: Secret version; defaults to ``latest``.
+        client: Optional ``SecretManagerServiceClient`` to reuse.
 
     Returns:
         The decoded secret payload.
     """
 
+    name = _resolve_secret_name(secret_id, project_id, version)
+    client = client or secretmanager.SecretManagerServiceClient()
+    response = client.access_secret_version(name=name)
+    return response.payload.data.decode("utf-8")
+
+
+def _resolve_secret_name(secret_id: str, project_id: Optional[str], version: str) -> str:
     resolved_project_id = project_id or os.getenv("GCP_PROJECT_ID")
     if not resolved_project_id and not secret_id.startswith("projects/"):
         raise ValueError("project_id or GCP_PROJECT_ID is required to access secrets")
-
-    name = _build_secret_name(secret_id, resolved_project_id, version)
-    client = secretmanager.SecretManagerServiceClient()
-    response = client.access_secret_version(name=name)
-    return response.payload.data.decode("utf-8")
+    return _build_secret_name(secret_id, resolved_project_id, version)
 
 
 def load_secret_into_env(
@@ -88,3 +100,236 @@ def load_secret_into_env(
             logger.error("Failed to load secret for %s: %s", env_var, exc)
         else:
             raise
+
+
+def _read_cache(path: str, ttl_seconds: float) -> Dict[str, dict]:
+    """Return unexpired entries from the local secret cache file."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    now = time.time()
+    return {
+        name: entry
+        for name, entry in entries.items()
+        if now - entry.get("fetched_at", 0) < ttl_seconds
+    }
+
+
+def _write_cache(path: str, entries: Dict[str, dict]) -> None:
+    """Write the cache file readable by the current user only."""
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    os.replace(tmp_path, path)
+
+
+def load_secrets_into_env(
+    mapping: Dict[str, str],
+    *,
+    project_id: Optional[str] = None,
+    version: str = "latest",
+    logger: Optional[logging.Logger] = None,
+    watch: bool = False,
+) -> dict:
+    """Populate several environment variables from Secret Manager at once.
+
+    ``mapping`` maps each target variable to the variable holding its secret
+    ID, as in :func:`load_secret_into_env`. Variables that are already set or
+    have no secret ID are skipped. The remaining secrets are fetched
+    concurrently over one shared client.
+
+    When ``SECRET_CACHE_PATH`` and ``SECRET_CACHE_TTL_SECONDS`` are set,
+    values fetched within the TTL are read from that file instead, which
+    speeds up rapid restarts. With ``watch=True`` and
+    ``SECRET_ROTATION_INTERVAL_SECONDS`` set, a background thread keeps the
+    variables in sync with new secret versions.
+
+    Returns:
+        Timing summary with ``elapsed_ms``, ``fetched`` and ``cached`` counts.
+    """
+
+    start = time.perf_counter()
+    pending: List[Tuple[str, str, str]] = []
+    for env_var, secret_env_var in mapping.items():
+        if os.getenv(env_var):
+            continue
+        secret_id = os.getenv(secret_env_var)
+        if not secret_id:
+            continue
+        try:
+            pending.append((env_var, secret_id, _resolve_secret_name(secret_id, project_id, version)))
+        except ValueError as exc:
+            if not logger:
+                raise
+            logger.error("Failed to load secret for %s: %s", env_var, exc)
+
+    summary = {"elapsed_ms": 0.0, "fetched": 0, "cached": 0, "failed": 0}
+    if not pending:
+        return summary
+
+    cache_path = os.getenv("SECRET_CACHE_PATH")
+    cache_ttl = float(os.getenv("SECRET_CACHE_TTL_SECONDS", "0") or 0)
+    cache = _read_cache(cache_path, cache_ttl) if cache_path and cache_ttl > 0 else {}
+
+    to_fetch = []
+    watched: List[Tuple[str, str, Optional[str]]] = []
+    for env_var, secret_id, name in pending:
+        entry = cache.get(name)
+        if entry is not None:
+            os.environ[env_var] = entry["value"]
+            summary["cached"] += 1
+            watched.append((env_var, name, entry.get("version")))
+        else:
+            to_fetch.append((env_var, secret_id, name))
+
+    client = None
+    errors = []
+    if to_fetch:
+        client = secretmanager.SecretManagerServiceClient()
+
+        def _fetch(item):
+            env_var, secret_id, name = item
+            response = client.access_secret_version(name=name)
+            return response.payload.data.decode("utf-8"), response.name
+
+        with ThreadPoolExecutor(max_workers=len(to_fetch), thread_name_prefix="secret-fetch") as pool:
+            futures = [(item, pool.submit(_fetch, item)) for item in to_fetch]
+            for (env_var, secret_id, name), future in futures:
+                try:
+                    value, resolved_version = future.result()
+                except Exception as exc:
+                    summary["failed"] += 1
+                    errors.append(exc)
+                    if logger:
+                        logger.error("Failed to load secret for %s: %s", env_var, exc)
+                    continue
+                os.environ[env_var] = value
+                summary["fetched"] += 1
+                cache[name] = {"value": value, "version": resolved_version, "fetched_at": time.time()}
+                watched.append((env_var, name, resolved_version))
+                if logger:
+                    logger.info("Loaded %s from Secret Manager secret %s", env_var, secret_id)
+
+        if cache_path and cache_ttl > 0 and summary["fetched"]:
+            try:
+                _write_cache(cache_path, cache)
+            except OSError as exc:  # pragma: no cover - cache is best effort
+                if logger:
+                    logger.warning("Could not write secret cache %s: %s", cache_path, exc)
+
+    summary["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    if logger:
+        logger.info(
+            "Secret hydration took %.2f ms (fetched=%d cached=%d failed=%d)",
+            summary["elapsed_ms"],
+            summary["fetched"],
+            summary["cached"],
+            summary["failed"],
+        )
+    if errors and not logger:
+        raise errors[0]
+
+    interval = float(os.getenv("SECRET_ROTATION_INTERVAL_SECONDS", "0") or 0)
+    if watch and interval > 0 and watched:
+        start_secret_rotation(watched, interval=interval, client=client, logger=logger)
+    return summary
+
+
+class SecretRotationWatcher:
+    """Background poller that reloads secrets when a new version appears.
+
+    Each poll reads only version metadata for ``versions/latest``; the payload
+    is fetched again only when the resolved version name changes.
+    """
+
+    def __init__(
+        self,
+        entries: List[Tuple[str, str, Optional[str]]],
+        *,
+        interval: float,
+        client=None,
+        logger: Optional[logging.Logger] = None,
+    ):
+        # entries: (env_var, secret version resource name, last seen version name)
+        self.entries = list(entries)
+        self.interval = interval
+        self._client = client
+        self._logger = logger or logging.getLogger(__name__)
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.rotations = 0
+
+    def add_listener(self, callback: Callable[[str, str], None]) -> None:
+        """Call ``callback(env_var, new_value)`` after each rotation."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[str, str], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="secret-rotation", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check_once()
+
+    def check_once(self) -> int:
+        """Poll every watched secret once and return how many rotated."""
+        if self._client is None:
+            self._client = secretmanager.SecretManagerServiceClient()
+        rotated = 0
+        for i, (env_var, name, seen_version) in enumerate(self.entries):
+            try:
+                current = self._client.get_secret_version(name=name).name
+                if current == seen_version:
+                    continue
+                response = self._client.access_secret_version(name=current)
+                value = response.payload.data.decode("utf-8")
+            except Exception as exc:
+                self._logger.warning("Secret rotation check failed for %s: %s", env_var, exc)
+                continue
+            os.environ[env_var] = value
+            self.entries[i] = (env_var, name, current)
+            rotated += 1
+            self.rotations += 1
+            self._logger.info("Secret for %s rotated to %s", env_var, current)
+            for callback in self._listeners:
+                try:
+                    callback(env_var, value)
+                except Exception:  # pragma: no cover - listener bugs must not stop polling
+                    self._logger.error("Secret rotation listener failed", exc_info=True)
+        return rotated
+
+
+_rotation_watcher: Optional[SecretRotationWatcher] = None
+
+
+def start_secret_rotation(entries, *, interval: float, client=None, logger=None) -> SecretRotationWatcher:
+    """Start (or replace) the process-wide :class:`SecretRotationWatcher`."""
+    global _rotation_watcher
+    stop_secret_rotation()
+    _rotation_watcher = SecretRotationWatcher(entries, interval=interval, client=client, logger=logger)
+    _rotation_watcher.start()
+    return _rotation_watcher
+
+
+def stop_secret_rotation() -> None:
+    global _rotation_watcher
+    if _rotation_watcher is not None:
+        _rotation_watcher.stop()
+        _rotation_watcher = None
+
+
+def get_rotation_watcher() -> Optional[SecretRotationWatcher]:
+    return _rotation_watcher
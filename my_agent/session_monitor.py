@@ -25,6 +25,13 @@ class SessionInfo:
     status: str = "created"
     message_count: int = 0
     error_count: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    model_calls: int = 0
+    last_turn_tokens: int = 0
+    # Counted against SESSION_TOKEN_BUDGET; reset when the session is compacted.
+    budget_tokens: int = 0
+    compactions: int = 0
     events: List[SessionEvent] = field(default_factory=list)
     alerts: List[str] = field(default_factory=list)
 
@@ -96,6 +103,32 @@ class SessionMonitor:
         session.message_count += 1
         session.last_event_at = time.time()
 
+    def record_usage(
+        self,
+        session_id: str,
+        user_id: str,
+        agent_name: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        model_calls: int = 1,
+    ) -> None:
+        session = self._get_or_create(session_id, user_id, agent_name)
+        session.prompt_tokens += prompt_tokens
+        session.completion_tokens += completion_tokens
+        session.model_calls += model_calls
+        session.last_turn_tokens = prompt_tokens + completion_tokens
+        session.budget_tokens += prompt_tokens + completion_tokens
+
+    def over_budget(self, session_id: str, budget: int) -> bool:
+        session = self.sessions.get(session_id)
+        return bool(budget) and session is not None and session.budget_tokens >= budget
+
+    def reset_budget(self, session_id: str) -> None:
+        session = self.sessions.get(session_id)
+        if session:
+            session.budget_tokens = 0
+            session.compactions += 1
+
     def pop_alerts(self, session_id: str) -> List[str]:
         session = self.sessions.get(session_id)
         if not session:
@@ -115,6 +148,7 @@ class SessionMonitor:
             parts.append(
                 f"- {info.session_id} (user={info.user_id}, agent={info.agent_name}): "
                 f"status={info.status}, messages={info.message_count}, errors={info.error_count}, "
+                f"tokens={info.prompt_tokens + info.completion_tokens}, "
                 f"age={age}s, last_event={last}s ago"
             )
         return "\n".join(parts)
@@ -127,6 +161,9 @@ class SessionMonitor:
             f"Session {session_id} (user={info.user_id}, agent={info.agent_name})",
             f"Status: {info.status}",
             f"Messages: {info.message_count}, Errors: {info.error_count}",
+            f"Tokens: prompt={info.prompt_tokens}, completion={info.completion_tokens}, "
+            f"total={info.prompt_tokens + info.completion_tokens}, last turn={info.last_turn_tokens}, "
+            f"model calls={info.model_calls}, compactions={info.compactions}",
             f"Created: {time.ctime(info.created_at)}",
             f"Last event: {time.ctime(info.last_event_at)}",
             "Recent events:",
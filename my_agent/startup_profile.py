@@ -0,0 +1,203 @@
+"""Cold start profiler for the API app.
+
+Run ``python -m my_agent.startup_profile`` to measure, in fresh interpreters:
+
+- ``import app`` wall time, plus a ``-X importtime`` breakdown aggregated
+  by package
+- Secret Manager hydration
+- construction of the ADK ``Runner`` and session service
+- the first ``/health`` and first ``/api/chat`` (test mode) latency, served
+  in-process through the app's lifespan
+
+The report is printed as JSON. With ``--history`` each run is appended to a
+JSONL file, and the report includes deltas against the previous run.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY = ".startup_profile_history.jsonl"
+
+# Namespace packages whose children are reported separately.
+NAMESPACE_PACKAGES = {"google", "google.cloud"}
+
+# Runs in a clean interpreter so nothing is pre-imported by this module.
+PROBE = """
+import json, os, time
+os.environ.setdefault("ADK_TEST_MODE", "true")
+start = time.perf_counter()
+import app
+import_ms = (time.perf_counter() - start) * 1000
+from fastapi.testclient import TestClient
+phases = {"app_import_ms": import_ms}
+start = time.perf_counter()
+with TestClient(app.app) as client:
+    phases["lifespan_startup_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    health = client.get("/health")
+    phases["first_health_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    chat = client.post("/api/chat", json={"message": "ping", "session_id": "startup_profile"})
+    phases["first_chat_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    client.post("/api/chat", json={"message": "ping", "session_id": "startup_profile"})
+    phases["second_chat_ms"] = (time.perf_counter() - start) * 1000
+phases.update(app.startup_timings)
+print(json.dumps({
+    "phases": {k: round(v, 2) for k, v in phases.items()},
+    "secret_hydration": app.secret_hydration,
+    "status_codes": {"health": health.status_code, "chat": chat.status_code},
+}))
+"""
+
+
+def package_of(module: str) -> str:
+    """Group a module under its top-level package (one level deeper for namespaces)."""
+    parts = module.split(".")
+    depth = 1
+    while depth < len(parts) and ".".join(parts[:depth]) in NAMESPACE_PACKAGES:
+        depth += 1
+    return ".".join(parts[:depth])
+
+
+def parse_importtime(stderr: str) -> List[dict]:
+    """Parse ``-X importtime`` output into ``{module, self_us, cumulative_us}`` rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # header line
+        rows.append(
+            {
+                "module": fields[2].strip(),
+                "self_us": int(fields[0]),
+                "cumulative_us": int(fields[1]),
+            }
+        )
+    return rows
+
+
+def aggregate_by_package(rows: List[dict], top: int = 15) -> List[dict]:
+    """Sum self time per package, largest first."""
+    totals: Dict[str, int] = defaultdict(int)
+    counts: Dict[str, int] = defaultdict(int)
+    for row in rows:
+        package = package_of(row["module"])
+        totals[package] += row["self_us"]
+        counts[package] += 1
+    ordered = sorted(totals, key=totals.get, reverse=True)[:top]
+    return [
+        {"package": p, "self_ms": round(totals[p] / 1000, 2), "modules": counts[p]}
+        for p in ordered
+    ]
+
+
+def _run_probe(extra_args: List[str]) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    env.setdefault("ADK_TEST_MODE", "true")
+    return subprocess.run(
+        [sys.executable, *extra_args, "-c", PROBE],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def profile(top: int = 15, importtime: bool = True) -> dict:
+    """Run the probe and return the full startup report."""
+    result = _run_probe([])
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup probe failed:\n{result.stderr}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    if importtime:
+        # Separate run: -X importtime inflates wall-clock numbers.
+        traced = _run_probe(["-X", "importtime"])
+        rows = parse_importtime(traced.stderr)
+        app_index = next((i for i, r in enumerate(rows) if r["module"] == "app"), None)
+        app_row = rows[app_index] if app_index is not None else None
+        if app_index is not None:
+            # Later rows come from lifespan warm-up, not from `import app`.
+            rows = rows[: app_index + 1]
+        report["import_breakdown"] = {
+            "app_cumulative_ms": round(app_row["cumulative_us"] / 1000, 2) if app_row else None,
+            "by_package": aggregate_by_package(rows, top=top),
+        }
+
+    report["timestamp"] = time.time()
+    report["git_revision"] = _git_revision()
+    report["python"] = platform.python_version()
+    return report
+
+
+def compare(current: dict, previous: dict) -> Dict[str, dict]:
+    """Per-phase deltas (ms) between two reports."""
+    deltas = {}
+    for phase, value in current.get("phases", {}).items():
+        before = previous.get("phases", {}).get(phase)
+        if before is None:
+            continue
+        deltas[phase] = {"previous": before, "current": value, "delta": round(value - before, 2)}
+    return deltas
+
+
+def _last_history_entry(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    last = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                last = line
+    return json.loads(last) if last else None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Profile API cold start phases.")
+    parser.add_argument("--history", nargs="?", const=DEFAULT_HISTORY, default=None,
+                        help=f"Append the run to a JSONL history file (default {DEFAULT_HISTORY}) "
+                             "and compare against the previous entry.")
+    parser.add_argument("--top", type=int, default=15, help="Packages to list in the import breakdown.")
+    parser.add_argument("--no-importtime", action="store_true", help="Skip the -X importtime run.")
+    args = parser.parse_args(argv)
+
+    report = profile(top=args.top, importtime=not args.no_importtime)
+    if args.history:
+        previous = _last_history_entry(args.history)
+        if previous:
+            report["compared_to"] = {
+                "git_revision": previous.get("git_revision"),
+                "timestamp": previous.get("timestamp"),
+                "phases": compare(report, previous),
+            }
+        with open(args.history, "a", encoding="utf-8") as f:
+            entry = {k: v for k, v in report.items() if k != "compared_to"}
+            f.write(json.dumps(entry) + "\n")
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Precompressed, content-hashed dashboard assets.
+
+``python -m my_agent.static_assets build`` copies ``static/`` into a build
+directory (``STATIC_BUILD_DIR``, default ``.static_build``):
+
+- every non-HTML asset gets a content hash in its name (``style.3fa2b1c94e.css``)
+  and HTML references to it are rewritten to the hashed URL
+- every compressible file also gets ``.gz`` and, when the ``brotli`` package
+  is installed, ``.br`` variants, kept only when smaller
+- ``manifest.json`` records each file's variants, sizes and ETag
+
+:class:`PrecompressedStaticFiles` serves that manifest. It picks the
+smallest variant the client's ``Accept-Encoding`` allows. Hashed URLs are
+cached as ``immutable`` for a year, and HTML and unhashed names are
+revalidated through their ``ETag``. A matching ``If-None-Match`` gets a
+``304`` from the in-memory manifest without touching the disk. Anything
+not in the manifest, or every file when no build exists, falls back to
+plain ``StaticFiles``.
+"""
+
+import argparse
+import gzip
+import hashlib
+import importlib.util
+import json
+import mimetypes
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+
+MANIFEST_VERSION = 1
+HASH_CHARS = 10
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+# Preferred when the client ranks encodings equally.
+ENCODING_ORDER = ("br", "gzip", "identity")
+SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+
+def _content_type(name: str) -> str:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps builds byte-for-byte reproducible.
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    import brotli
+
+    return brotli.compress(data, quality=11)
+
+
+def available_encodings() -> List[str]:
+    encodings = ["gzip"]
+    if importlib.util.find_spec("brotli") is not None:
+        encodings.insert(0, "br")
+    return encodings
+
+
+def build(src_dir: str = "static", out_dir: str = ".static_build") -> dict:
+    """Write hashed, precompressed copies of ``src_dir`` and return the manifest."""
+    sources: Dict[str, bytes] = {}
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                sources[os.path.relpath(path, src_dir).replace(os.sep, "/")] = f.read()
+
+    aliases: Dict[str, str] = {}
+    for name, data in sources.items():
+        if name.endswith(".html"):
+            continue
+        stem, ext = os.path.splitext(name)
+        digest = hashlib.sha256(data).hexdigest()[:HASH_CHARS]
+        aliases[name] = f"{stem}.{digest}{ext}"
+
+    outputs: Dict[str, Tuple[bytes, bool]] = {}
+    for name, data in sources.items():
+        if name.endswith(".html"):
+            text = data.decode("utf-8")
+            for original, hashed in aliases.items():
+                text = text.replace(f"/static/{original}", f"/static/{hashed}")
+            outputs[name] = (text.encode("utf-8"), False)
+        else:
+            outputs[aliases[name]] = (data, True)
+
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    os.makedirs(out_dir)
+    encodings = available_encodings()
+    assets = {}
+    for name, (data, immutable) in outputs.items():
+        path = os.path.join(out_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        content_type = _content_type(name)
+        entry = {
+            "etag": hashlib.sha256(data).hexdigest()[:16],
+            "content_type": content_type,
+            "immutable": immutable,
+            "files": {"identity": name},
+            "sizes": {"identity": len(data)},
+        }
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            for encoding in encodings:
+                compressed = _compress(data, encoding)
+                if len(compressed) >= len(data):
+                    continue
+                with open(path + SUFFIXES[encoding], "wb") as f:
+                    f.write(compressed)
+                entry["files"][encoding] = name + SUFFIXES[encoding]
+                entry["sizes"][encoding] = len(compressed)
+        assets[name] = entry
+
+    manifest = {"version": MANIFEST_VERSION, "assets": assets, "aliases": aliases}
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def negotiate(accept_encoding: Optional[str], available: List[str]) -> str:
+    """Pick the encoding from ``available`` the client ranks highest."""
+    weights: Dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+
+    def weight(encoding: str) -> float:
+        if encoding in weights:
+            return weights[encoding]
+        if encoding == "identity":
+            return weights.get("*", 1.0) if weights.get("identity", 1.0) else 0.0
+        return weights.get("*", 0.0)
+
+    candidates = [e for e in ENCODING_ORDER if e in available and weight(e) > 0]
+    if not candidates:
+        return "identity"
+    return max(candidates, key=lambda e: (weight(e), -ENCODING_ORDER.index(e)))
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        # Any representation of the same content counts as a match.
+        if candidate.strip('"').split("-", 1)[0] == etag:
+            return True
+    return False
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """``StaticFiles`` that prefers a :func:`build` output when one exists."""
+
+    def __init__(self, *, directory: str, build_dir: Optional[str] = None, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.build_dir = build_dir
+        self.assets: Dict[str, dict] = {}
+        self.aliases: Dict[str, str] = {}
+        manifest_path = os.path.join(build_dir, "manifest.json") if build_dir else None
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == MANIFEST_VERSION:
+                self.assets = manifest["assets"]
+                self.aliases = manifest["aliases"]
+
+    @property
+    def is_built(self) -> bool:
+        return bool(self.assets)
+
+    def response_for(self, name: str, request_headers: Headers) -> Optional[Response]:
+        """Response for asset ``name``, or None if it is not in the manifest."""
+        hashed = self.aliases.get(name)
+        entry = self.assets.get(hashed or name)
+        if entry is None:
+            return None
+        # Unhashed aliases can change between deploys, so they revalidate.
+        cache_control = IMMUTABLE if entry["immutable"] and hashed is None else REVALIDATE
+        headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, entry["etag"]):
+            headers["ETag"] = f'"{entry["etag"]}"'
+            return Response(status_code=304, headers=headers)
+
+        encoding = negotiate(request_headers.get("accept-encoding"), list(entry["files"]))
+        headers["ETag"] = f'"{entry["etag"]}"' if encoding == "identity" else f'"{entry["etag"]}-{encoding}"'
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return FileResponse(
+            os.path.join(self.build_dir, entry["files"][encoding]),
+            media_type=entry["content_type"],
+            headers=headers,
+        )
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if self.assets and scope["method"] in ("GET", "HEAD"):
+            response = self.response_for(path.replace(os.sep, "/"), Headers(scope=scope))
+            if response is not None:
+                return response
+        return await super().get_response(path, scope)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build precompressed, hashed dashboard assets.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="Hash and compress static/ into the build directory.")
+    build_cmd.add_argument("--src", default="static")
+    build_cmd.add_argument("--out", default=os.getenv("STATIC_BUILD_DIR", ".static_build"))
+    args = parser.parse_args(argv)
+
+    manifest = build(args.src, args.out)
+    summary = {
+        name: {"sizes": entry["sizes"], "immutable": entry["immutable"]}
+        for name, entry in manifest["assets"].items()
+    }
+    print(json.dumps({"out": args.out, "encodings": available_encodings(), "assets": summary}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
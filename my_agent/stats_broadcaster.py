@@ -0,0 +1,101 @@
+"""Fan-out of dashboard stats over Server-Sent Events.
+
+Every open dashboard used to poll ``/health`` and ``/stats`` on its own
+timer, so server work grew with the number of tabs. :class:`StatsBroadcaster`
+runs one loop, and only while someone is subscribed. Each interval it
+builds a single snapshot, diffs it against the previous one and writes one
+pre-encoded SSE frame with the changed fields to every subscriber's queue.
+
+New subscribers first get a full ``snapshot`` event, then ``delta`` events.
+A subscriber too slow to drain its queue is reset to a fresh snapshot
+instead of holding memory.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Callable, Dict, Optional, Set
+
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = 16
+
+
+def sse_frame(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'), default=str)}\n\n"
+
+
+def diff(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Top-level fields of ``current`` that differ from ``previous``.
+
+    Removed fields are reported as ``None``.
+    """
+    changed = {k: v for k, v in current.items() if previous.get(k, object()) != v}
+    for key in previous.keys() - current.keys():
+        changed[key] = None
+    return changed
+
+
+class StatsBroadcaster:
+    """One snapshot per ``interval`` seconds, shared by all subscribers."""
+
+    def __init__(self, snapshot: Callable[[], Dict[str, Any]], interval: float = 2.0):
+        self.snapshot = snapshot
+        self.interval = interval
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._latest: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self.snapshots_built = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def _build(self) -> Dict[str, Any]:
+        self.snapshots_built += 1
+        return self.snapshot()
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a subscriber; its queue yields ready-to-send SSE frames."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        if self._latest is None:
+            self._latest = self._build()
+        queue.put_nowait(sse_frame("snapshot", self._latest))
+        self._subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            # The next subscriber starts from a fresh snapshot.
+            self._latest = None
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            await asyncio.sleep(self.interval)
+            try:
+                current = self._build()
+            except Exception:
+                logger.exception("Building the stats snapshot failed")
+                continue
+            changed = diff(self._latest or {}, current)
+            self._latest = current
+            if not changed:
+                continue
+            frame = sse_frame("delta", changed)
+            for queue in list(self._subscribers):
+                try:
+                    queue.put_nowait(frame)
+                except asyncio.QueueFull:
+                    self._resync(queue, current)
+
+    @staticmethod
+    def _resync(queue: asyncio.Queue, current: Dict[str, Any]) -> None:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(sse_frame("snapshot", current))
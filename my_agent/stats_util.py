@@ -0,0 +1,11 @@
+"""Small statistics helpers shared by the metrics and benchmark modules."""
+
+import math
+from typing import Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of ``values`` (``pct`` in 0..1); ``values`` must not be empty."""
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, math.ceil(pct * len(ordered)) - 1)
+    return ordered[max(idx, 0)]
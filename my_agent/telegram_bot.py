@@ -3,17 +3,34 @@ Telegram bot bridge to the ADK chat agent.
 
 Reads token from TELEGRAM_BOT_TOKEN env or .telegram_bot file.
 Only supported command: /chat <text>. Forwards the text to /api/chat and returns the agent reply.
+
+The bot normally runs as its own service (``python -m my_agent.telegram_bot``)
+and reaches the agent over HTTP through :class:`AgentApiClient`. With
+``TELEGRAM_WEBHOOK_INPROCESS=true`` the API app instead mounts the webhook
+itself and hands updates to :func:`build_application` with an
+:class:`InProcessAgentTransport`, which calls the chat pipeline directly.
 """
 import os
 import re
+import json
 import time
 import logging
+import importlib.util
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol
 
 import httpx
 from dotenv import load_dotenv
 from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
+from my_agent.message_coalescer import MessageCoalescer, PendingMessage
+from my_agent.progressive_reply import ProgressiveReply
+from my_agent.rate_limiter import TelegramRateLimiter
+from my_agent.update_processor import PerChatUpdateProcessor
+from my_agent.webhook_ingress import WebhookIngress
+
 # Load environment variables
 load_dotenv()
 
@@ -66,7 +83,227 @@ def read_token() -> str:
 API_URL = os.getenv("AGENT_API_URL", "http://localhost:8000")
 WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL")
 WEBHOOK_PATH = os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET") or None
 PORT = int(os.getenv("PORT", "8080"))
+AGENT_TIMEOUT_SECONDS = float(os.getenv("AGENT_TIMEOUT_SECONDS", "30"))
+
+
+@dataclass
+class AgentReply:
+    text: str
+    trace_id: Optional[str] = None
+    status_code: Optional[int] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    model_calls: Optional[int] = None
+
+
+def _parse_server_timing(header: Optional[str]) -> Optional[float]:
+    """Return the ``app`` duration (ms) from a ``Server-Timing`` header."""
+    if not header:
+        return None
+    for metric in header.split(","):
+        name, _, params = metric.strip().partition(";")
+        if name != "app":
+            continue
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur":
+                try:
+                    return float(value)
+                except ValueError:
+                    return None
+    return None
+
+
+class AgentApiClient:
+    """Long-lived pooled HTTP client for the agent's ``/api/chat`` endpoint.
+
+    One instance is owned by the bot application so consecutive messages
+    reuse kept-alive connections instead of paying TCP/TLS setup each time.
+    """
+
+    def __init__(self, base_url: str = API_URL, client: Optional[httpx.AsyncClient] = None):
+        self.base_url = base_url.rstrip("/")
+        self.client = client or self._build_client()
+
+    @staticmethod
+    def _build_client() -> httpx.AsyncClient:
+        http2 = os.getenv("AGENT_HTTP2", "false").lower() == "true"
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("AGENT_HTTP2=true but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("AGENT_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("AGENT_HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("AGENT_HTTP_KEEPALIVE_EXPIRY", "60")),
+        )
+        timeout = httpx.Timeout(AGENT_TIMEOUT_SECONDS, connect=float(os.getenv("AGENT_HTTP_CONNECT_TIMEOUT", "5")))
+        return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+    async def chat(
+        self,
+        message: str,
+        session_id: str,
+        on_text: Optional[Callable[[str], None]] = None,
+        user_id: Optional[str] = None,
+    ) -> AgentReply:
+        """POST one message and return the reply with a latency breakdown.
+
+        ``connect_ms`` is TCP+TLS setup (0 on a reused connection), ``server_ms``
+        the agent's own processing time from its ``Server-Timing`` header and
+        ``total_ms`` the full round trip. With ``on_text`` the reply is read
+        from ``/api/chat/stream`` and each text delta is passed to it as it
+        arrives; ``ttft_ms`` is then the time to the first delta.
+        """
+        marks: Dict[str, float] = {}
+
+        async def trace(event_name: str, info: dict) -> None:
+            marks.setdefault(event_name, time.monotonic())
+
+        t0 = time.monotonic()
+        payload = {"message": message, "session_id": session_id}
+        if user_id is not None:
+            payload["user_id"] = user_id
+        if on_text is None:
+            resp = await self.client.post(
+                f"{self.base_url}/api/chat", json=payload, extensions={"trace": trace}
+            )
+            resp.raise_for_status()
+            data = resp.json()
+            text = data.get("response", "(no response)")
+            trace_id = resp.headers.get("X-Trace-Id")
+            server_ms = _parse_server_timing(resp.headers.get("Server-Timing"))
+            model_calls = resp.headers.get("X-Model-Calls")
+            model_calls = int(model_calls) if model_calls and model_calls.isdigit() else None
+        else:
+            text, trace_id, server_ms, model_calls = "(no response)", None, None, None
+            async with self.client.stream(
+                "POST", f"{self.base_url}/api/chat/stream", json=payload, extensions={"trace": trace}
+            ) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if "delta" in data:
+                        marks.setdefault("first_delta", time.monotonic())
+                        on_text(data["delta"])
+                    elif data.get("done"):
+                        text = data.get("response", text)
+                        trace_id = data.get("trace_id")
+                        server_ms = data.get("duration_ms")
+                        model_calls = data.get("model_calls")
+        total_ms = (time.monotonic() - t0) * 1000
+
+        connect_start = marks.get("connection.connect_tcp.started")
+        connect_end = marks.get("connection.start_tls.complete") or marks.get("connection.connect_tcp.complete")
+        timings = {
+            "connect_ms": round((connect_end - connect_start) * 1000, 2) if connect_start and connect_end else 0.0,
+            "total_ms": round(total_ms, 2),
+        }
+        if "first_delta" in marks:
+            timings["ttft_ms"] = round((marks["first_delta"] - t0) * 1000, 2)
+        if server_ms is not None:
+            timings["server_ms"] = server_ms
+            timings["network_ms"] = round(max(total_ms - server_ms - timings["connect_ms"], 0.0), 2)
+        return AgentReply(
+            text=text,
+            trace_id=trace_id,
+            status_code=resp.status_code,
+            timings=timings,
+            model_calls=model_calls,
+        )
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class AgentTransport(Protocol):
+    """How the bot reaches the agent: over HTTP or inside the API process."""
+
+    async def chat(
+        self,
+        message: str,
+        session_id: str,
+        on_text: Optional[Callable[[str], None]] = None,
+        user_id: Optional[str] = None,
+    ) -> AgentReply:
+        ...
+
+    async def aclose(self) -> None:
+        ...
+
+
+class InProcessAgentTransport:
+    """Calls the API app's chat pipeline directly, with no HTTP hop.
+
+    ``run_chat`` is ``app.run_chat``; it returns an object with ``text``,
+    ``trace_id``, ``duration_ms`` and ``model_calls`` and accepts an
+    ``on_text`` callback.
+    All of the time is server time, so ``connect_ms`` is always 0.
+    """
+
+    def __init__(self, run_chat: Callable[..., Awaitable[Any]]):
+        self.run_chat = run_chat
+
+    async def chat(
+        self,
+        message: str,
+        session_id: str,
+        on_text: Optional[Callable[[str], None]] = None,
+        user_id: Optional[str] = None,
+    ) -> AgentReply:
+        t0 = time.monotonic()
+        first_text: Dict[str, float] = {}
+
+        def forward(delta: str) -> None:
+            first_text.setdefault("at", time.monotonic())
+            on_text(delta)
+
+        if on_text is None:
+            result = await self.run_chat(message, session_id, user_id=user_id)
+        else:
+            result = await self.run_chat(message, session_id, user_id=user_id, on_text=forward)
+        timings = {
+            "connect_ms": 0.0,
+            "total_ms": round((time.monotonic() - t0) * 1000, 2),
+            "server_ms": round(result.duration_ms, 2),
+        }
+        if first_text:
+            timings["ttft_ms"] = round((first_text["at"] - t0) * 1000, 2)
+        return AgentReply(
+            text=result.text,
+            trace_id=result.trace_id,
+            timings=timings,
+            model_calls=getattr(result, "model_calls", None),
+        )
+
+    async def aclose(self) -> None:
+        pass
+
+
+async def _on_startup(application: Application) -> None:
+    # An in-process deployment installs its own transport before starting.
+    application.bot_data.setdefault("agent_client", AgentApiClient())
+
+
+async def _on_shutdown(application: Application) -> None:
+    coalescer = application.bot_data.get("coalescer")
+    if coalescer is not None:
+        await coalescer.drain()
+        logger.info("coalescer_stats %s", coalescer.get_stats())
+    processor = getattr(application, "update_processor", None)
+    if hasattr(processor, "get_stats"):
+        logger.info("update_processor_stats %s", processor.get_stats())
+    limiter = getattr(getattr(application, "bot", None), "rate_limiter", None)
+    if hasattr(limiter, "get_stats"):
+        logger.info("rate_limiter_stats %s", limiter.get_stats())
+    ingress = application.bot_data.get("ingress")
+    if ingress is not None:
+        logger.info("webhook_ingress_stats %s", ingress.get_stats())
+    client = application.bot_data.pop("agent_client", None)
+    if client is not None:
+        await client.aclose()
 
 
 async def chat_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -80,56 +317,127 @@ async def chat_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         await update.message.reply_text("Используй: /chat <текст для агента>")
         return
 
-    session_id = f"tg_{update.effective_user.id}"
+    user_id = str(update.effective_user.id)
+    session_id = f"tg_{user_id}"
+    coalescer: Optional[MessageCoalescer] = context.application.bot_data.get("coalescer")
+    if coalescer is not None:
+        coalescer.add(update.effective_chat.id, PendingMessage(user_text, update.message, session_id, user_id))
+        return
+    await answer(context.application.bot_data["agent_client"], update.message, session_id, user_text, user_id)
+
+
+async def answer_batch(agent_client: AgentTransport, batch: List[PendingMessage]) -> int:
+    """Answer a chat's coalesced messages with one agent turn per sender.
 
+    Each turn replies to that sender's last message. Returns the model calls
+    the turns made.
+    """
+    by_session: Dict[str, List[PendingMessage]] = {}
+    for item in batch:
+        by_session.setdefault(item.session_id, []).append(item)
+    model_calls = 0
+    for session_id, items in by_session.items():
+        text = "\n".join(item.text for item in items)
+        model_calls += await answer(agent_client, items[-1].message, session_id, text, items[-1].user_id) or 0
+    return model_calls
+
+
+async def flush_coalesced(application: Application, chat_id: int, batch: List[PendingMessage]) -> int:
+    # Run the turn as an update of its own, so it waits its turn in the
+    # chat's queue and holds one of the processor's worker slots.
+    outcome: Dict[str, int] = {}
+
+    async def turn() -> None:
+        outcome["model_calls"] = await answer_batch(application.bot_data["agent_client"], batch)
+
+    await application.update_processor.process_update(batch[-1].message, turn())
+    return outcome.get("model_calls", 0)
+
+
+async def answer(
+    agent_client: AgentTransport, message, session_id: str, user_text: str, user_id: Optional[str] = None
+) -> Optional[int]:
+    """Send ``user_text`` to the agent and stream the reply to ``message``'s chat.
+
+    Returns the model calls the turn made, when the transport reports them.
+    """
+    t0 = time.monotonic()
+    progress = ProgressiveReply(message)
+    await progress.start()
     try:
-        t0 = time.monotonic()
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{API_URL}/api/chat",
-                json={"message": user_text, "session_id": session_id},
-                timeout=30,
-            )
-        t1 = time.monotonic()
-        resp.raise_for_status()
-        data = resp.json()
-        reply = data.get("response", "(no response)")
-        trace_id = resp.headers.get("X-Trace-Id")
+        result = await agent_client.chat(user_text, session_id, on_text=progress.feed, user_id=user_id)
+        reply = result.text
+        trace_id = result.trace_id
+        model_calls = result.model_calls
         logger.info(
-            "agent_call session=%s latency_ms=%.2f trace_id=%s status=%s",
+            "agent_call session=%s latency_ms=%.2f connect_ms=%.2f ttft_ms=%s server_ms=%s trace_id=%s status=%s",
             session_id,
-            (t1 - t0) * 1000,
+            result.timings["total_ms"],
+            result.timings["connect_ms"],
+            result.timings.get("ttft_ms"),
+            result.timings.get("server_ms"),
             trace_id,
-            resp.status_code,
+            result.status_code,
         )
     except Exception as exc:
         logger.error("Error talking to agent: %s", exc)
         reply = "Sorry, I could not reach the agent."
-        t1 = time.monotonic()
         trace_id = None
+        model_calls = None
 
     t_send_start = time.monotonic()
-    await update.message.reply_text(reply)
+    await progress.finish(reply)
     t_send_end = time.monotonic()
     logger.info(
-        "telegram_send session=%s trace_id=%s send_latency_ms=%.2f total_latency_ms=%.2f",
+        "telegram_send session=%s trace_id=%s first_text_ms=%s edits=%d send_latency_ms=%.2f total_latency_ms=%.2f",
         session_id,
         trace_id,
+        progress.ttft_ms,
+        progress.edits,
         (t_send_end - t_send_start) * 1000,
         (t_send_end - t0) * 1000,
     )
+    return model_calls
 
 
-def main() -> None:
-    token = read_token()
-    app = (
+def build_application(
+    token: str, transport: Optional[AgentTransport] = None, with_updater: bool = True
+) -> Application:
+    """Build the bot application with its handlers registered.
+
+    ``with_updater=False`` is for hosts that receive webhook updates
+    themselves and feed them to ``process_update``.
+    """
+    builder = (
         Application.builder()
         .token(token)
-        .rate_limiter(None)  # no built-in rate limit; keep it simple
-        .build()
+        .rate_limiter(TelegramRateLimiter.from_env())
+        .concurrent_updates(PerChatUpdateProcessor.from_env())
+        .post_init(_on_startup)
+        .post_shutdown(_on_shutdown)
     )
+    ingress = WebhookIngress.from_env()
+    if with_updater:
+        # The updater's webhook server and poller put received updates
+        # here; they are stamped and deduplicated on the way in.
+        builder = builder.update_queue(ingress.make_queue())
+    else:
+        # Hosts that feed updates themselves dedup them via ingress.accept().
+        builder = builder.updater(None)
+    application = builder.build()
+    if transport is not None:
+        application.bot_data["agent_client"] = transport
+    coalescer = MessageCoalescer.from_env(partial(flush_coalesced, application))
+    if coalescer is not None:
+        application.bot_data["coalescer"] = coalescer
+    application.add_handler(CommandHandler("chat", chat_command))
+    ingress.install(application)
+    application.bot_data["ingress"] = ingress
+    return application
+
 
-    app.add_handler(CommandHandler("chat", chat_command))
+def main() -> None:
+    app = build_application(read_token())
 
     if WEBHOOK_URL:
         # Webhook mode (Cloud Run friendly, avoids polling conflicts)
@@ -144,6 +452,7 @@ def main() -> None:
             port=PORT,
             url_path=WEBHOOK_PATH.lstrip("/"),
             webhook_url=WEBHOOK_URL.rstrip("/"),
+            secret_token=WEBHOOK_SECRET,
         )
     else:
         logger.info("Starting Telegram bot in polling mode; forwarding to %s", API_URL)
@@ -0,0 +1,122 @@
+"""Prompt and completion token accounting.
+
+``run_chat`` opens a :class:`TurnUsage` in a context variable for each turn.
+Every final, non-partial runner event that carries ``usage_metadata`` is
+added to it and attributed to the event's author. ``ask_devops`` records
+its own runner's events the same way, and because the variable is
+inherited, delegated devops turns count toward the turn that caused them.
+
+When the turn ends, :data:`usage_ledger` adds it to the per-user, per-agent
+and process totals, and ``SessionMonitor`` adds it to the session.
+Recording is a few integer additions per model call.
+
+Cost is estimated only when ``TOKEN_PRICE_INPUT_PER_MILLION`` /
+``TOKEN_PRICE_OUTPUT_PER_MILLION`` are set.
+"""
+
+import os
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class TokenCounts:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    model_calls: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, other: "TokenCounts") -> None:
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cached_tokens += other.cached_tokens
+        self.model_calls += other.model_calls
+
+    def to_dict(self) -> dict:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "total_tokens": self.total_tokens,
+            "model_calls": self.model_calls,
+        }
+
+
+@dataclass
+class TurnUsage(TokenCounts):
+    by_agent: Dict[str, TokenCounts] = field(default_factory=dict)
+
+    def add_usage(self, agent_name: str, usage: Any) -> None:
+        counts = TokenCounts(
+            prompt_tokens=usage.prompt_token_count or 0,
+            completion_tokens=usage.candidates_token_count or 0,
+            cached_tokens=getattr(usage, "cached_content_token_count", None) or 0,
+            model_calls=1,
+        )
+        self.add(counts)
+        self.by_agent.setdefault(agent_name, TokenCounts()).add(counts)
+
+
+current_turn: ContextVar[Optional[TurnUsage]] = ContextVar("current_turn", default=None)
+
+
+def record_event(event: Any) -> None:
+    """Add ``event``'s usage to the current turn, if it has any."""
+    usage = getattr(event, "usage_metadata", None)
+    if usage is None or getattr(event, "partial", False):
+        return
+    turn = current_turn.get()
+    if turn is not None:
+        turn.add_usage(getattr(event, "author", None) or "unknown", usage)
+
+
+class UsageLedger:
+    """Process-wide token totals by user and by agent."""
+
+    def __init__(self, input_price: float = 0.0, output_price: float = 0.0):
+        self.input_price = input_price
+        self.output_price = output_price
+        self.totals = TokenCounts()
+        self.turns = 0
+        self.by_user: Dict[str, TokenCounts] = {}
+        self.by_agent: Dict[str, TokenCounts] = {}
+
+    @classmethod
+    def from_env(cls) -> "UsageLedger":
+        return cls(
+            input_price=float(os.getenv("TOKEN_PRICE_INPUT_PER_MILLION", "0")),
+            output_price=float(os.getenv("TOKEN_PRICE_OUTPUT_PER_MILLION", "0")),
+        )
+
+    def cost_usd(self, counts: TokenCounts) -> Optional[float]:
+        if not (self.input_price or self.output_price):
+            return None
+        cost = counts.prompt_tokens * self.input_price + counts.completion_tokens * self.output_price
+        return round(cost / 1_000_000, 6)
+
+    def record_turn(self, user_id: str, turn: TurnUsage) -> None:
+        self.turns += 1
+        self.totals.add(turn)
+        self.by_user.setdefault(user_id, TokenCounts()).add(turn)
+        for agent_name, counts in turn.by_agent.items():
+            self.by_agent.setdefault(agent_name, TokenCounts()).add(counts)
+
+    def get_stats(self, top_users: int = 10) -> dict:
+        heaviest = sorted(self.by_user.items(), key=lambda item: item[1].total_tokens, reverse=True)
+        return {
+            **self.totals.to_dict(),
+            "turns": self.turns,
+            "avg_tokens_per_turn": round(self.totals.total_tokens / self.turns, 1) if self.turns else 0.0,
+            "cost_usd": self.cost_usd(self.totals),
+            "by_agent": {name: counts.to_dict() for name, counts in self.by_agent.items()},
+            "top_users": {user: counts.to_dict() for user, counts in heaviest[:top_users]},
+            "users": len(self.by_user),
+        }
+
+
+usage_ledger = UsageLedger.from_env()
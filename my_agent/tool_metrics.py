@@ -0,0 +1,165 @@
+"""Per-tool call metrics, recorded by wrapping each agent's tools.
+
+ADK events carry function calls as content parts, so counting tools from
+the event stream in ``run_chat`` missed most of them. It also could not
+time them. :func:`instrument_tools` wraps every function at agent
+construction instead, keeping its name, signature and docstring so ADK
+builds the same declaration. For every call it records:
+
+- the latency, in a fixed-bucket histogram plus a recent-sample window for
+  percentiles
+- whether the call raised, or returned ``{"status": "error"}``
+- the size of the JSON result
+
+Everything is tagged with the agent name and reported by
+:meth:`ToolMetrics.get_stats` under ``/stats``.
+"""
+
+import functools
+import inspect
+import json
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from my_agent.stats_util import percentile
+
+
+# Upper bounds in milliseconds; the last bucket catches everything slower.
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RECENT_SAMPLES = 500
+
+
+def _result_size(result: Any) -> int:
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return len(str(result))
+
+
+class _ToolStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.error_results = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.result_bytes = 0
+        self.max_result_bytes = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.recent: Deque[float] = deque(maxlen=RECENT_SAMPLES)
+        self.last_error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        recent = list(self.recent)
+        labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_results": self.error_results,
+            "last_error": self.last_error,
+            "latency_avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "latency_p50_ms": round(percentile(recent, 0.50), 2) if recent else 0.0,
+            "latency_p95_ms": round(percentile(recent, 0.95), 2) if recent else 0.0,
+            "latency_max_ms": round(self.max_ms, 2),
+            "latency_total_ms": round(self.total_ms, 2),
+            "latency_histogram_ms": dict(zip(labels, self.buckets)),
+            "result_bytes_avg": round(self.result_bytes / self.calls) if self.calls else 0,
+            "result_bytes_max": self.max_result_bytes,
+        }
+
+
+class ToolMetrics:
+    """Counters keyed by ``(agent, tool)``."""
+
+    def __init__(self):
+        self._tools: Dict[tuple, _ToolStats] = {}
+
+    def record(
+        self,
+        agent_name: str,
+        tool_name: str,
+        elapsed_ms: float,
+        error: Optional[str] = None,
+        result: Any = None,
+    ) -> None:
+        stats = self._tools.get((agent_name, tool_name))
+        if stats is None:
+            stats = self._tools[(agent_name, tool_name)] = _ToolStats()
+        stats.calls += 1
+        stats.total_ms += elapsed_ms
+        stats.max_ms = max(stats.max_ms, elapsed_ms)
+        stats.recent.append(elapsed_ms)
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound), -1)
+        stats.buckets[bucket] += 1
+        if error is not None:
+            stats.errors += 1
+            stats.last_error = error
+            return
+        if isinstance(result, dict) and result.get("status") == "error":
+            stats.error_results += 1
+            stats.last_error = str(result.get("error_message") or result.get("error") or "error")
+        size = _result_size(result)
+        stats.result_bytes += size
+        stats.max_result_bytes = max(stats.max_result_bytes, size)
+
+    @property
+    def calls_total(self) -> int:
+        return sum(s.calls for s in self._tools.values())
+
+    def calls_by_name(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for (_, tool), stats in self._tools.items():
+            counts[tool] = counts.get(tool, 0) + stats.calls
+        return counts
+
+    def get_stats(self) -> Dict[str, Dict[str, dict]]:
+        """``{agent: {tool: stats}}``, slowest total time first within each agent."""
+        by_agent: Dict[str, Dict[str, dict]] = {}
+        ranked = sorted(self._tools.items(), key=lambda item: item[1].total_ms, reverse=True)
+        for (agent_name, tool_name), stats in ranked:
+            by_agent.setdefault(agent_name, {})[tool_name] = stats.to_dict()
+        return by_agent
+
+    def reset(self) -> None:
+        self._tools.clear()
+
+
+tool_metrics = ToolMetrics()
+
+
+def instrument_tool(agent_name: str, func: Callable, metrics: ToolMetrics = tool_metrics) -> Callable:
+    """Wrap ``func`` so each call is recorded in ``metrics``."""
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException as exc:
+                metrics.record(agent_name, name, (time.perf_counter() - start) * 1000, error=type(exc).__name__)
+                raise
+            metrics.record(agent_name, name, (time.perf_counter() - start) * 1000, result=result)
+            return result
+
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            metrics.record(agent_name, name, (time.perf_counter() - start) * 1000, error=type(exc).__name__)
+            raise
+        metrics.record(agent_name, name, (time.perf_counter() - start) * 1000, result=result)
+        return result
+
+    return wrapper
+
+
+def instrument_tools(agent_name: str, tools: List[Callable]) -> List[Callable]:
+    """Instrument every plain function in ``tools``; other tool objects pass through."""
+    return [instrument_tool(agent_name, t) if inspect.isfunction(t) else t for t in tools]
@@ -0,0 +1,412 @@
+"""Lightweight in-process spans for the chat pipeline.
+
+``run_chat`` opens a root ``chat`` span named by its ``X-Trace-Id``. The
+agents' ADK callbacks (:data:`AGENT_CALLBACKS`) then record one child span
+per model call and one per tool execution. Model spans carry the time to
+first token and the token counts.
+
+The current span lives in a context variable, and ADK copies the context
+into the tasks it spawns. So ``ask_devops`` runs under its tool span, and
+everything the nested devops runner does joins the same trace.
+
+Finished traces are kept in memory for ``/debug/traces/{trace_id}``. With
+``TRACE_EXPORT=jsonl`` or ``otlp`` they are also handed to a background
+thread, which writes them in batches to ``TRACE_EXPORT_PATH`` or POSTs them
+as OTLP/HTTP JSON to ``TRACE_OTLP_ENDPOINT``. The event loop only appends
+to a queue.
+"""
+
+import html
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACES = 200
+MAX_SPANS_PER_TRACE = 500
+_TICK = object()
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    status: str = "ok"
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.end_ns is None else round((self.end_ns - self.start_ns) / 1e6, 3)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def mark(self, name: str) -> None:
+        """Record ``name_ms``: milliseconds since the span started, once."""
+        self.attributes.setdefault(f"{name}_ms", round((time.time_ns() - self.start_ns) / 1e6, 3))
+
+    def end(self, status: Optional[str] = None) -> None:
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if status:
+                self.status = status
+            tracer.finish(self)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["duration_ms"] = self.duration_ms
+        return data
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+# The open model call, kept apart from current_span so tools are not nested under it.
+_model_span: ContextVar[Optional[Span]] = ContextVar("model_span", default=None)
+
+
+class JsonlSink:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, spans: List[dict]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, separators=(",", ":"), default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: List[dict], service_name: str = "adk-agent") -> dict:
+    """OTLP/HTTP JSON ``ExportTraceServiceRequest`` for ``spans``."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{
+                "scope": {"name": "my_agent.tracing"},
+                "spans": [
+                    {
+                        "traceId": s["trace_id"].replace("-", ""),
+                        "spanId": s["span_id"],
+                        **({"parentSpanId": s["parent_id"]} if s["parent_id"] else {}),
+                        "name": s["name"],
+                        "kind": 1,
+                        "startTimeUnixNano": str(s["start_ns"]),
+                        "endTimeUnixNano": str(s["end_ns"] or s["start_ns"]),
+                        "status": {"code": 2 if s["status"] == "error" else 1},
+                        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s["attributes"].items()],
+                    }
+                    for s in spans
+                ],
+            }],
+        }]
+    }
+
+
+class OtlpSink:
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+
+    def write(self, spans: List[dict]) -> None:
+        import httpx
+
+        httpx.post(self.endpoint, json=to_otlp(spans), timeout=5).raise_for_status()
+
+
+class BatchExporter:
+    """Background thread that writes queued spans to ``sink`` in batches."""
+
+    def __init__(self, sink, max_batch: int = 256, interval: float = 2.0, max_queue: int = 10_000):
+        self.sink = sink
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=max_queue)
+        self.exported = 0
+        self.dropped = 0
+        self.failed_batches = 0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, spans: List[dict]) -> None:
+        for span in spans:
+            try:
+                self._queue.put_nowait(span)
+            except queue.Full:
+                self.dropped += 1
+
+    def _run(self) -> None:
+        batch: List[dict] = []
+        deadline = time.monotonic() + self.interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                item = _TICK
+            else:
+                if item is not None:
+                    batch.append(item)
+            if item is None or item is _TICK or len(batch) >= self.max_batch:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.interval
+            if item is not _TICK:
+                self._queue.task_done()
+
+    def _write(self, batch: List[dict]) -> None:
+        if not batch:
+            return
+        try:
+            self.sink.write(batch)
+            self.exported += len(batch)
+        except Exception as exc:
+            self.failed_batches += 1
+            logger.warning("Exporting %d spans failed: %s", len(batch), exc)
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """Write everything queued so far (blocking; call off the event loop)."""
+        self._queue.put(None)
+        end = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < end:
+            time.sleep(0.01)
+
+
+class Tracer:
+    """Keeps recent traces in memory and forwards finished ones to an exporter."""
+
+    def __init__(self, max_traces: int = MAX_TRACES):
+        self.max_traces = max_traces
+        self._traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self.exporter: Optional[BatchExporter] = None
+        self.spans_started = 0
+
+    def configure_from_env(self) -> None:
+        mode = os.getenv("TRACE_EXPORT", "").lower()
+        if mode == "jsonl":
+            self.exporter = BatchExporter(JsonlSink(os.getenv("TRACE_EXPORT_PATH", "traces.jsonl")))
+        elif mode == "otlp":
+            self.exporter = BatchExporter(
+                OtlpSink(os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"))
+            )
+
+    def start_span(self, name: str, trace_id: Optional[str] = None, **attributes: Any) -> Optional[Span]:
+        """Start a child of the current span; ``None`` outside any trace unless ``trace_id``."""
+        parent = current_span.get()
+        if trace_id is None:
+            if parent is None:
+                return None
+            trace_id = parent.trace_id
+        spans = self._traces.get(trace_id)
+        if spans is None:
+            spans = self._traces[trace_id] = []
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        span = Span(
+            trace_id=trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent and parent.trace_id == trace_id else None,
+            name=name,
+            attributes=attributes,
+        )
+        if len(spans) < MAX_SPANS_PER_TRACE:
+            spans.append(span)
+        self.spans_started += 1
+        return span
+
+    def finish(self, span: Span) -> None:
+        if span.parent_id is None and self.exporter is not None:
+            spans = self._traces.get(span.trace_id, [])
+            self.exporter.submit([s.to_dict() for s in spans])
+
+    def get_trace(self, trace_id: str) -> Optional[List[dict]]:
+        spans = self._traces.get(trace_id)
+        return None if spans is None else [s.to_dict() for s in spans]
+
+    def recent(self, limit: int = 20) -> List[dict]:
+        summaries = []
+        for trace_id in reversed(self._traces):
+            spans = self._traces[trace_id]
+            root = spans[0]
+            summaries.append({
+                "trace_id": trace_id,
+                "name": root.name,
+                "duration_ms": root.duration_ms,
+                "spans": len(spans),
+                "status": root.status,
+            })
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+    def get_stats(self) -> dict:
+        exporter = self.exporter
+        return {
+            "traces_kept": len(self._traces),
+            "spans_started": self.spans_started,
+            "exported": exporter.exported if exporter else 0,
+            "dropped": exporter.dropped if exporter else 0,
+            "failed_batches": exporter.failed_batches if exporter else 0,
+        }
+
+
+tracer = Tracer()
+
+
+@contextmanager
+def span(name: str, trace_id: Optional[str] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Open a span for the ``with`` block and make it current.
+
+    Pass ``trace_id`` to start a new trace. Without one, outside any trace,
+    this yields ``None`` and records nothing.
+    """
+    opened = tracer.start_span(name, trace_id=trace_id, **attributes)
+    if opened is None:
+        yield None
+        return
+    token = current_span.set(opened)
+    try:
+        yield opened
+    except BaseException as exc:
+        opened.set(error=type(exc).__name__)
+        opened.end("error")
+        raise
+    finally:
+        current_span.reset(token)
+        opened.end()
+
+
+# --- ADK agent callbacks ---
+
+def _before_model(callback_context, llm_request):
+    agent_name = getattr(callback_context, "agent_name", None)
+    _model_span.set(tracer.start_span("model_call", agent=agent_name, model=llm_request.model))
+
+
+def _after_model(callback_context, llm_response):
+    model_span = _model_span.get()
+    if model_span is None:
+        return None
+    model_span.mark("first_token")
+    if not llm_response.partial:
+        usage = llm_response.usage_metadata
+        if usage is not None:
+            model_span.set(
+                prompt_tokens=usage.prompt_token_count or 0,
+                completion_tokens=usage.candidates_token_count or 0,
+            )
+        parts = (llm_response.content.parts if llm_response.content else None) or []
+        calls = sum(1 for p in parts if p.function_call)
+        if calls:
+            model_span.set(function_calls=calls)
+        model_span.end()
+    return None
+
+
+def _on_model_error(callback_context, llm_request, error):
+    model_span = _model_span.get()
+    if model_span is not None:
+        model_span.set(error=type(error).__name__)
+        model_span.end("error")
+    return None
+
+
+def _before_tool(tool, args, tool_context):
+    tool_span = tracer.start_span(
+        f"tool:{tool.name}", tool=tool.name, agent=getattr(tool_context, "agent_name", None)
+    )
+    if tool_span is not None:
+        # The tool runs in this task, so spans it opens (ask_devops) nest here.
+        current_span.set(tool_span)
+    return None
+
+
+def _end_tool(tool, status: str, **attributes: Any) -> None:
+    tool_span = current_span.get()
+    if tool_span is not None and tool_span.name == f"tool:{tool.name}":
+        tool_span.set(**attributes)
+        tool_span.end(status)
+
+
+def _after_tool(tool, args, tool_context, tool_response):
+    _end_tool(tool, "ok")
+    return None
+
+
+def _on_tool_error(tool, args, tool_context, error):
+    _end_tool(tool, "error", error=type(error).__name__)
+    return None
+
+
+AGENT_CALLBACKS = {
+    "before_model_callback": _before_model,
+    "after_model_callback": _after_model,
+    "on_model_error_callback": _on_model_error,
+    "before_tool_callback": _before_tool,
+    "after_tool_callback": _after_tool,
+    "on_tool_error_callback": _on_tool_error,
+}
+
+
+# --- Waterfall ---
+
+def render_waterfall(trace_id: str, spans: List[dict]) -> str:
+    """A self-contained HTML waterfall of ``spans``, indented by nesting."""
+    if not spans:
+        return f"<p>No spans for trace {html.escape(trace_id)}.</p>"
+    start = min(s["start_ns"] for s in spans)
+    end = max(s["end_ns"] or s["start_ns"] for s in spans)
+    total = max(end - start, 1)
+    children: Dict[Optional[str], List[dict]] = {}
+    ids = {s["span_id"] for s in spans}
+    for s in sorted(spans, key=lambda s: s["start_ns"]):
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    rows = []
+
+    def walk(parent: Optional[str], depth: int) -> None:
+        for s in children.get(parent, []):
+            left = (s["start_ns"] - start) / total * 100
+            width = max(((s["end_ns"] or end) - s["start_ns"]) / total * 100, 0.3)
+            attrs = ", ".join(f"{k}={v}" for k, v in s["attributes"].items())
+            duration = "open" if s["duration_ms"] is None else f"{s['duration_ms']:.1f} ms"
+            color = "#d9534f" if s["status"] == "error" else "#4a90d9"
+            rows.append(
+                f'<tr><td style="padding-left:{depth * 16}px">{html.escape(s["name"])}</td>'
+                f'<td class="d">{duration}</td>'
+                f'<td class="w"><div class="bar" style="margin-left:{left:.2f}%;width:{width:.2f}%;'
+                f'background:{color}" title="{html.escape(attrs)}"></div></td>'
+                f'<td class="a">{html.escape(attrs)}</td></tr>'
+            )
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>Trace {html.escape(trace_id)}</title><style>"
+        "body{font:13px sans-serif;margin:16px}table{border-collapse:collapse;width:100%}"
+        "td{padding:3px 6px;border-bottom:1px solid #eee;white-space:nowrap}"
+        ".w{width:50%}.d{text-align:right}.a{color:#666;font-size:11px}"
+        ".bar{height:12px;border-radius:2px}</style></head><body>"
+        f"<h3>Trace {html.escape(trace_id)} &mdash; {total / 1e6:.1f} ms, {len(spans)} spans</h3>"
+        f"<table>{''.join(rows)}</table></body></html>"
+    )
@@ -0,0 +1,105 @@
+"""Compare bot -> agent latency over HTTP and in-process.
+
+Run ``python -m my_agent.transport_bench`` to serve the API app with uvicorn
+on a local port and send the same messages through both transports the
+Telegram bot can use:
+
+- ``http``: :class:`~my_agent.telegram_bot.AgentApiClient` posting to
+  ``/api/chat`` over a pooled keep-alive connection (the standalone bridge)
+- ``inprocess``: :class:`~my_agent.telegram_bot.InProcessAgentTransport`
+  calling ``app.run_chat`` directly (``TELEGRAM_WEBHOOK_INPROCESS=true``)
+
+By default the app runs in ``ADK_TEST_MODE`` so only transport overhead is
+measured; ``--live`` sends real model traffic. The report is printed as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import List, Optional
+
+from my_agent.stats_util import percentile
+
+
+def summarize(timings: List[float]) -> dict:
+    return {
+        "requests": len(timings),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+    }
+
+
+async def measure(transport, requests: int, concurrency: int, warmup: int = 5) -> dict:
+    """Send ``requests`` messages through ``transport`` and summarise latency."""
+    for i in range(warmup):
+        await transport.chat("warm up", f"bench_warmup_{i}")
+
+    timings: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await transport.chat(f"benchmark message {i}", f"bench_{i % max(concurrency, 1)}")
+            timings.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    report = summarize(timings)
+    report["concurrency"] = concurrency
+    report["throughput_rps"] = round(requests / elapsed, 1) if elapsed else None
+    return report
+
+
+async def run(requests: int, concurrencies: List[int]) -> dict:
+    import uvicorn
+
+    import app as app_module
+    from my_agent.telegram_bot import AgentApiClient, InProcessAgentTransport
+
+    server = uvicorn.Server(
+        uvicorn.Config(app_module.app, host="127.0.0.1", port=0, log_level="warning", lifespan="on")
+    )
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if serve_task.done():
+            serve_task.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+
+    http = AgentApiClient(f"http://127.0.0.1:{port}")
+    inprocess = InProcessAgentTransport(app_module.run_chat)
+    report = {"test_mode": os.getenv("ADK_TEST_MODE", "").lower() == "true", "results": []}
+    try:
+        for concurrency in concurrencies:
+            for name, transport in (("http", http), ("inprocess", inprocess)):
+                result = await measure(transport, requests, concurrency)
+                result["transport"] = name
+                report["results"].append(result)
+    finally:
+        await http.aclose()
+        server.should_exit = True
+        await serve_task
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare HTTP and in-process bot transports.")
+    parser.add_argument("--requests", type=int, default=500, help="Messages per transport and concurrency level.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--live", action="store_true", help="Call the real model instead of ADK_TEST_MODE.")
+    args = parser.parse_args(argv)
+
+    if not args.live:
+        os.environ["ADK_TEST_MODE"] = "true"
+    print(json.dumps(asyncio.run(run(args.requests, args.concurrency)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
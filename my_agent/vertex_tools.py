@@ -1,51 +1,96 @@
+import asyncio
+import importlib
 import os
-from typing import List
-from google.cloud import discoveryengine_v1 as discoveryengine
-from google.api_core.client_options import ClientOptions
+import logging
+import threading
+import time
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+from my_agent.env_util import env_number
+from my_agent.lazy_import import lazy_import
+from my_agent.search_cache import search_cache
 
-def search_knowledge_base(query: str) -> dict:
-    """Searches the knowledge base (Vertex AI Search) for relevant information.
-    
-    Args:
-        query (str): The search query.
-        
-    Returns:
-        dict: status and result (search results) or error msg.
+discoveryengine = lazy_import("google.cloud.discoveryengine_v1")
+client_options_lib = lazy_import("google.api_core.client_options")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCATION = "europe-west4"
+DEFAULT_PAGE_SIZE = 3
+DEFAULT_TIMEOUT_SECONDS = 10.0
+DEFAULT_MAX_PARALLEL = 4
+MAX_QUERIES_PER_CALL = 8
+RRF_K = 60
+
+# Client construction and search RPCs are timed separately so a slow first
+# call (channel + auth setup) can be told apart from slow searches.
+search_metrics = {
+    "client_init_count": 0,
+    "client_init_ms_total": 0.0,
+    "search_count": 0,
+    "search_error_count": 0,
+    "search_ms_total": 0.0,
+    "search_ms_max": 0.0,
+}
+
+
+class VertexSearchBackend:
+    """Vertex AI Search client bound to one (project, location, data store).
+
+    The ``SearchServiceClient`` and serving config path are built once and
+    reused for every query, so only the first call pays for channel setup.
     """
-    project_id = os.getenv("GCP_PROJECT_ID")
-    location = os.getenv("GCP_LOCATION") or "europe-west4"
-    data_store_id = os.getenv("VERTEX_SEARCH_DATA_STORE_ID")
-    
-    if not project_id or not data_store_id:
-        return {
-            "status": "error",
-            "error_message": "GCP_PROJECT_ID or VERTEX_SEARCH_DATA_STORE_ID not configured."
-        }
 
-    try:
+    def __init__(self, project_id: str, location: str, data_store_id: str):
+        self.project_id = project_id
+        self.location = location
+        self.data_store_id = data_store_id
+
+        start = time.perf_counter()
         client_options = (
-            ClientOptions(api_endpoint=f"{location}-discoveryengine.googleapis.com")
+            client_options_lib.ClientOptions(api_endpoint=f"{location}-discoveryengine.googleapis.com")
             if location != "global"
             else None
         )
-        
-        client = discoveryengine.SearchServiceClient(client_options=client_options)
-        
-        serving_config = client.serving_config_path(
+        self.client = discoveryengine.SearchServiceClient(client_options=client_options)
+        self.serving_config = self.client.serving_config_path(
             project=project_id,
             location=location,
             data_store=data_store_id,
             serving_config="default_config",
         )
-        
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        search_metrics["client_init_count"] += 1
+        search_metrics["client_init_ms_total"] += elapsed_ms
+        logger.info(
+            "search_client_init",
+            extra={"data_store_id": data_store_id, "latency_ms": round(elapsed_ms, 2)},
+        )
+
+    def search(self, query: str, page_size: int, timeout: float) -> List[Dict[str, str]]:
+        """Run one search RPC and return ``title``/``snippet``/``link`` dicts."""
         request = discoveryengine.SearchRequest(
-            serving_config=serving_config,
+            serving_config=self.serving_config,
             query=query,
-            page_size=3,
+            page_size=page_size,
         )
-        
-        response = client.search(request)
-        
+
+        start = time.perf_counter()
+        try:
+            response = self.client.search(request, timeout=timeout)
+        except Exception:
+            search_metrics["search_error_count"] += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            search_metrics["search_count"] += 1
+            search_metrics["search_ms_total"] += elapsed_ms
+            search_metrics["search_ms_max"] = max(search_metrics["search_ms_max"], elapsed_ms)
+            logger.info(
+                "search_rpc",
+                extra={"data_store_id": self.data_store_id, "latency_ms": round(elapsed_ms, 2)},
+            )
+
         results = []
         for result in response.results:
             data = result.document.derived_struct_data
@@ -61,15 +106,294 @@ def search_knowledge_base(query: str) -> dict:
                 else:
                     snippet = str(first)
             link = data.get("link", "")
-            results.append(f"Title: {title}\nSnippet: {snippet}\nLink: {link}")
-            
+            results.append(
+                {"title": title, "snippet": snippet, "link": link, "id": str(result.document.id)}
+            )
+        return results
+
+
+_backends: Dict[Tuple[str, str, str], VertexSearchBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_search_backend(project_id: str, location: str, data_store_id: str) -> VertexSearchBackend:
+    """Return the shared backend for a data store, creating it on first use."""
+    key = (project_id, location, data_store_id)
+    backend = _backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _backends.get(key)
+            if backend is None:
+                backend = VertexSearchBackend(project_id, location, data_store_id)
+                _backends[key] = backend
+    return backend
+
+
+# Local index backends keyed by (kind, index dir); kind is "local" (BM25) or "dense".
+_local_backends: Dict[Tuple[str, str], object] = {}
+
+# Module, class and metadata file for each on-disk index kind.
+LOCAL_INDEX_KINDS = {
+    "local": ("my_agent.local_index", "LocalIndexBackend", "meta.json"),
+    "dense": ("my_agent.dense_index", "DenseIndexBackend", "dense_meta.json"),
+}
+
+
+def get_local_backend(index_dir: str, kind: str = "local"):
+    """Return the shared on-disk index backend for ``index_dir``, loading it on first use."""
+    key = (kind, index_dir)
+    backend = _local_backends.get(key)
+    if backend is None:
+        with _backends_lock:
+            backend = _local_backends.get(key)
+            if backend is None:
+                # Imported here so the index CLIs (`python -m my_agent.local_index`)
+                # do not load their own module twice, and numpy loads only for "dense".
+                module_name, class_name, _ = LOCAL_INDEX_KINDS[kind]
+                backend_cls = getattr(importlib.import_module(module_name), class_name)
+                backend = backend_cls(index_dir)
+                _local_backends[key] = backend
+    return backend
+
+
+def reset_search_backends() -> None:
+    """Drop cached backends (used by tests and after credential changes)."""
+    with _backends_lock:
+        _backends.clear()
+        for backend in _local_backends.values():
+            backend.close()
+        _local_backends.clear()
+
+
+def drop_credentialed_backends() -> None:
+    """Forget backends that hold Google credentials, after a key rotation.
+
+    Vertex clients and dense backends using the ``genai`` embedder are
+    rebuilt on their next use. The old instances are not closed: searches
+    still running on worker or cache-refresh threads keep using them until
+    they finish, and then they are garbage-collected. BM25 backends and
+    other embedders do not use the key and are kept.
+    """
+    with _backends_lock:
+        _backends.clear()
+        for key, backend in list(_local_backends.items()):
+            if getattr(getattr(backend, "embedder", None), "name", None) == "genai":
+                del _local_backends[key]
+
+
+def _search_config() -> Tuple[Optional[str], str, Optional[str]]:
+    project_id = os.getenv("GCP_PROJECT_ID")
+    location = os.getenv("GCP_LOCATION") or DEFAULT_LOCATION
+    data_store_id = os.getenv("VERTEX_SEARCH_DATA_STORE_ID")
+    return project_id, location, data_store_id
+
+
+def _backend_name() -> str:
+    return (os.getenv("KNOWLEDGE_BASE_BACKEND", "vertex") or "vertex").lower()
+
+
+def _local_index_dir(kind: str = "local") -> str:
+    if kind == "dense":
+        return os.getenv("KNOWLEDGE_BASE_DENSE_INDEX_DIR") or ".kb_dense_index"
+    return os.getenv("KNOWLEDGE_BASE_INDEX_DIR") or ".kb_index"
+
+
+def warm_search_backend() -> bool:
+    """Create the configured search backend ahead of the first query.
+
+    Returns ``True`` when a backend is configured and ready.
+    """
+    kind = _backend_name()
+    if kind in LOCAL_INDEX_KINDS:
+        try:
+            get_local_backend(_local_index_dir(kind), kind)
+            return True
+        except Exception as exc:
+            logger.warning("Local index warm-up failed: %s", exc)
+            return False
+
+    project_id, location, data_store_id = _search_config()
+    if not project_id or not data_store_id:
+        return False
+    try:
+        get_search_backend(project_id, location, data_store_id)
+        return True
+    except Exception as exc:
+        logger.warning("Search backend warm-up failed: %s", exc)
+        return False
+
+
+def get_search_metrics() -> dict:
+    """Return client-construction and search-RPC timing aggregates."""
+    metrics = dict(search_metrics)
+    inits = metrics["client_init_count"]
+    searches = metrics["search_count"]
+    metrics["client_init_ms_avg"] = round(metrics["client_init_ms_total"] / inits, 2) if inits else 0.0
+    metrics["search_ms_avg"] = round(metrics["search_ms_total"] / searches, 2) if searches else 0.0
+    return metrics
+
+
+def format_results(results: List[Dict[str, str]]) -> str:
+    """Render search hits into the report shape returned to the model."""
+    if not results:
+        return "No results found."
+    return "\n\n".join(
+        f"Title: {r['title']}\nSnippet: {r['snippet']}\nLink: {r['link']}" for r in results
+    )
+
+
+def _resolve_backend():
+    """Return ``(backend, cache namespace)`` for the configured backend.
+
+    Raises ``ValueError`` with a user-facing message when it is not configured.
+    """
+    kind = _backend_name()
+    if kind in LOCAL_INDEX_KINDS:
+        index_dir = _local_index_dir(kind)
+        module_name, _, meta_file = LOCAL_INDEX_KINDS[kind]
+        if not os.path.exists(os.path.join(index_dir, meta_file)):
+            raise ValueError(
+                f"Local knowledge base index not found at {index_dir}. "
+                f"Build it with `python -m {module_name} build <docs_dir>`."
+            )
+        return get_local_backend(index_dir, kind), f"{kind}:{index_dir}"
+
+    project_id, location, data_store_id = _search_config()
+    if not project_id or not data_store_id:
+        raise ValueError("GCP_PROJECT_ID or VERTEX_SEARCH_DATA_STORE_ID not configured.")
+    return get_search_backend(project_id, location, data_store_id), data_store_id
+
+
+def _search_settings() -> Tuple[int, float]:
+    page_size = env_number("VERTEX_SEARCH_PAGE_SIZE", DEFAULT_PAGE_SIZE, int)
+    timeout = env_number("VERTEX_SEARCH_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS, float)
+    return page_size, timeout
+
+
+def _cached_search(backend, namespace: str, query: str, page_size: int, timeout: float) -> List[Dict[str, str]]:
+    return search_cache.get_or_load(
+        search_cache.make_key(query, namespace, page_size),
+        lambda: backend.search(query, page_size=page_size, timeout=timeout),
+    )
+
+
+def _cached_search_many(backend, namespace: str, queries: List[str], page_size: int) -> List[List[Dict[str, str]]]:
+    # Backends with search_many (the dense index) answer every query from one
+    # embedding call; it runs on the first cache miss and feeds the others.
+    batch: List[List[Dict[str, str]]] = []
+    batch_lock = threading.Lock()
+
+    def load(index: int) -> List[Dict[str, str]]:
+        with batch_lock:
+            if not batch:
+                batch.extend(backend.search_many(queries, page_size))
+        return batch[index]
+
+    return [
+        search_cache.get_or_load(search_cache.make_key(query, namespace, page_size), partial(load, i))
+        for i, query in enumerate(queries)
+    ]
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict[str, str]]], k: int = RRF_K) -> List[Dict[str, str]]:
+    """Merge ranked hit lists, de-duplicating by link (or document id).
+
+    Each hit scores ``1 / (k + rank)`` per list it appears in, so documents
+    found by several rephrasings rise to the top.
+    """
+    scores: Dict[str, float] = {}
+    hits: Dict[str, Dict[str, str]] = {}
+    for results in result_lists:
+        for rank, hit in enumerate(results, start=1):
+            key = hit.get("link") or hit.get("id") or hit.get("title", "")
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            hits.setdefault(key, hit)
+    ordered = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [hits[key] for key in ordered]
+
+
+def search_knowledge_base(query: str) -> dict:
+    """Searches the knowledge base (Vertex AI Search or a local docs index) for relevant information.
+
+    Args:
+        query (str): The search query.
+
+    Returns:
+        dict: status and result (search results) or error msg.
+    """
+    try:
+        backend, namespace = _resolve_backend()
+    except ValueError as e:
+        return {
+            "status": "error",
+            "error_message": str(e)
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error_message": f"Search failed: {str(e)}"
+        }
+
+    page_size, timeout = _search_settings()
+
+    try:
+        results = _cached_search(backend, namespace, query, page_size, timeout)
         return {
             "status": "success",
-            "report": "\n\n".join(results) if results else "No results found."
+            "report": format_results(results)
         }
-        
+
     except Exception as e:
         return {
             "status": "error",
             "error_message": f"Search failed: {str(e)}"
         }
+
+
+async def search_knowledge_base_many(queries: list[str]) -> dict:
+    """Searches the knowledge base with several phrasings of a question at once.
+
+    Prefer this over repeated search_knowledge_base calls when rephrasing a
+    question. Results from all queries are merged and de-duplicated.
+
+    Args:
+        queries (list[str]): Alternative search queries (up to 8).
+
+    Returns:
+        dict: status and merged result (search results) or error msg.
+    """
+    unique = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))[:MAX_QUERIES_PER_CALL]
+    if not unique:
+        return {"status": "error", "error_message": "At least one non-empty query is required."}
+
+    try:
+        backend, namespace = _resolve_backend()
+    except ValueError as e:
+        return {"status": "error", "error_message": str(e)}
+    except Exception as e:
+        return {"status": "error", "error_message": f"Search failed: {str(e)}"}
+
+    page_size, timeout = _search_settings()
+    if hasattr(backend, "search_many"):
+        try:
+            outcomes = await asyncio.to_thread(_cached_search_many, backend, namespace, unique, page_size)
+        except Exception as e:
+            return {"status": "error", "error_message": f"Search failed: {str(e)}"}
+    else:
+        limit = asyncio.Semaphore(max(1, env_number("KNOWLEDGE_BASE_MAX_PARALLEL", DEFAULT_MAX_PARALLEL, int)))
+
+        async def _one(query: str) -> List[Dict[str, str]]:
+            async with limit:
+                return await asyncio.to_thread(_cached_search, backend, namespace, query, page_size, timeout)
+
+        outcomes = await asyncio.gather(*(_one(q) for q in unique), return_exceptions=True)
+    result_lists = [o for o in outcomes if not isinstance(o, BaseException)]
+    errors = [f"{q}: {o}" for q, o in zip(unique, outcomes) if isinstance(o, BaseException)]
+    if not result_lists:
+        return {"status": "error", "error_message": "Search failed: " + "; ".join(errors)}
+
+    merged = reciprocal_rank_fusion(result_lists)[:page_size]
+    report = format_results(merged)
+    if errors:
+        report += "\n\n(Some queries failed: " + "; ".join(errors) + ")"
+    return {"status": "success", "report": report}
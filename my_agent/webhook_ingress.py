@@ -0,0 +1,130 @@
+"""Webhook intake for the Telegram bot: dedup and delivery metrics.
+
+Telegram re-sends an update when the webhook does not answer quickly. If
+the first delivery is still being processed, the retry would run the same
+agent turn twice. Two things prevent that:
+
+- The webhook acknowledges as soon as the update is queued. Processing runs
+  afterwards on the application's bounded worker pool.
+- :class:`UpdateDeduplicator` remembers a sliding window of recent
+  ``update_id`` values and drops any update it has already seen.
+
+:class:`WebhookIngress` ties them together. Updates are stamped and checked
+as they are queued, so the reported latency includes the time spent waiting
+in the queue and a redelivery never takes a place in it. The in-process
+route in ``app.py`` calls :meth:`WebhookIngress.accept` before queueing. The
+standalone bot, whose webhook server and poller are python-telegram-bot's
+own, is built with an :class:`IngressQueue` that does the same on ``put``.
+Either way an end-of-dispatch handler records receive-to-handled latency.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Set
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+from my_agent.stats_util import percentile
+
+
+# Runs after every other handler group.
+LATENCY_GROUP = 1000
+
+
+class UpdateDeduplicator:
+    """Sliding window over the last ``max_ids`` update ids."""
+
+    def __init__(self, max_ids: int = 10_000):
+        self.max_ids = max_ids
+        self._order: Deque[int] = deque()
+        self._ids: Set[int] = set()
+        self.hits = 0
+
+    def seen(self, update_id: int) -> bool:
+        """Return True for a repeat; otherwise remember ``update_id``."""
+        if update_id in self._ids:
+            self.hits += 1
+            return True
+        self._ids.add(update_id)
+        self._order.append(update_id)
+        if len(self._order) > self.max_ids:
+            self._ids.discard(self._order.popleft())
+        return False
+
+
+class IngressQueue(asyncio.Queue):
+    """Update queue that runs :meth:`WebhookIngress.accept` on every ``put``.
+
+    Duplicate updates are dropped instead of queued. Anything that is not an
+    :class:`Update`, such as the application's stop signal, passes through.
+    """
+
+    def __init__(self, ingress: "WebhookIngress", maxsize: int = 0):
+        super().__init__(maxsize)
+        self.ingress = ingress
+
+    def put_nowait(self, item) -> None:
+        # Queue.put() ends in put_nowait(), so this covers both.
+        if isinstance(item, Update) and not self.ingress.accept(item):
+            return
+        super().put_nowait(item)
+
+
+class WebhookIngress:
+    """Dedup plus queue and latency metrics for incoming updates."""
+
+    def __init__(self, dedup_window: int = 10_000):
+        self.dedup = UpdateDeduplicator(dedup_window)
+        self.received = 0
+        self._received_at: Dict[int, float] = {}
+        self._latencies_ms: Deque[float] = deque(maxlen=1000)
+        self._application: Optional[Application] = None
+
+    @classmethod
+    def from_env(cls) -> "WebhookIngress":
+        return cls(dedup_window=int(os.getenv("TELEGRAM_DEDUP_WINDOW", "10000")))
+
+    def accept(self, update: Update) -> bool:
+        """Record receipt of ``update``; False if it is a duplicate delivery."""
+        self.received += 1
+        if self.dedup.seen(update.update_id):
+            return False
+        self._received_at[update.update_id] = time.monotonic()
+        if len(self._received_at) > self.dedup.max_ids:
+            # Updates that never reached the latency handler.
+            del self._received_at[next(iter(self._received_at))]
+        return True
+
+    def make_queue(self) -> IngressQueue:
+        """An update queue for ``ApplicationBuilder.update_queue`` that dedups on intake."""
+        return IngressQueue(self)
+
+    def install(self, application: Application) -> None:
+        """Register the latency handler on ``application``.
+
+        Its updates must reach the queue through :meth:`accept` or a queue
+        from :meth:`make_queue`.
+        """
+        self._application = application
+        application.add_handler(TypeHandler(Update, self._record_latency), group=LATENCY_GROUP)
+
+    async def _record_latency(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        received_at = self._received_at.pop(update.update_id, None)
+        if received_at is not None:
+            self._latencies_ms.append((time.monotonic() - received_at) * 1000)
+
+    def get_stats(self) -> dict:
+        latencies = list(self._latencies_ms)
+        queue = self._application.update_queue if self._application is not None else None
+        return {
+            "received": self.received,
+            "dedup_hits": self.dedup.hits,
+            "queue_depth": queue.qsize() if queue is not None else 0,
+            "in_flight": len(self._received_at),
+            "latency_p50_ms": round(percentile(latencies, 0.50), 2) if latencies else 0.0,
+            "latency_p95_ms": round(percentile(latencies, 0.95), 2) if latencies else 0.0,
+            "latency_max_ms": round(max(latencies), 2) if latencies else 0.0,
+        }
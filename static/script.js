@@ -58,8 +58,10 @@ async function sendMessage() {
         const data = await response.json();
         appendMessage(data.response, 'agent');
 
-        // Refresh stats immediately to show new request count
-        updateDashboard();
+        // The stats stream pushes the new request count on its own
+        if (!statsStream) {
+            updateDashboard();
+        }
 
     } catch (error) {
         console.error('Error sending message:', error);
@@ -84,31 +86,78 @@ function appendMessage(text, sender) {
     chatHistory.scrollTop = chatHistory.scrollHeight;
 }
 
+// Latest dashboard state; kept up to date by the stats stream or by polling.
+let dashboardState = {};
+let statsStream = null;
+let pollTimer = null;
+
+function renderDashboard(state) {
+    const statusBadge = document.getElementById('status-badge');
+    const isHealthy = state.status === 'healthy';
+    const isWarming = state.status === 'warming_up';
+    statusBadge.textContent = isHealthy ? 'Healthy' : (isWarming ? 'Warming up' : 'Unhealthy');
+    statusBadge.classList.toggle('healthy', isHealthy);
+    statusBadge.classList.toggle('error', !isHealthy);
+    document.getElementById('uptime').textContent = Math.floor(state.uptime_seconds || 0) + 's';
+    document.getElementById('requests').textContent = state.request_count ?? '--';
+    document.getElementById('errors').textContent = state.error_count ?? '--';
+    document.getElementById('model').textContent = state.model || '--';
+    document.getElementById('agent-name').textContent = state.agent_name || '--';
+    document.getElementById('last-updated').textContent = new Date().toLocaleTimeString();
+}
+
 async function updateDashboard() {
     try {
         // Fetch health
         const healthResponse = await fetch(`${API_URL}/health`);
         const healthData = await healthResponse.json();
-        const statusBadge = document.getElementById('status-badge');
-        const isHealthy = healthData.status === 'healthy';
-        statusBadge.textContent = isHealthy ? 'Healthy' : 'Unhealthy';
-        statusBadge.classList.toggle('healthy', isHealthy);
-        statusBadge.classList.toggle('error', !isHealthy);
-        document.getElementById('uptime').textContent = Math.floor(healthData.uptime_seconds) + 's';
 
         // Fetch stats
         const statsResponse = await fetch(`${API_URL}/stats`);
         const statsData = await statsResponse.json();
-        document.getElementById('requests').textContent = statsData.request_count;
-        document.getElementById('errors').textContent = statsData.error_count;
-        document.getElementById('model').textContent = statsData.model || '--';
-        document.getElementById('agent-name').textContent = statsData.agent_name || '--';
-        document.getElementById('last-updated').textContent = new Date().toLocaleTimeString();
+
+        dashboardState = { ...statsData, status: healthData.status, uptime_seconds: healthData.uptime_seconds };
+        renderDashboard(dashboardState);
     } catch (error) {
         console.error('Error updating dashboard:', error);
     }
 }
 
+function startPolling() {
+    if (pollTimer) return;
+    updateDashboard();
+    pollTimer = setInterval(updateDashboard, 5000); // Update every 5 seconds
+}
+
+// Subscribe to server-pushed stats; fall back to polling if the stream is
+// unavailable or keeps failing.
+function startStatsStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    let failures = 0;
+    statsStream = new EventSource(`${API_URL}/api/stats/stream`);
+    statsStream.addEventListener('snapshot', (event) => {
+        failures = 0;
+        dashboardState = JSON.parse(event.data);
+        renderDashboard(dashboardState);
+    });
+    statsStream.addEventListener('delta', (event) => {
+        Object.assign(dashboardState, JSON.parse(event.data));
+        renderDashboard(dashboardState);
+    });
+    statsStream.onerror = () => {
+        failures += 1;
+        if (failures >= 3) {
+            console.warn('Stats stream unavailable; falling back to polling');
+            statsStream.close();
+            statsStream = null;
+            startPolling();
+        }
+    };
+}
+
 // Event listeners
 document.getElementById('send-btn').addEventListener('click', sendMessage);
 document.getElementById('chat-input').addEventListener('keypress', (e) => {
@@ -118,5 +167,4 @@ document.getElementById('chat-input').addEventListener('keypress', (e) => {
 });
 
 // Initial dashboard update
-updateDashboard();
-setInterval(updateDashboard, 5000); // Update every 5 seconds
+startStatsStream();
@@ -9,12 +9,15 @@ import asyncio
 import logging
 from functools import partial
 
-import httpx
 from dotenv import load_dotenv
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, ContextTypes, filters
 
 from my_agent.secret_manager import load_secret_into_env
+from my_agent.message_coalescer import MessageCoalescer, PendingMessage
+from my_agent.telegram_bot import AgentApiClient, answer, flush_coalesced
+from my_agent.rate_limiter import TelegramRateLimiter
+from my_agent.update_processor import PerChatUpdateProcessor
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -45,53 +48,60 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text("Hi! Send me a message and I'll ask the ADK agent.")
 
 
-async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE, client: httpx.AsyncClient) -> None:
+async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     if not update.message or not update.message.text:
         return
     user_text = update.message.text.strip()
-    session_id = f"tg_{update.effective_user.id}"
+    user_id = str(update.effective_user.id)
+    session_id = f"tg_{user_id}"
 
-    try:
-        resp = await client.post(
-            f"{API_URL}/api/chat",
-            json={"message": user_text, "session_id": session_id},
-            timeout=30,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        reply = data.get("response", "(no response)")
-    except Exception as exc:
-        logger.error("Error talking to agent: %s", exc)
-        reply = "Sorry, I could not reach the agent."
-
-    await update.message.reply_text(reply)
+    coalescer = context.application.bot_data.get("coalescer")
+    if coalescer is not None:
+        # Rapid follow-up messages in a chat are answered together in one agent turn.
+        coalescer.add(update.effective_chat.id, PendingMessage(user_text, update.message, session_id, user_id))
+        return
+    await answer(context.application.bot_data["agent_client"], update.message, session_id, user_text, user_id)
 
 
-async def main() -> None:
-    token = read_token()
-    client = httpx.AsyncClient()
+def build_app(token: str, client: AgentApiClient) -> Application:
     app = (
         Application.builder()
         .token(token)
-        .rate_limiter(None)  # no built-in rate limit; keep it simple
+        .rate_limiter(TelegramRateLimiter.from_env())
+        .concurrent_updates(PerChatUpdateProcessor.from_env())
         .build()
     )
+    app.bot_data["agent_client"] = client
+    # Coalesced batches run through the update processor like any update,
+    # keeping per-chat ordering and the worker bound.
+    coalescer = MessageCoalescer.from_env(partial(flush_coalesced, app))
+    if coalescer is not None:
+        app.bot_data["coalescer"] = coalescer
 
     app.add_handler(CommandHandler("start", start))
-    app.add_handler(
-        MessageHandler(
-            filters.TEXT & (~filters.COMMAND),
-            partial(handle_message, client=client),
-        )
-    )
+    app.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), handle_message))
+    return app
+
+
+async def main() -> None:
+    token = read_token()
+    # One pooled client for the bot's lifetime; connections are kept alive
+    # between messages.
+    client = AgentApiClient(API_URL)
+    app = build_app(token, client)
+    coalescer = app.bot_data.get("coalescer")
 
     logger.info("Starting Telegram bot; forwarding to %s", API_URL)
-    await app.initialize()
-    await app.start()
-    await app.updater.start_polling()
-    await app.updater.idle()
-    await app.stop()
-    await client.aclose()
+    try:
+        await app.initialize()
+        await app.start()
+        await app.updater.start_polling()
+        await app.updater.idle()
+        await app.stop()
+    finally:
+        if coalescer is not None:
+            await coalescer.drain()
+        await client.aclose()
 
 
 if __name__ == "__main__":
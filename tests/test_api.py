@@ -1,4 +1,9 @@
 """Integration tests for the FastAPI endpoints."""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -36,6 +41,8 @@ class TestStatsEndpoint:
         assert "latency_p95_ms" in data
         assert "tool_calls_total" in data
         assert "tool_calls_by_name" in data
+        assert data["event_loop"]["running"] is True
+        assert "lag_histogram_ms" in data["event_loop"]
         
         assert data["agent_name"] == "gemini_adk_agent"
         assert "gemini" in data["model"].lower()
@@ -102,3 +109,397 @@ class TestRootEndpoint:
         assert response.status_code == 200
         # Should return HTML content
         assert "text/html" in response.headers.get("content-type", "")
+
+
+class TestWarmup:
+    """Test lifespan warm-up and readiness reporting."""
+
+    @pytest.fixture
+    def app_module(self, monkeypatch):
+        import app as app_module
+
+        monkeypatch.setitem(app_module.warmup_state, "status", "pending")
+        monkeypatch.setitem(app_module.warmup_state, "steps", {})
+        monkeypatch.setitem(app_module.warmup_state, "errors", {})
+        monkeypatch.setenv("PRELOAD_TOOL_SDKS", "false")
+        return app_module
+
+    def test_health_not_ready_before_warmup(self, app_module):
+        """Health returns 503 until warm-up finishes."""
+        response = TestClient(app_module.app).get("/health")
+        assert response.status_code == 503
+        assert response.json()["ready"] is False
+
+    def test_warm_up_marks_ready_and_records_steps(self, app_module, monkeypatch):
+        """Warm-up runs every step and records failures without blocking readiness."""
+        calls = []
+
+        async def fake_models():
+            calls.append("models")
+
+        def failing_search():
+            raise RuntimeError("no credentials")
+
+        monkeypatch.setattr(app_module, "_warm_model_clients", fake_models)
+        monkeypatch.setattr(app_module, "warm_search_backend", failing_search)
+        monkeypatch.setattr(app_module, "warm_devops_clients", lambda: calls.append("devops"))
+
+        asyncio.run(app_module.warm_up())
+
+        state = app_module.warmup_state
+        assert state["status"] == "ready"
+        assert sorted(calls) == ["devops", "models"]
+        assert set(state["steps"]) == {"model_clients", "search_backend", "devops_clients"}
+        assert state["errors"] == {"search_backend": "no credentials"}
+        assert TestClient(app_module.app).get("/health").status_code == 200
+
+    def test_lifespan_warms_up_outside_test_mode(self, app_module, monkeypatch):
+        """Outside test mode the lifespan starts warm-up and health turns ready."""
+        async def fake_models():
+            await asyncio.sleep(0.05)
+
+        monkeypatch.setenv("ADK_TEST_MODE", "false")
+        monkeypatch.setattr(app_module, "_warm_model_clients", fake_models)
+        monkeypatch.setattr(app_module, "warm_search_backend", lambda: False)
+        monkeypatch.setattr(app_module, "warm_devops_clients", lambda: False)
+
+        with TestClient(app_module.app) as client:
+            assert client.get("/health").status_code == 503
+            deadline = time.time() + 5
+            while client.get("/health").status_code != 200 and time.time() < deadline:
+                time.sleep(0.01)
+            assert client.get("/health").json()["ready"] is True
+
+
+class TestTelegramWebhook:
+    """Test the optional in-process Telegram webhook route."""
+
+    @pytest.fixture
+    def application(self, monkeypatch):
+        import app as app_module
+        from unittest.mock import AsyncMock
+        from types import SimpleNamespace
+
+        from my_agent.webhook_ingress import WebhookIngress
+
+        application = SimpleNamespace(
+            bot=None,
+            bot_data={"ingress": WebhookIngress()},
+            update_queue=asyncio.Queue(),
+            stop=AsyncMock(),
+            shutdown=AsyncMock(),
+        )
+        monkeypatch.setitem(app_module.telegram_state, "application", application)
+        return application
+
+    def _update(self):
+        return {"update_id": 1, "message": {
+            "message_id": 1, "date": 0, "chat": {"id": 42, "type": "private"}, "text": "/chat hi",
+        }}
+
+    def test_webhook_not_mounted_by_default(self, client):
+        """Without in-process mode the route is not served."""
+        assert client.post("/telegram/webhook", json=self._update()).status_code == 404
+
+    def test_webhook_queues_update_and_acks(self, client, application):
+        """Updates are queued for the bot's workers and acknowledged at once."""
+        response = client.post("/telegram/webhook", json=self._update())
+        assert response.json() == {"ok": True}
+        update = application.update_queue.get_nowait()
+        assert update.update_id == 1
+        assert update.message.text == "/chat hi"
+
+    def test_webhook_drops_redelivered_update(self, client, application):
+        """A retried delivery of the same update_id is acked but not queued."""
+        client.post("/telegram/webhook", json=self._update())
+        response = client.post("/telegram/webhook", json=self._update())
+        assert response.json() == {"ok": True, "duplicate": True}
+        assert application.update_queue.qsize() == 1
+        stats = application.bot_data["ingress"].get_stats()
+        assert stats["received"] == 2
+        assert stats["dedup_hits"] == 1
+
+    def test_webhook_checks_secret_token(self, client, application, monkeypatch):
+        """A configured secret token must match Telegram's header."""
+        monkeypatch.setenv("TELEGRAM_WEBHOOK_SECRET", "s3cret")
+        assert client.post("/telegram/webhook", json=self._update()).status_code == 403
+        response = client.post(
+            "/telegram/webhook", json=self._update(), headers={"X-Telegram-Bot-Api-Secret-Token": "s3cret"}
+        )
+        assert response.status_code == 200
+        assert application.update_queue.qsize() == 1
+
+
+class TestChatStreaming:
+    """Test streamed replies from run_chat and /api/chat/stream."""
+
+    def test_stream_endpoint_returns_ndjson(self, client):
+        response = client.post("/api/chat/stream", json={"message": "hi", "session_id": "s1"})
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines[0] == {"delta": "[test-mode] hi"}
+        assert lines[-1]["done"] is True
+        assert lines[-1]["response"] == "[test-mode] hi"
+        assert lines[-1]["trace_id"]
+
+    def test_run_chat_forwards_partial_text_once(self, monkeypatch):
+        import app as app_module
+
+        def event(text, partial):
+            return SimpleNamespace(
+                content=SimpleNamespace(parts=[SimpleNamespace(text=text)]),
+                partial=partial,
+                get_function_calls=lambda: [],
+            )
+
+        class FakeRunner:
+            async def run_async(self, **kwargs):
+                self.run_config = kwargs["run_config"]
+                yield event("Hel", True)
+                yield event("lo", True)
+                yield event("Hello", False)
+                yield event("No partials", False)
+
+        fake = FakeRunner()
+        monkeypatch.setenv("ADK_TEST_MODE", "false")
+        monkeypatch.setattr(app_module, "runner", fake)
+        deltas = []
+        result = asyncio.run(app_module.run_chat("hi", "stream_session", on_text=deltas.append))
+
+        assert deltas == ["Hel", "lo", "No partials"]
+        assert result.text == "HelloNo partials"
+        assert fake.run_config.streaming_mode == app_module.StreamingMode.SSE
+
+
+class TestStatsStream:
+    """Test the /api/stats/stream SSE endpoint."""
+
+    def test_stream_starts_with_full_snapshot(self):
+        import app as app_module
+
+        async def run():
+            response = await app_module.stats_stream()
+            first = await response.body_iterator.__anext__()
+            subscribers = app_module.stats_broadcaster.subscriber_count
+            await response.body_iterator.aclose()
+            return response, first, subscribers
+
+        response, first, subscribers = asyncio.run(run())
+        assert response.media_type == "text/event-stream"
+        event, data = first.strip().split("\n")
+        assert event == "event: snapshot"
+        snapshot = json.loads(data[len("data: "):])
+        assert {"status", "request_count", "error_count", "model", "agent_name"} <= set(snapshot)
+        assert subscribers == 1
+        assert app_module.stats_broadcaster.subscriber_count == 0
+
+
+@pytest.fixture
+def debug_client(client, monkeypatch):
+    """Client with the debug endpoints enabled and the token sent."""
+    monkeypatch.setenv("DEBUG_ENDPOINTS_ENABLED", "true")
+    monkeypatch.setenv("DEBUG_TOKEN", "s3cret")
+    client.headers["X-Debug-Token"] = "s3cret"
+    return client
+
+
+class TestDebugTraces:
+    """Tests for the trace waterfall endpoint."""
+
+    def test_disabled_by_default(self, client, monkeypatch):
+        monkeypatch.delenv("DEBUG_ENDPOINTS_ENABLED", raising=False)
+        assert client.get("/debug/traces/anything").status_code == 404
+
+    def test_waterfall_and_json(self, debug_client):
+        from my_agent import tracing
+
+        client = debug_client
+        with tracing.span("chat", trace_id="api-trace"):
+            with tracing.span("tool:get_weather"):
+                pass
+
+        page = client.get("/debug/traces/api-trace")
+        assert page.status_code == 200
+        assert page.headers["content-type"].startswith("text/html")
+        assert "tool:get_weather" in page.text
+
+        data = client.get("/debug/traces/api-trace", params={"format": "json"}).json()
+        assert [s["name"] for s in data["spans"]] == ["chat", "tool:get_weather"]
+        assert client.get("/debug/traces").json()["traces"][0]["trace_id"] == "api-trace"
+        assert client.get("/debug/traces/missing").status_code == 404
+
+    def test_token_required(self, client, monkeypatch):
+        monkeypatch.setenv("DEBUG_ENDPOINTS_ENABLED", "true")
+        monkeypatch.delenv("DEBUG_TOKEN", raising=False)
+        # Enabled without a configured token stays closed.
+        assert client.get("/debug/traces").status_code == 403
+        monkeypatch.setenv("DEBUG_TOKEN", "s3cret")
+        assert client.get("/debug/traces").status_code == 403
+        assert client.get("/debug/traces", headers={"X-Debug-Token": "wrong"}).status_code == 403
+        assert client.get("/debug/traces", headers={"X-Debug-Token": "s3cret"}).status_code == 200
+
+
+class TestDebugProfile:
+    """Tests for the sampling profiler endpoint."""
+
+    def test_disabled_by_default(self, client, monkeypatch):
+        monkeypatch.delenv("DEBUG_ENDPOINTS_ENABLED", raising=False)
+        assert client.get("/debug/profile").status_code == 404
+
+    def test_rejects_unknown_mode(self, debug_client):
+        assert debug_client.get("/debug/profile", params={"mode": "heap"}).status_code == 400
+
+    def test_collapsed_and_json(self, debug_client):
+        client = debug_client
+        response = client.get("/debug/profile", params={"seconds": 0.2, "mode": "wall"})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert int(response.headers["X-Profile-Samples"]) > 0
+        assert response.text.splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+        data = client.get("/debug/profile", params={"seconds": 0.2, "mode": "asyncio", "format": "json"}).json()
+        assert data["mode"] == "asyncio"
+        assert data["ticks"] > 0
+
+    def test_one_profile_at_a_time(self, debug_client):
+        from my_agent.sampling_profiler import profile_lock
+
+        with profile_lock:
+            assert debug_client.get("/debug/profile", params={"seconds": 0.1}).status_code == 409
+
+
+class TestTokenBudget:
+    """Token accounting and per-session budgets in run_chat."""
+
+    @staticmethod
+    def _runner(calls):
+        class FakeRunner:
+            async def run_async(self, **kwargs):
+                calls.append(kwargs["session_id"])
+                yield SimpleNamespace(
+                    author="gemini_adk_agent",
+                    content=SimpleNamespace(parts=[SimpleNamespace(text="ok")]),
+                    partial=False,
+                    usage_metadata=SimpleNamespace(
+                        prompt_token_count=400, candidates_token_count=100, cached_content_token_count=None
+                    ),
+                    get_function_calls=lambda: [],
+                )
+
+        return FakeRunner()
+
+    def test_usage_is_recorded_and_budget_rejects(self, monkeypatch):
+        import app as app_module
+        from my_agent.session_monitor import session_monitor
+
+        calls = []
+        monkeypatch.setenv("ADK_TEST_MODE", "false")
+        monkeypatch.setenv("SESSION_TOKEN_BUDGET", "900")
+        monkeypatch.setattr(app_module, "runner", self._runner(calls))
+
+        first = asyncio.run(app_module.run_chat("hi", "budget_reject", user_id="budget_user"))
+        second = asyncio.run(app_module.run_chat("hi", "budget_reject", user_id="budget_user"))
+        deltas = []
+        third = asyncio.run(
+            app_module.run_chat("hi", "budget_reject", user_id="budget_user", on_text=deltas.append)
+        )
+
+        assert first.text == second.text == "ok"
+        assert third.text == app_module.BUDGET_REPLY
+        assert deltas == [app_module.BUDGET_REPLY]
+        assert len(calls) == 2
+        info = session_monitor.sessions["budget_reject"]
+        assert (info.prompt_tokens, info.completion_tokens) == (800, 200)
+        usage = app_module.build_stats()["token_usage"]
+        assert usage["top_users"]["budget_user"]["total_tokens"] == 1000
+
+    def test_compact_drops_history_and_continues(self, monkeypatch):
+        import app as app_module
+        from my_agent.session_monitor import session_monitor
+
+        calls = []
+        monkeypatch.setenv("ADK_TEST_MODE", "false")
+        monkeypatch.setenv("SESSION_TOKEN_BUDGET", "500")
+        monkeypatch.setenv("SESSION_BUDGET_ACTION", "compact")
+        monkeypatch.setattr(app_module, "runner", self._runner(calls))
+
+        async def run():
+            await app_module.run_chat("hi", "budget_compact", user_id="compact_user")
+            return await app_module.run_chat("again", "budget_compact", user_id="compact_user")
+
+        result = asyncio.run(run())
+        assert result.text == "ok"
+        assert len(calls) == 2
+        info = session_monitor.sessions["budget_compact"]
+        assert info.compactions == 1
+        assert info.budget_tokens == 500  # only the turn after compaction
+        assert info.prompt_tokens + info.completion_tokens == 1000
+
+
+    def test_request_user_is_billed_and_bad_budget_is_ignored(self, monkeypatch, client):
+        import app as app_module
+
+        monkeypatch.setenv("ADK_TEST_MODE", "false")
+        monkeypatch.setenv("SESSION_TOKEN_BUDGET", "lots")
+        monkeypatch.setattr(app_module, "runner", self._runner([]))
+
+        response = client.post(
+            "/api/chat", json={"message": "hi", "session_id": "budget_user_field", "user_id": "tg_7"}
+        )
+
+        assert response.status_code == 200
+        assert response.json()["response"] == "ok"
+        assert app_module.usage_ledger.by_user["tg_7"].total_tokens == 500
+
+
+class TestSecretRotation:
+    """Rotated secrets reach the clients that already hold the old value."""
+
+    def test_rotated_api_key_reaches_live_model_client(self, monkeypatch):
+        import app as app_module
+        from my_agent import secret_manager
+        from tests.test_secret_manager import RecordingClient
+
+        for llm_agent in (app_module.agent, app_module.devops_agent):
+            monkeypatch.setattr(llm_agent, "model", llm_agent.model)
+        monkeypatch.setenv("GOOGLE_API_KEY", "old-key")
+        secret = "projects/demo-project/secrets/api-key"
+        client = RecordingClient({f"{secret}/versions/1": "old-key", f"{secret}/versions/2": "new-key"})
+        watcher = secret_manager.start_secret_rotation(
+            [("GOOGLE_API_KEY", f"{secret}/versions/latest", f"{secret}/versions/1")],
+            interval=3600,
+            client=client,
+        )
+
+        async def api_key():
+            return app_module.agent.canonical_model.api_client._api_client.api_key
+
+        try:
+            with TestClient(app_module.app) as test_client:
+                assert test_client.portal.call(api_key) == "old-key"
+                client.latest[secret] = f"{secret}/versions/2"
+                assert watcher.check_once() == 1
+                # The listener hands the rebuild to the app's loop; this call
+                # is queued behind it.
+                assert test_client.portal.call(api_key) == "new-key"
+            assert watcher._listeners == []
+        finally:
+            secret_manager.stop_secret_rotation()
+
+    def test_rotated_bot_token_restarts_inprocess_bot(self, monkeypatch):
+        import app as app_module
+
+        restarted = []
+
+        async def restart():
+            restarted.append(True)
+
+        monkeypatch.setattr(app_module, "restart_telegram_inprocess", restart)
+        monkeypatch.setitem(app_module.telegram_state, "application", object())
+
+        async def run():
+            app_module.apply_secret_rotation("TELEGRAM_BOT_TOKEN")
+            await app_module.telegram_state.pop("restart")
+
+        asyncio.run(run())
+        assert restarted == [True]
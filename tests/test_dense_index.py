@@ -0,0 +1,119 @@
+"""Tests for the dense embedding knowledge base backend."""
+import json
+
+import numpy as np
+import pytest
+
+from my_agent import vertex_tools
+from my_agent.dense_index import (
+    DenseIndexBackend,
+    DenseMatrix,
+    HashingEmbedder,
+    build_dense_index,
+    main,
+    write_matrix_index,
+)
+from my_agent.local_index import Chunk
+
+
+CHUNKS = [
+    Chunk("Deployment", "deploy.md#deployment", "Run deploy.sh to build the image and deploy to Cloud Run."),
+    Chunk("Secrets", "deploy.md#secrets", "Store the Gemini API key in Secret Manager."),
+    Chunk("Telegram bot", "telegram.md", "Configure the Telegram webhook URL for the bot service."),
+    Chunk("Pub/Sub", "devops.md", "The DevOps agent creates Pub/Sub topics and writes logs."),
+]
+
+
+@pytest.fixture(autouse=True)
+def reset_backends():
+    vertex_tools.reset_search_backends()
+    vertex_tools.search_cache.clear()
+    yield
+    vertex_tools.reset_search_backends()
+    vertex_tools.search_cache.clear()
+
+
+def test_hashing_embedder_is_deterministic_and_normalised():
+    embedder = HashingEmbedder(dim=64)
+    first = embedder.embed(["deploy to cloud run", ""])
+    second = HashingEmbedder(dim=64).embed(["deploy to cloud run", ""])
+    np.testing.assert_array_equal(first, second)
+    assert first.shape == (2, 64)
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+    assert not first[1].any()
+
+
+def test_semantic_search_ranks_related_chunk_first(tmp_path):
+    out = tmp_path / "dense"
+    build_dense_index(CHUNKS, str(out), HashingEmbedder(dim=128))
+    backend = DenseIndexBackend(str(out))
+
+    results = backend.search("telegram webhooks", page_size=2)
+
+    assert results[0]["title"] == "Telegram bot"
+    assert len(results) == 2
+    assert set(results[0]) == {"title", "snippet", "link", "id"}
+
+
+@pytest.mark.parametrize("dtype", ["float16", "float32"])
+def test_ivf_matches_flat_when_probing_all_clusters(tmp_path, dtype):
+    rng = np.random.default_rng(1)
+    data = rng.standard_normal((500, 16)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    queries = data[:5]
+
+    write_matrix_index(data, str(tmp_path / "flat"), dtype=dtype)
+    write_matrix_index(data, str(tmp_path / "ivf"), dtype=dtype, nlist=8)
+    flat = DenseMatrix(str(tmp_path / "flat"))
+    ivf = DenseMatrix(str(tmp_path / "ivf"), nprobe=8)
+
+    flat_scores, flat_ids = flat.search_vectors(queries, 4)
+    ivf_scores, ivf_ids = ivf.search_vectors(queries, 4)
+
+    assert isinstance(flat.embeddings, np.memmap)
+    assert flat.embeddings.dtype == np.dtype(dtype)
+    np.testing.assert_array_equal(flat_ids[:, 0], np.arange(5))
+    np.testing.assert_array_equal(flat_ids, ivf_ids)
+    np.testing.assert_allclose(flat_scores, ivf_scores, rtol=1e-5)
+
+
+def test_search_knowledge_base_dense_backend(tmp_path, monkeypatch):
+    out = tmp_path / "dense"
+    build_dense_index(CHUNKS, str(out), HashingEmbedder(dim=128))
+    monkeypatch.setenv("KNOWLEDGE_BASE_BACKEND", "dense")
+    monkeypatch.setenv("KNOWLEDGE_BASE_DENSE_INDEX_DIR", str(out))
+    monkeypatch.delenv("KNOWLEDGE_BASE_EMBEDDER", raising=False)
+
+    result = vertex_tools.search_knowledge_base("secret manager key")
+
+    assert result["status"] == "success"
+    assert result["report"].startswith("Title: Secrets\nSnippet: ")
+
+
+def test_cli_bench_small(capsys):
+    main(["bench", "--sizes", "2000", "--dim", "16", "--queries", "8", "--batch", "4", "--nlist", "16"])
+    reports = json.loads(capsys.readouterr().out)
+    assert [r["index"] for r in reports] == ["flat", "ivf"]
+    assert all(r["mean_ms_per_query"] > 0 for r in reports)
+
+
+def test_batched_ivf_matches_one_query_at_a_time(tmp_path):
+    rng = np.random.default_rng(2)
+    data = rng.standard_normal((400, 16)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    write_matrix_index(data, str(tmp_path / "ivf"), dtype="float32", nlist=16)
+    ivf = DenseMatrix(str(tmp_path / "ivf"), nprobe=2)
+    queries = data[:6]
+
+    scores, ids = ivf.search_vectors(queries, 5)
+
+    for qi in range(len(queries)):
+        one_scores, one_ids = ivf.search_vectors(queries[qi : qi + 1], 5)
+        np.testing.assert_array_equal(ids[qi], one_ids[0])
+        np.testing.assert_allclose(scores[qi], one_scores[0], rtol=1e-6)
+
+
+def test_cli_bench_caps_nlist_for_small_sizes(capsys):
+    main(["bench", "--sizes", "300", "--dim", "16", "--queries", "4", "--batch", "4"])
+    reports = json.loads(capsys.readouterr().out)
+    assert [(r["index"], r["nlist"]) for r in reports] == [("flat", 0), ("ivf", 300)]
@@ -1,8 +1,18 @@
 """Unit tests for the DevOps agent tools."""
 import pytest
 from unittest.mock import MagicMock, patch
+from my_agent import devops_tools
 from my_agent.devops_tools import create_pubsub_topic, write_log_entry
 
+
+@pytest.fixture(autouse=True)
+def reset_clients():
+    """Make every test build its own clients."""
+    devops_tools.reset_clients()
+    yield
+    devops_tools.reset_clients()
+
+
 class TestDevOpsTools:
     """Test the DevOps tools."""
     
@@ -71,3 +81,34 @@ class TestDevOpsTools:
         # Verify
         assert result["status"] == "error"
         assert "Log Error" in result["error_message"]
+
+
+class TestDevOpsClientReuse:
+    """Test that DevOps clients are shared across tool calls."""
+
+    @patch("my_agent.devops_tools.logging")
+    @patch("my_agent.devops_tools.pubsub_v1")
+    def test_clients_reused(self, mock_pubsub, mock_logging):
+        """Repeated calls build each client once."""
+        create_pubsub_topic("p", "t1")
+        create_pubsub_topic("p", "t2")
+        write_log_entry("log", "one")
+        write_log_entry("log", "two")
+
+        mock_pubsub.PublisherClient.assert_called_once()
+        mock_logging.Client.assert_called_once()
+
+    @patch("my_agent.devops_tools.logging")
+    @patch("my_agent.devops_tools.pubsub_v1")
+    def test_warm_devops_clients(self, mock_pubsub, mock_logging, monkeypatch):
+        """Warm-up builds both clients when running against a GCP project."""
+        monkeypatch.setenv("GCP_PROJECT_ID", "demo-project")
+        monkeypatch.setenv("PUBSUB_REGION", "europe-west4")
+
+        assert devops_tools.warm_devops_clients() is True
+        create_pubsub_topic("demo-project", "t")
+
+        mock_pubsub.PublisherClient.assert_called_once_with(
+            client_options={"api_endpoint": "europe-west4-pubsub.googleapis.com"}
+        )
+        mock_logging.Client.assert_called_once()
@@ -0,0 +1,12 @@
+"""Tests for the shared environment helpers."""
+from my_agent.env_util import env_number
+
+
+def test_env_number_falls_back_on_missing_or_malformed(monkeypatch, caplog):
+    monkeypatch.delenv("TEST_ENV_NUMBER", raising=False)
+    assert env_number("TEST_ENV_NUMBER", 3, int) == 3
+    monkeypatch.setenv("TEST_ENV_NUMBER", "7")
+    assert env_number("TEST_ENV_NUMBER", 3, int) == 7
+    monkeypatch.setenv("TEST_ENV_NUMBER", "seven")
+    assert env_number("TEST_ENV_NUMBER", 3, int) == 3
+    assert "Invalid TEST_ENV_NUMBER='seven'" in caplog.text
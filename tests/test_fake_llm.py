@@ -0,0 +1,98 @@
+"""Tests for the scripted fake model and the model backend switch."""
+import asyncio
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.adk.sessions.in_memory_session_service import InMemorySessionService
+from google.genai import types
+
+from my_agent.agent import get_weather
+from my_agent.fake_llm import DEFAULT_SCRIPT, FakeLlm
+from my_agent.model_backend import model_name, resolve_model
+
+
+RULES = [
+    {"match": "weather", "call": "get_weather", "args": {"city": "London"}, "after": "Forecast: {result}"},
+    {"match": "deploy", "call": "not_a_tool"},
+    {"match": "", "reply": "echo {message}"},
+]
+
+
+def _run(llm, message, streaming=False):
+    async def run():
+        agent = Agent(name="fake_test_agent", model=llm, instruction="test", tools=[get_weather])
+        service = InMemorySessionService()
+        await service.create_session(app_name="fake_app", user_id="u", session_id="s")
+        runner = Runner(app_name="fake_app", agent=agent, session_service=service)
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE) if streaming else None
+        events = []
+        async for event in runner.run_async(
+            user_id="u",
+            session_id="s",
+            new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+            run_config=run_config,
+        ):
+            events.append(event)
+        return events
+
+    return asyncio.run(run())
+
+
+def _final_text(events):
+    return "".join(
+        p.text for e in events if not e.partial and e.content for p in e.content.parts or [] if p.text
+    )
+
+
+def test_scripted_tool_call_runs_the_real_tool():
+    llm = FakeLlm(model="fake", rules=RULES, first_token_delay=0, token_delay=0)
+    events = _run(llm, "How is the weather?")
+    calls = [c.name for e in events for c in e.get_function_calls()]
+    assert calls == ["get_weather"]
+    assert _final_text(events).startswith("Forecast: ")
+    assert "rainy" in _final_text(events)
+    assert llm.calls == 2
+
+
+def test_unknown_tool_falls_through_to_a_reply():
+    llm = FakeLlm(model="fake", rules=RULES, first_token_delay=0, token_delay=0)
+    events = _run(llm, "please deploy")
+    assert not [c for e in events for c in e.get_function_calls()]
+    assert _final_text(events) == "echo please deploy"
+
+
+def test_streaming_emits_one_partial_per_token_with_usage():
+    llm = FakeLlm(model="fake", rules=RULES, first_token_delay=0.01, token_delay=0.001)
+    events = _run(llm, "say hello to everyone", streaming=True)
+    partials = [e for e in events if e.partial]
+    assert "".join(p.text for e in partials for p in e.content.parts) == "echo say hello to everyone"
+    assert len(partials) == 5
+    final = [e for e in events if not e.partial][-1]
+    assert final.usage_metadata.candidates_token_count == 5
+    assert final.usage_metadata.prompt_token_count > 0
+
+
+def test_resolve_model(monkeypatch):
+    monkeypatch.delenv("AGENT_MODEL_BACKEND", raising=False)
+    assert resolve_model("gemini_adk_agent", "gemini-2.0-flash-exp") == "gemini-2.0-flash-exp"
+
+    monkeypatch.setenv("AGENT_MODEL_BACKEND", "fake")
+    monkeypatch.setenv("FAKE_LLM_TOKEN_DELAY_MS", "2")
+    llm = resolve_model("gemini_adk_agent", "gemini-2.0-flash-exp")
+    assert isinstance(llm, FakeLlm)
+    assert llm.rules == DEFAULT_SCRIPT["gemini_adk_agent"]
+    assert llm.token_delay == 0.002
+    assert model_name(llm) == "fake-gemini_adk_agent"
+
+    monkeypatch.setenv("AGENT_MODEL_BACKEND", "nope")
+    with pytest.raises(ValueError):
+        resolve_model("gemini_adk_agent", "gemini-2.0-flash-exp")
+
+
+def test_script_file_overrides_default(tmp_path, monkeypatch):
+    script = tmp_path / "script.json"
+    script.write_text('{"devops_agent": [{"match": "", "reply": "custom"}]}')
+    monkeypatch.setenv("FAKE_LLM_SCRIPT", str(script))
+    assert FakeLlm.from_env("devops_agent").rules == [{"match": "", "reply": "custom"}]
@@ -0,0 +1,135 @@
+"""Tests for LLM cassette recording and replay."""
+import asyncio
+import time
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.adk.runners import Runner
+from google.adk.sessions.in_memory_session_service import InMemorySessionService
+from google.genai import types
+
+from my_agent import llm_cassette
+from my_agent.agent import get_weather
+from my_agent.fake_llm import FakeLlm
+from my_agent.llm_cassette import Cassette, CassetteMiss, RecordingLlm, ReplayLlm, request_key
+from my_agent.model_backend import resolve_model
+
+
+RULES = [
+    {"match": "weather", "call": "get_weather", "args": {"city": "London"}},
+    {"match": "", "reply": "echo {message}"},
+]
+
+
+def _chat(llm, messages, streaming=True):
+    async def run():
+        agent = Agent(name="cassette_agent", model=llm, instruction="test", tools=[get_weather])
+        service = InMemorySessionService()
+        await service.create_session(app_name="cassette_app", user_id="u", session_id="s")
+        runner = Runner(app_name="cassette_app", agent=agent, session_service=service)
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE) if streaming else None
+        replies = []
+        for message in messages:
+            partials, text = [], ""
+            async for event in runner.run_async(
+                user_id="u",
+                session_id="s",
+                new_message=types.Content(role="user", parts=[types.Part(text=message)]),
+                run_config=run_config,
+            ):
+                parts = [p.text for p in (event.content.parts if event.content else []) or [] if p.text]
+                if event.partial:
+                    partials.extend(parts)
+                else:
+                    text += "".join(parts)
+            replies.append((text, len(partials)))
+        return replies
+
+    return asyncio.run(run())
+
+
+def _record(tmp_path, messages, **fake):
+    path = str(tmp_path / "llm.jsonl.gz")
+    inner = FakeLlm(model="fake", rules=RULES, **{"first_token_delay": 0, "token_delay": 0, **fake})
+    recorder = RecordingLlm(model="fake", inner=inner, agent_name="cassette_agent", cassette=Cassette(path))
+    return path, _chat(recorder, messages)
+
+
+def test_replay_reproduces_a_multi_turn_recording(tmp_path):
+    messages = ["How is the weather?", "thanks a lot"]
+    path, recorded = _record(tmp_path, messages)
+    entries = Cassette.read(path)
+    assert len(entries) == 3  # tool call, tool summary, plain reply
+    assert all(e["stream"] for e in entries)
+
+    cassette = Cassette(path)
+    replay = ReplayLlm(model="fake", agent_name="cassette_agent", cassette=cassette, time_scale=0, strict=True)
+    assert _chat(replay, messages) == recorded
+    assert cassette.get_stats()["hits"] == 3
+    assert cassette.get_stats()["misses"] == 0
+
+
+def test_streamed_recording_replays_without_streaming(tmp_path):
+    path, recorded = _record(tmp_path, ["say hello"])
+    replay = ReplayLlm(model="fake", agent_name="cassette_agent", cassette=Cassette(path), time_scale=0)
+    assert _chat(replay, ["say hello"], streaming=False) == [(recorded[0][0], 0)]
+
+
+def test_unmatched_request_falls_back_to_sequence_unless_strict(tmp_path):
+    path, recorded = _record(tmp_path, ["first message"])
+
+    replay = ReplayLlm(model="fake", agent_name="cassette_agent", cassette=Cassette(path), time_scale=0)
+    assert _chat(replay, ["something else"]) == recorded
+    assert replay.cassette.get_stats()["sequence_hits"] == 1
+
+    strict = ReplayLlm(model="fake", agent_name="cassette_agent", cassette=Cassette(path), strict=True)
+    with pytest.raises(CassetteMiss):
+        _chat(strict, ["something else"])
+
+
+def test_time_scale(tmp_path):
+    path, _ = _record(tmp_path, ["one two three four five"], first_token_delay=0.05, token_delay=0.01)
+
+    def timed(scale):
+        replay = ReplayLlm(model="fake", agent_name="cassette_agent", cassette=Cassette(path), time_scale=scale)
+        start = time.perf_counter()
+        _chat(replay, ["one two three four five"])
+        return time.perf_counter() - start
+
+    assert timed(1.0) >= 0.09
+    assert timed(0) < timed(1.0)
+
+
+def test_request_key_ignores_function_call_ids():
+    from google.adk.models.llm_request import LlmRequest
+
+    def request(call_id):
+        part = types.Part(function_call=types.FunctionCall(id=call_id, name="get_weather", args={"city": "X"}))
+        return LlmRequest(model="m", contents=[types.Content(role="model", parts=[part])])
+
+    assert request_key("a", request("adk-1")) == request_key("a", request("adk-2"))
+    assert request_key("a", request("adk-1")) != request_key("b", request("adk-1"))
+
+
+def test_request_key_keeps_ids_outside_function_parts():
+    from google.adk.models.llm_request import LlmRequest
+
+    def request(record_id):
+        part = types.Part(
+            function_response=types.FunctionResponse(id="adk-1", name="lookup", response={"id": record_id})
+        )
+        return LlmRequest(model="m", contents=[types.Content(role="user", parts=[part])])
+
+    assert request_key("a", request("order-1")) != request_key("a", request("order-2"))
+
+
+def test_resolve_model_replay(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_MODEL_BACKEND", "replay")
+    monkeypatch.setenv("LLM_CASSETTE", str(tmp_path / "none.jsonl.gz"))
+    monkeypatch.setenv("LLM_CASSETTE_TIME_SCALE", "0.5")
+    monkeypatch.setattr(llm_cassette, "_cassettes", {})
+    llm = resolve_model("devops_agent", "gemini-2.0-flash-exp")
+    assert isinstance(llm, ReplayLlm)
+    assert llm.time_scale == 0.5
+    assert llm.model == "gemini-2.0-flash-exp"
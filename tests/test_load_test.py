@@ -0,0 +1,58 @@
+"""Tests for the /api/chat load generator."""
+import asyncio
+import time
+
+from my_agent import load_test
+
+
+def test_loop_lag_monitor_sees_blocking():
+    async def run():
+        monitor = load_test.LoopLagMonitor(interval=0.005)
+        monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.05)  # blocks the loop
+        await asyncio.sleep(0.02)
+        return await monitor.stop()
+
+    report = asyncio.run(run())
+    assert report["samples"] > 2
+    assert report["max_ms"] >= 40
+
+
+def test_run_against_in_process_app():
+    report = asyncio.run(load_test.run(sessions=3, turns=2))
+    assert report["config"]["url"] == "in-process"
+    assert report["latency"]["requests"] == 6
+    assert report["latency"]["errors"] == 0
+    assert report["latency"]["p50_ms"] <= report["latency"]["p99_ms"]
+    assert set(report["memory"]) == {"rss_start_mb", "rss_end_mb", "rss_growth_mb"}
+    assert report["loop_lag"]["samples"] >= 0
+    assert report["loop_blocking"]["stalls_total"] >= 0
+
+
+def test_run_uses_fake_model_and_counts_failed_turns(monkeypatch):
+    from my_agent.agent import agent
+    from my_agent.devops_agent import devops_agent
+    from my_agent.fake_llm import FakeLlm
+
+    for llm_agent in (agent, devops_agent):
+        monkeypatch.setattr(llm_agent, "model", llm_agent.model)
+    monkeypatch.delenv("ADK_TEST_MODE")
+    monkeypatch.setenv("AGENT_MODEL_BACKEND", "fake")
+    monkeypatch.setenv("WARMUP_ENABLED", "false")
+    monkeypatch.setenv("FAKE_LLM_FIRST_TOKEN_MS", "1")
+    monkeypatch.setenv("FAKE_LLM_TOKEN_DELAY_MS", "0")
+
+    report = asyncio.run(load_test.run(sessions=1, turns=1))
+    assert isinstance(agent.model, FakeLlm)
+    assert agent.model.calls
+    assert report["latency"]["requests"] == 1
+    assert report["latency"]["errors"] == 0
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("model down")
+        yield
+
+    monkeypatch.setattr(FakeLlm, "generate_content_async", broken)
+    report = asyncio.run(load_test.run(sessions=1, turns=1))
+    assert report["latency"]["errors"] == 1
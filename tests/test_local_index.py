@@ -0,0 +1,120 @@
+"""Tests for the local BM25 knowledge base backend."""
+import json
+
+import pytest
+
+from my_agent import vertex_tools
+from my_agent.local_index import LocalIndexBackend, benchmark, build_index, iter_chunks, main, tokenize
+
+
+DOCS = {
+    "deploy.md": (
+        "# Deployment\n"
+        "Run deploy.sh to build the image and deploy to Cloud Run.\n\n"
+        "## Secrets\n"
+        "Store GOOGLE_API_KEY in Secret Manager and set GOOGLE_API_KEY_SECRET_ID.\n"
+    ),
+    "telegram.md": (
+        "# Telegram bot\n"
+        "Set TELEGRAM_WEBHOOK_URL to run the bot in webhook mode.\n"
+    ),
+    "notes.txt": "Pub/Sub topics are created by the DevOps agent.\n",
+}
+
+
+@pytest.fixture
+def docs_dir(tmp_path):
+    root = tmp_path / "docs"
+    root.mkdir()
+    for name, content in DOCS.items():
+        (root / name).write_text(content, encoding="utf-8")
+    return root
+
+
+@pytest.fixture
+def index_dir(docs_dir, tmp_path):
+    out = tmp_path / "index"
+    build_index(iter_chunks(str(docs_dir), link_prefix="https://docs.example/"), str(out))
+    return out
+
+
+@pytest.fixture(autouse=True)
+def reset_backends():
+    vertex_tools.reset_search_backends()
+    vertex_tools.search_cache.clear()
+    yield
+    vertex_tools.reset_search_backends()
+    vertex_tools.search_cache.clear()
+
+
+def test_tokenize():
+    assert tokenize("Deploy to Cloud-Run, a b!") == ["deploy", "to", "cloud", "run"]
+
+
+def test_chunks_split_on_headings(docs_dir):
+    chunks = list(iter_chunks(str(docs_dir)))
+    titles = [c.title for c in chunks]
+    assert titles == ["Deployment", "Secrets", "notes", "Telegram bot"]
+    assert chunks[1].link == "deploy.md#secrets"
+    assert chunks[2].link == "notes.txt"
+
+
+def test_bm25_ranks_matching_chunk_first(index_dir):
+    backend = LocalIndexBackend(str(index_dir))
+    try:
+        results = backend.search("secret manager api key", page_size=2)
+        assert results[0]["title"] == "Secrets"
+        assert results[0]["link"] == "https://docs.example/deploy.md#secrets"
+        assert "Secret Manager" in results[0]["snippet"]
+        assert backend.search("nonexistentterm", page_size=3) == []
+    finally:
+        backend.close()
+
+
+def test_search_knowledge_base_local_backend(index_dir, monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_BASE_BACKEND", "local")
+    monkeypatch.setenv("KNOWLEDGE_BASE_INDEX_DIR", str(index_dir))
+    monkeypatch.delenv("VERTEX_SEARCH_DATA_STORE_ID", raising=False)
+
+    result = vertex_tools.search_knowledge_base("telegram webhook")
+
+    assert result["status"] == "success"
+    assert result["report"].startswith("Title: Telegram bot\nSnippet: ")
+    assert "Link: https://docs.example/telegram.md#telegram-bot" in result["report"]
+
+
+def test_search_knowledge_base_missing_local_index(tmp_path, monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_BASE_BACKEND", "local")
+    monkeypatch.setenv("KNOWLEDGE_BASE_INDEX_DIR", str(tmp_path / "missing"))
+
+    result = vertex_tools.search_knowledge_base("anything")
+
+    assert result["status"] == "error"
+    assert "index not found" in result["error_message"]
+
+
+def test_cli_build_and_bench(docs_dir, tmp_path, capsys):
+    out = tmp_path / "cli-index"
+    main(["build", str(docs_dir), "--out", str(out)])
+    meta = json.loads(capsys.readouterr().out)
+    assert meta["num_docs"] == 4
+
+    main(["bench", "--index", str(out), "--iterations", "2"])
+    report = json.loads(capsys.readouterr().out)
+    assert report["queries"] > 0
+    assert report["p50_us"] > 0
+
+
+def test_bench_handles_empty_input(docs_dir, tmp_path):
+    out = tmp_path / "cli-index"
+    build_index(iter_chunks(str(docs_dir)), str(out))
+    backend = LocalIndexBackend(str(out))
+    assert benchmark(backend, [], 5, 3)["p95_us"] == 0.0
+    assert benchmark(backend, ["deploy"], 0, 3)["mean_us"] == 0.0
+
+    empty = tmp_path / "queries.txt"
+    empty.write_text("\n")
+    with pytest.raises(SystemExit):
+        main(["bench", "--index", str(out), "--queries", str(empty)])
+    with pytest.raises(SystemExit):
+        main(["bench", "--index", str(out), "--iterations", "0"])
@@ -0,0 +1,101 @@
+"""Tests for the event-loop lag watchdog."""
+import asyncio
+import logging
+import time
+
+from my_agent.loop_watchdog import LoopWatchdog, attribute
+from my_agent.tool_metrics import ToolMetrics, instrument_tool
+
+
+def blocking_handler():
+    time.sleep(0.25)
+
+
+def _run_with_watchdog(blocker):
+    async def main():
+        watchdog = LoopWatchdog(interval=0.02, threshold_ms=100)
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        blocker()
+        await asyncio.sleep(0.1)
+        await watchdog.stop()
+        return watchdog
+
+    return asyncio.run(main())
+
+
+def test_lag_histogram_without_stalls():
+    async def main():
+        watchdog = LoopWatchdog(interval=0.01, threshold_ms=100)
+        watchdog.start()
+        await asyncio.sleep(0.2)
+        await watchdog.stop()
+        return watchdog
+
+    stats = asyncio.run(main()).get_stats()
+    assert stats["samples"] >= 5
+    assert sum(stats["lag_histogram_ms"].values()) == stats["samples"]
+    assert stats["stalls_total"] == 0
+    assert stats["running"] is False
+
+
+def test_stall_attributed_to_blocking_tool(caplog):
+    def search_knowledge_base(query: str) -> dict:
+        time.sleep(0.25)
+        return {"status": "success"}
+
+    tool = instrument_tool("main", search_knowledge_base, ToolMetrics())
+    with caplog.at_level(logging.WARNING, logger="my_agent.loop_watchdog"):
+        watchdog = _run_with_watchdog(lambda: tool(query="q"))
+
+    stats = watchdog.get_stats()
+    assert stats["stalls_total"] == 1
+    source = stats["stalls_by_source"]["tool:search_knowledge_base"]
+    assert source["blocked_max_ms"] >= 200
+    assert any("search_knowledge_base" in frame for frame in source["last_stack"])
+    assert stats["lag_histogram_ms"]["le_250"] + stats["lag_histogram_ms"]["le_500"] >= 1
+    assert "tool:search_knowledge_base" in caplog.text
+
+
+def test_stall_outside_tools_attributed_to_handler():
+    watchdog = _run_with_watchdog(blocking_handler)
+    assert list(watchdog.get_stats()["stalls_by_source"]) == ["handler:blocking_handler"]
+
+
+def test_async_tool_blocking_is_attributed():
+    async def create_pubsub_topic(project_id: str, topic_id: str) -> dict:
+        time.sleep(0.25)
+        return {"status": "success"}
+
+    tool = instrument_tool("devops", create_pubsub_topic, ToolMetrics())
+
+    async def main():
+        watchdog = LoopWatchdog(interval=0.02, threshold_ms=100)
+        watchdog.start()
+        await asyncio.sleep(0.1)
+        await tool(project_id="p", topic_id="t")
+        await asyncio.sleep(0.1)
+        await watchdog.stop()
+        return watchdog
+
+    stats = asyncio.run(main()).get_stats()
+    assert "tool:create_pubsub_topic" in stats["stalls_by_source"]
+
+
+def test_lag_over_threshold_without_capture_is_unattributed():
+    watchdog = LoopWatchdog(threshold_ms=50)
+    watchdog.record_lag(10)
+    watchdog.record_lag(80)
+    stats = watchdog.get_stats()
+    assert stats["samples"] == 2
+    assert stats["stalls_by_source"]["unattributed"]["stalls"] == 1
+    assert stats["recent_stalls"][0]["blocked_ms"] == 80
+
+
+def test_attribute_falls_back_to_leaf():
+    import sys
+
+    assert attribute(None) == {"source": "unknown", "stack": []}
+    result = attribute(sys._getframe())
+    assert result["source"] == "handler:test_attribute_falls_back_to_leaf"
+    assert result["stack"][-1].startswith("test_attribute_falls_back_to_leaf (")
@@ -0,0 +1,100 @@
+"""Tests for per-chat message coalescing."""
+import asyncio
+import time
+
+from my_agent.message_coalescer import MessageCoalescer, PendingMessage
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+        self.running = 0
+        self.overlapped = False
+
+    async def __call__(self, key, items):
+        self.running += 1
+        self.overlapped |= self.running > 1
+        await asyncio.sleep(self.delay)
+        self.batches.append((key, [item.text for item in items], time.monotonic()))
+        self.running -= 1
+        return 1
+
+
+def test_burst_is_merged_in_order():
+    async def run():
+        recorder = Recorder()
+        coalescer = MessageCoalescer(recorder, window=0.05, max_wait=1)
+        for text in ("one", "two", "three"):
+            coalescer.add("chat", PendingMessage(text))
+            await asyncio.sleep(0.01)
+        coalescer.add("other", PendingMessage("solo"))
+        await asyncio.sleep(0.15)
+        return recorder, coalescer.get_stats()
+
+    recorder, stats = asyncio.run(run())
+    assert sorted((k, texts) for k, texts, _ in recorder.batches) == [
+        ("chat", ["one", "two", "three"]),
+        ("other", ["solo"]),
+    ]
+    assert stats["messages"] == 4
+    assert stats["agent_turns"] == 2
+    assert stats["model_calls"] == 2
+    assert stats["model_calls_per_message"] == 0.5
+    assert stats["max_batch"] == 3
+
+
+def test_max_wait_bounds_a_continuous_stream():
+    async def run():
+        recorder = Recorder()
+        coalescer = MessageCoalescer(recorder, window=0.05, max_wait=0.1)
+        start = time.monotonic()
+        for i in range(15):
+            coalescer.add("chat", PendingMessage(str(i)))
+            await asyncio.sleep(0.02)
+        await asyncio.sleep(0.1)
+        return recorder, start
+
+    recorder, start = asyncio.run(run())
+    assert len(recorder.batches) >= 2
+    assert recorder.batches[0][2] - start < 0.2
+    assert [t for _, texts, _ in recorder.batches for t in texts] == [str(i) for i in range(15)]
+
+
+def test_messages_during_a_turn_form_the_next_batch():
+    async def run():
+        recorder = Recorder(delay=0.1)
+        coalescer = MessageCoalescer(recorder, window=0.02, max_wait=0.05)
+        coalescer.add("chat", PendingMessage("first"))
+        await asyncio.sleep(0.05)  # first turn is running now
+        coalescer.add("chat", PendingMessage("second"))
+        await asyncio.sleep(0.01)
+        coalescer.add("chat", PendingMessage("third"))
+        await asyncio.sleep(0.3)
+        return recorder
+
+    recorder = asyncio.run(run())
+    assert [texts for _, texts, _ in recorder.batches] == [["first"], ["second", "third"]]
+    assert not recorder.overlapped
+
+
+def test_drain_flushes_pending_messages():
+    async def run():
+        recorder = Recorder()
+        coalescer = MessageCoalescer(recorder, window=10, max_wait=10)
+        coalescer.add("chat", PendingMessage("pending"))
+        await coalescer.drain()
+        return recorder, coalescer.get_stats()
+
+    recorder, stats = asyncio.run(run())
+    assert [texts for _, texts, _ in recorder.batches] == [["pending"]]
+    assert stats["chats_buffering"] == 0
+
+
+def test_from_env_is_opt_in(monkeypatch):
+    monkeypatch.delenv("TELEGRAM_COALESCE_WINDOW_SECONDS", raising=False)
+    assert MessageCoalescer.from_env(Recorder()) is None
+    monkeypatch.setenv("TELEGRAM_COALESCE_WINDOW_SECONDS", "0.5")
+    monkeypatch.setenv("TELEGRAM_COALESCE_MAX_WAIT_SECONDS", "2")
+    coalescer = MessageCoalescer.from_env(Recorder())
+    assert (coalescer.window, coalescer.max_wait) == (0.5, 2.0)
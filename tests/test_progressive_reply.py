@@ -0,0 +1,117 @@
+"""Tests for progressive Telegram replies."""
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from telegram.error import BadRequest, RetryAfter, TimedOut
+
+from my_agent.progressive_reply import MAX_MESSAGE_CHARS, ProgressiveReply, split_message
+
+
+def _message():
+    sent = SimpleNamespace(edit_text=AsyncMock())
+    return SimpleNamespace(reply_text=AsyncMock(return_value=sent), sent=sent)
+
+
+def test_split_message_prefers_line_breaks():
+    text = "a" * 3000 + "\n" + "b" * 3000
+    assert split_message(text) == ["a" * 3000, "b" * 3000]
+    assert split_message("short") == ["short"]
+    assert split_message("") == [""]
+
+
+def test_split_message_hard_cuts_without_separators():
+    chunks = split_message("x" * (MAX_MESSAGE_CHARS * 2 + 10))
+    assert [len(c) for c in chunks] == [MAX_MESSAGE_CHARS, MAX_MESSAGE_CHARS, 10]
+
+
+def test_deltas_are_coalesced_into_throttled_edits():
+    async def run():
+        message = _message()
+        reply = ProgressiveReply(message, min_interval=0.05)
+        await reply.start()
+        for i in range(50):
+            reply.feed(f"{i} ")
+            await asyncio.sleep(0.002)
+        await reply.finish(reply.text.strip())
+        return message, reply
+
+    message, reply = asyncio.run(run())
+    message.reply_text.assert_awaited_once_with("…")
+    # ~100 ms of streaming at one edit per 50 ms, plus the final commit.
+    assert 1 <= reply.edits <= 4
+    assert message.sent.edit_text.await_args.args[0] == " ".join(str(i) for i in range(50))
+    assert reply.ttft_ms is not None
+
+
+def test_long_final_text_is_split_across_messages():
+    async def run():
+        message = _message()
+        reply = ProgressiveReply(message, min_interval=0)
+        await reply.start()
+        await reply.finish("a" * 3000 + "\n" + "b" * 3000)
+        return message
+
+    message = asyncio.run(run())
+    message.sent.edit_text.assert_awaited_once_with("a" * 3000)
+    assert message.reply_text.await_args_list[-1].args == ("b" * 3000,)
+
+
+def test_retry_after_delays_next_edit():
+    async def run():
+        message = _message()
+        message.sent.edit_text.side_effect = [RetryAfter(0.05), None]
+        reply = ProgressiveReply(message, min_interval=0)
+        await reply.start()
+        reply.feed("partial")
+        await asyncio.sleep(0.01)
+        await reply.finish("final")
+        return message
+
+    message = asyncio.run(run())
+    assert [c.args[0] for c in message.sent.edit_text.await_args_list] == ["partial", "final"]
+
+
+def test_failed_final_edit_falls_back_to_a_new_message():
+    async def run():
+        message = _message()
+        message.sent.edit_text.side_effect = BadRequest("Message to edit not found")
+        reply = ProgressiveReply(message, min_interval=0)
+        await reply.start()
+        await reply.finish("final")
+        return message, reply
+
+    message, reply = asyncio.run(run())
+    assert [c.args for c in message.reply_text.await_args_list] == [("…",), ("final",)]
+    assert reply.shown == "final"
+
+
+def test_not_modified_counts_as_shown():
+    async def run():
+        message = _message()
+        message.sent.edit_text.side_effect = BadRequest("Message is not modified")
+        reply = ProgressiveReply(message, min_interval=0)
+        await reply.start()
+        await reply.finish("final")
+        return message
+
+    message = asyncio.run(run())
+    message.reply_text.assert_awaited_once_with("…")
+    message.sent.edit_text.assert_awaited_once_with("final")
+
+
+def test_network_errors_fall_back_to_a_new_message():
+    async def run():
+        message = _message()
+        message.sent.edit_text.side_effect = TimedOut()
+        reply = ProgressiveReply(message, min_interval=0)
+        await reply.start()
+        reply.feed("partial")
+        await asyncio.sleep(0.01)
+        # The background flush swallowed the error instead of leaking it.
+        assert reply._flush_task.done() and reply._flush_task.exception() is None
+        await reply.finish("a" * 3000 + "\n" + "b" * 3000)
+        return message
+
+    message = asyncio.run(run())
+    assert [c.args[0] for c in message.reply_text.await_args_list] == ["…", "a" * 3000, "b" * 3000]
@@ -0,0 +1,136 @@
+"""Tests for the outbound Telegram rate limiter."""
+import asyncio
+import logging
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from my_agent.rate_limiter import TelegramRateLimiter, TokenBucket
+from my_agent.telegram_bot import build_application
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_and_pauses():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+    bucket.consume()
+    bucket.consume()
+    assert bucket.delay() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.delay() == 0
+    bucket.pause(3)
+    assert bucket.delay() == pytest.approx(3)
+
+
+async def _send(limiter, log, name, chat_id=None, endpoint="sendMessage", **rate_limit):
+    async def callback():
+        log.append(name)
+        return name
+
+    return await limiter.process_request(
+        callback, (), {}, endpoint, {"chat_id": chat_id} if chat_id is not None else {}, rate_limit or None
+    )
+
+
+def test_chat_burst_is_smoothed_not_dropped():
+    async def run():
+        limiter = TelegramRateLimiter(global_rate=1000, chat_rate=50, chat_burst=1)
+        log = []
+        start = time.perf_counter()
+        results = await asyncio.gather(*(_send(limiter, log, i, chat_id=7) for i in range(6)))
+        return results, log, time.perf_counter() - start, limiter.get_stats()
+
+    results, log, elapsed, stats = asyncio.run(run())
+    assert results == log == list(range(6))
+    assert elapsed >= 0.09  # 5 waits at 50/s
+    assert stats["sent"] == 6
+    assert stats["queue_latency_max_ms"] >= 80
+
+
+def test_other_chats_are_not_held_up_by_a_busy_chat():
+    async def run():
+        limiter = TelegramRateLimiter(global_rate=1000, chat_rate=5, chat_burst=1)
+        log = []
+        busy = [asyncio.create_task(_send(limiter, log, f"busy{i}", chat_id=1)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        await _send(limiter, log, "other", chat_id=2)
+        snapshot = list(log)
+        for task in busy:
+            task.cancel()
+        await asyncio.gather(*busy, return_exceptions=True)
+        return snapshot
+
+    assert asyncio.run(run()) == ["busy0", "other"]
+
+
+def test_global_queue_serves_higher_priority_first():
+    async def run():
+        limiter = TelegramRateLimiter(global_rate=20, chat_rate=1000, chat_burst=1000)
+        limiter._global.tokens = 0
+        log = []
+        low = asyncio.create_task(_send(limiter, log, "edit", chat_id=1, endpoint="editMessageText"))
+        await asyncio.sleep(0)
+        normal = asyncio.create_task(_send(limiter, log, "message", chat_id=2))
+        await asyncio.sleep(0)
+        high = asyncio.create_task(_send(limiter, log, "answer", chat_id=3, endpoint="answerCallbackQuery"))
+        await asyncio.gather(low, normal, high)
+        return log
+
+    assert asyncio.run(run()) == ["answer", "message", "edit"]
+
+
+def test_retry_after_is_honoured_and_retried():
+    async def run():
+        limiter = TelegramRateLimiter(retry_jitter=0)
+        calls = []
+
+        async def callback():
+            calls.append(time.perf_counter())
+            if len(calls) == 1:
+                raise RetryAfter(0.05)
+            return "ok"
+
+        result = await limiter.process_request(callback, (), {}, "sendMessage", {"chat_id": 1}, None)
+        return result, calls, limiter.get_stats()
+
+    result, calls, stats = asyncio.run(run())
+    assert result == "ok"
+    assert calls[1] - calls[0] >= 0.05
+    assert stats["retry_after"] == 1
+    assert stats["sent"] == 1
+
+
+def test_retry_after_gives_up_after_max_retries(caplog):
+    async def run():
+        limiter = TelegramRateLimiter(max_retries=1, retry_jitter=0)
+
+        async def callback():
+            raise RetryAfter(0.01)
+
+        with pytest.raises(RetryAfter):
+            await limiter.process_request(callback, (), {}, "sendMessage", {}, None)
+        return limiter.get_stats()
+
+    with caplog.at_level(logging.WARNING, logger="my_agent.rate_limiter"):
+        stats = asyncio.run(run())
+    assert stats["retry_after"] == 2
+    assert stats["gave_up"] == 1
+    messages = [r.getMessage() for r in caplog.records]
+    assert any("attempt 1/2" in m for m in messages)
+    assert any("giving up after 2 attempts" in m for m in messages)
+
+
+def test_bot_application_uses_rate_limiter(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_CHAT_RATE", "2")
+    application = build_application("123:abc", with_updater=False)
+    limiter = application.bot.rate_limiter
+    assert isinstance(limiter, TelegramRateLimiter)
+    assert limiter.chat_rate == 2
@@ -0,0 +1,103 @@
+"""Tests for the sampling profiler behind /debug/profile."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from my_agent.sampling_profiler import ProfileResult, SamplingProfiler
+
+
+def busy_worker(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def idle_worker(stop: threading.Event) -> None:
+    stop.wait()
+
+
+def _with_threads(profiler, seconds, mode):
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=busy_worker, args=(stop,), name="busy"),
+        threading.Thread(target=idle_worker, args=(stop,), name="idle"),
+    ]
+    for t in threads:
+        t.start()
+    try:
+        return profiler.run(seconds, mode)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+def test_wall_mode_samples_every_thread():
+    result = _with_threads(SamplingProfiler(hz=200), 0.3, "wall")
+    stacks = result.collapsed()
+    assert "thread:busy;" in stacks and "busy_worker" in stacks
+    assert "thread:idle;" in stacks and "idle_worker" in stacks
+    assert result.samples >= result.ticks
+    for line in stacks.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and ";" in stack
+
+
+def test_cpu_mode_skips_idle_threads():
+    result = _with_threads(SamplingProfiler(hz=200), 0.3, "cpu")
+    stacks = result.collapsed()
+    assert "busy_worker" in stacks
+    assert "idle_worker" not in stacks
+
+
+def test_asyncio_mode_shows_coroutine_chains():
+    async def leaf_wait():
+        await asyncio.sleep(10)
+
+    async def parked():
+        await leaf_wait()
+
+    async def hot():
+        while True:
+            time.sleep(0.002)
+            await asyncio.sleep(0)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        tasks = [asyncio.create_task(parked(), name="parked"), asyncio.create_task(hot(), name="hot")]
+        profiler = SamplingProfiler(hz=200)
+        result = await loop.run_in_executor(None, profiler.run, 0.3, "asyncio", loop, asyncio.current_task())
+        for t in tasks:
+            t.cancel()
+        return result
+
+    result = asyncio.run(main())
+    stacks = result.collapsed()
+    assert "task:parked;parked (" in stacks and "leaf_wait (" in stacks
+    assert ";[running] " in stacks and "task:hot;" in stacks
+    assert "task:main" not in stacks
+
+
+def test_overhead_is_reported():
+    result = _with_threads(SamplingProfiler(hz=100, max_overhead=0.05), 0.3, "wall")
+    assert 0 < result.effective_hz <= 110
+    assert result.overhead_pct < 20
+    assert result.to_dict()["overhead_pct"] == result.overhead_pct
+
+
+def test_interval_stretches_when_over_budget():
+    result = SamplingProfiler(hz=1000, max_overhead=0.0).run(0.3, "wall")
+    assert result.effective_hz < 100
+
+
+def test_invalid_mode_and_missing_loop():
+    with pytest.raises(ValueError):
+        SamplingProfiler().run(0.1, "heap")
+    with pytest.raises(ValueError):
+        SamplingProfiler().run(0.1, "asyncio")
+
+
+def test_empty_result():
+    assert ProfileResult(mode="wall", seconds=0).collapsed() == ""
+    assert ProfileResult(mode="wall", seconds=0).effective_hz == 0.0
@@ -0,0 +1,137 @@
+"""Tests for the knowledge base query-result cache."""
+import threading
+import time
+
+import pytest
+
+from my_agent.search_cache import QueryResultCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def cache(clock):
+    return QueryResultCache(max_entries=2, ttl_seconds=10, stale_seconds=5, clock=clock)
+
+
+def test_normalize_query():
+    assert normalize_query("  Hello   WORLD ") == "hello world"
+
+
+def test_hit_within_ttl(cache):
+    calls = []
+    loader = lambda: calls.append(1) or ["result"]
+
+    assert cache.get_or_load("k", loader) == ["result"]
+    assert cache.get_or_load("k", loader) == ["result"]
+    assert len(calls) == 1
+    stats = cache.get_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["bytes"] == len("result")
+
+
+def test_expired_entry_reloads(cache, clock):
+    values = iter(["old", "new"])
+    cache.get_or_load("k", lambda: next(values))
+    clock.now += 16
+
+    assert cache.get_or_load("k", lambda: next(values)) == "new"
+    assert cache.get_stats()["expirations"] == 1
+
+
+def test_lru_eviction(cache):
+    cache.get_or_load("a", lambda: "A")
+    cache.get_or_load("b", lambda: "B")
+    cache.get_or_load("a", lambda: "A")  # refresh recency of "a"
+    cache.get_or_load("c", lambda: "C")
+
+    stats = cache.get_stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert cache.get_or_load("a", lambda: "reloaded") == "A"
+    assert cache.get_or_load("b", lambda: "reloaded") == "reloaded"
+
+
+def test_errors_not_cached(cache):
+    def failing():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("k", failing)
+    assert cache.get_or_load("k", lambda: "ok") == "ok"
+
+
+def test_concurrent_identical_queries_share_one_load(clock):
+    cache = QueryResultCache(max_entries=10, ttl_seconds=10, stale_seconds=0, clock=clock)
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(timeout=5)
+        return "shared"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("k", slow_loader)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    while cache.get_stats()["coalesced"] < 7:
+        time.sleep(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == ["shared"] * 8
+
+
+def test_stale_while_revalidate(cache, clock):
+    cache.get_or_load("k", lambda: "old")
+    clock.now += 12  # past TTL, inside the stale window
+    refreshed = threading.Event()
+
+    def refresh():
+        refreshed.set()
+        return "new"
+
+    assert cache.get_or_load("k", refresh) == "old"
+    assert refreshed.wait(timeout=5)
+    deadline = time.time() + 5
+    while cache.get_or_load("k", lambda: "unused") != "new" and time.time() < deadline:
+        time.sleep(0.001)
+    assert cache.get_or_load("k", lambda: "unused") == "new"
+    assert cache.get_stats()["stale_hits"] >= 1
+
+
+def test_disabled_cache_always_loads(clock):
+    cache = QueryResultCache(ttl_seconds=0, clock=clock)
+    calls = []
+    cache.get_or_load("k", lambda: calls.append(1))
+    cache.get_or_load("k", lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_from_env_falls_back_on_bad_values(monkeypatch):
+    monkeypatch.setenv("KNOWLEDGE_BASE_CACHE_MAX_ENTRIES", "lots")
+    monkeypatch.setenv("KNOWLEDGE_BASE_CACHE_TTL_SECONDS", "5m")
+    monkeypatch.setenv("KNOWLEDGE_BASE_CACHE_STALE_SECONDS", "30")
+    cache = QueryResultCache.from_env()
+    assert cache.max_entries == 512
+    assert cache.ttl_seconds == 300.0
+    assert cache.stale_seconds == 30.0
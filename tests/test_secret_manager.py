@@ -1,4 +1,5 @@
 import os
+import time
 from types import SimpleNamespace
 
 import pytest
@@ -42,3 +43,116 @@ def test_get_secret_requires_project_for_short_name(monkeypatch):
     monkeypatch.delenv("GCP_PROJECT_ID", raising=False)
     with pytest.raises(ValueError):
         secret_manager.get_secret_value("short-secret-name")
+
+
+class RecordingClient:
+    """Fake client that serves per-secret payloads and records accesses."""
+
+    def __init__(self, payloads, latest=None):
+        self.payloads = payloads
+        self.latest = latest or {}
+        self.accessed = []
+
+    def access_secret_version(self, name: str):
+        self.accessed.append(name)
+        time.sleep(0.05)
+        secret = name.rsplit("/versions/", 1)[0]
+        version = self.latest.get(secret, f"{secret}/versions/1") if name.endswith("/latest") else name
+        return SimpleNamespace(
+            name=version,
+            payload=SimpleNamespace(data=self.payloads[version].encode("utf-8")),
+        )
+
+    def get_secret_version(self, name: str):
+        secret = name.rsplit("/versions/", 1)[0]
+        return SimpleNamespace(name=self.latest.get(secret, f"{secret}/versions/1"))
+
+
+@pytest.fixture
+def two_secrets(monkeypatch):
+    for var in ("SECRET_A", "SECRET_B"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("SECRET_A_ID", "secret-a")
+    monkeypatch.setenv("SECRET_B_ID", "secret-b")
+    monkeypatch.setenv("GCP_PROJECT_ID", "demo-project")
+    monkeypatch.delenv("SECRET_ROTATION_INTERVAL_SECONDS", raising=False)
+    payloads = {
+        "projects/demo-project/secrets/secret-a/versions/1": "value-a",
+        "projects/demo-project/secrets/secret-b/versions/1": "value-b",
+    }
+    client = RecordingClient(payloads)
+    client.constructed = 0
+
+    def factory():
+        client.constructed += 1
+        return client
+
+    monkeypatch.setattr(secret_manager.secretmanager, "SecretManagerServiceClient", factory)
+    return client
+
+
+MAPPING = {"SECRET_A": "SECRET_A_ID", "SECRET_B": "SECRET_B_ID"}
+
+
+def test_load_secrets_into_env_concurrent_shared_client(two_secrets, monkeypatch):
+    monkeypatch.delenv("SECRET_CACHE_PATH", raising=False)
+
+    start = time.perf_counter()
+    summary = secret_manager.load_secrets_into_env(MAPPING)
+    elapsed = time.perf_counter() - start
+
+    assert os.getenv("SECRET_A") == "value-a"
+    assert os.getenv("SECRET_B") == "value-b"
+    assert summary["fetched"] == 2
+    assert two_secrets.constructed == 1
+    assert elapsed < 0.1  # two 50 ms fetches overlap
+
+
+def test_load_secrets_into_env_skips_client_when_nothing_to_fetch(two_secrets, monkeypatch):
+    monkeypatch.setenv("SECRET_A", "preset")
+    monkeypatch.delenv("SECRET_B_ID")
+
+    summary = secret_manager.load_secrets_into_env(MAPPING)
+
+    assert summary["fetched"] == 0
+    assert two_secrets.constructed == 0
+    assert os.getenv("SECRET_A") == "preset"
+
+
+def test_load_secrets_into_env_uses_local_cache(two_secrets, monkeypatch, tmp_path):
+    cache_path = tmp_path / "secrets.json"
+    monkeypatch.setenv("SECRET_CACHE_PATH", str(cache_path))
+    monkeypatch.setenv("SECRET_CACHE_TTL_SECONDS", "60")
+
+    secret_manager.load_secrets_into_env(MAPPING)
+    assert oct(cache_path.stat().st_mode & 0o777) == "0o600"
+    two_secrets.accessed.clear()
+    monkeypatch.delenv("SECRET_A")
+    monkeypatch.delenv("SECRET_B")
+
+    summary = secret_manager.load_secrets_into_env(MAPPING)
+
+    assert summary["cached"] == 2
+    assert two_secrets.accessed == []
+    assert os.getenv("SECRET_A") == "value-a"
+
+
+def test_rotation_watcher_reloads_new_version(monkeypatch):
+    monkeypatch.setenv("SECRET_A", "value-a")
+    secret = "projects/demo-project/secrets/secret-a"
+    client = RecordingClient({f"{secret}/versions/1": "value-a", f"{secret}/versions/2": "value-a2"})
+    watcher = secret_manager.SecretRotationWatcher(
+        [("SECRET_A", f"{secret}/versions/latest", f"{secret}/versions/1")],
+        interval=60,
+        client=client,
+    )
+    rotated = []
+    watcher.add_listener(lambda env_var, value: rotated.append((env_var, value)))
+
+    assert watcher.check_once() == 0
+    assert client.accessed == []
+
+    client.latest[secret] = f"{secret}/versions/2"
+    assert watcher.check_once() == 1
+    assert os.getenv("SECRET_A") == "value-a2"
+    assert rotated == [("SECRET_A", "value-a2")]
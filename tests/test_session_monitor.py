@@ -37,3 +37,19 @@ def test_details_and_alerts(monitor):
 
 def test_unknown_session_detail(monitor):
     assert "No session found" in monitor.get_details("missing")
+
+
+def test_usage_and_budget(monitor):
+    monitor.record_usage("s3", "u3", "agent", prompt_tokens=800, completion_tokens=150, model_calls=2)
+    monitor.record_usage("s3", "u3", "agent", prompt_tokens=300, completion_tokens=50)
+    assert monitor.over_budget("s3", 1000)
+    assert not monitor.over_budget("s3", 0)
+    assert not monitor.over_budget("missing", 10)
+
+    details = monitor.get_details("s3")
+    assert "prompt=1100, completion=200, total=1300, last turn=350, model calls=3" in details
+    assert "tokens=1300" in monitor.get_summary()
+
+    monitor.reset_budget("s3")
+    assert not monitor.over_budget("s3", 1000)
+    assert "compactions=1" in monitor.get_details("s3")
@@ -0,0 +1,58 @@
+"""Import-time regression tests for the API app."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tool SDKs that must not load until a tool is called or warm-up runs.
+LAZY_SDKS = [
+    "google.cloud.discoveryengine_v1",
+    "google.cloud.pubsub_v1",
+    "google.cloud.logging",
+    "google.cloud.secretmanager",
+    "numpy",
+]
+
+# Generous default so slow CI machines pass; tighten locally via the env var.
+IMPORT_BUDGET_SECONDS = float(os.getenv("APP_IMPORT_BUDGET_SECONDS", "8"))
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed": elapsed,
+    "loaded": [m for m in {LAZY_SDKS!r} if m in sys.modules],
+}}))
+"""
+
+
+@pytest.fixture(scope="module")
+def import_probe():
+    env = dict(os.environ)
+    for var in ("GOOGLE_API_KEY_SECRET_ID", "TELEGRAM_BOT_TOKEN_SECRET_ID"):
+        env.pop(var, None)
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_tool_sdks_not_imported_with_app(import_probe):
+    assert import_probe["loaded"] == []
+
+
+def test_app_import_within_budget(import_probe):
+    assert import_probe["elapsed"] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,59 @@
+"""Tests for the startup profiler CLI."""
+import json
+
+from my_agent import startup_profile
+
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   google.adk.agents
+import time:       300 |        420 | google.adk
+import time:        50 |         50 |     google.cloud.pubsub_v1.types
+import time:        25 |         75 |   google.cloud.pubsub_v1
+import time:        10 |         10 | fastapi
+import time:         5 |        510 | app
+"""
+
+
+def test_parse_importtime_skips_header():
+    rows = startup_profile.parse_importtime(IMPORTTIME)
+    assert rows[0] == {"module": "google.adk.agents", "self_us": 120, "cumulative_us": 120}
+    assert len(rows) == 6
+
+
+def test_package_grouping_expands_namespaces():
+    assert startup_profile.package_of("google.adk.agents") == "google.adk"
+    assert startup_profile.package_of("google.cloud.pubsub_v1.types") == "google.cloud.pubsub_v1"
+    assert startup_profile.package_of("fastapi.routing") == "fastapi"
+    assert startup_profile.package_of("app") == "app"
+
+
+def test_aggregate_by_package_orders_by_self_time():
+    rows = startup_profile.parse_importtime(IMPORTTIME)
+    packages = startup_profile.aggregate_by_package(rows, top=2)
+    assert packages == [
+        {"package": "google.adk", "self_ms": 0.42, "modules": 2},
+        {"package": "google.cloud.pubsub_v1", "self_ms": 0.07, "modules": 2},
+    ]
+
+
+def test_compare_reports_deltas():
+    deltas = startup_profile.compare(
+        {"phases": {"app_import_ms": 900.0, "first_chat_ms": 12.0}},
+        {"phases": {"app_import_ms": 1000.0}},
+    )
+    assert deltas == {"app_import_ms": {"previous": 1000.0, "current": 900.0, "delta": -100.0}}
+
+
+def test_cli_end_to_end_with_history(tmp_path, capsys):
+    history = tmp_path / "history.jsonl"
+    startup_profile.main(["--history", str(history), "--no-importtime"])
+    first = json.loads(capsys.readouterr().out)
+    startup_profile.main(["--history", str(history), "--no-importtime"])
+    second = json.loads(capsys.readouterr().out)
+
+    for phase in ("app_import_ms", "secret_hydration_ms", "runner_init_ms", "first_health_ms", "first_chat_ms"):
+        assert phase in first["phases"]
+    assert first["status_codes"] == {"health": 200, "chat": 200}
+    assert "compared_to" not in first
+    assert "app_import_ms" in second["compared_to"]["phases"]
+    assert len(history.read_text().splitlines()) == 2
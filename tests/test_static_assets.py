@@ -0,0 +1,136 @@
+"""Tests for precompressed, hashed static asset serving."""
+import gzip
+import json
+
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from my_agent import static_assets
+from my_agent.static_assets import IMMUTABLE, PrecompressedStaticFiles, build, negotiate
+
+
+CSS = "body { color: #333; }\n" * 50
+HTML = '<link rel="stylesheet" href="/static/style.css">\n<script src="/static/app.js"></script>\n'
+
+
+def _site(tmp_path):
+    src = tmp_path / "static"
+    src.mkdir()
+    (src / "style.css").write_text(CSS)
+    (src / "app.js").write_text("console.log('hi');\n" * 40)
+    (src / "index.html").write_text(HTML)
+    (src / "tiny.txt").write_text("x")
+    out = tmp_path / "build"
+    manifest = build(str(src), str(out))
+    files = PrecompressedStaticFiles(directory=str(src), build_dir=str(out))
+    client = TestClient(Starlette(routes=[Mount("/static", files)]))
+    return manifest, out, client
+
+
+def test_build_hashes_assets_and_rewrites_html(tmp_path):
+    manifest, out, _ = _site(tmp_path)
+    hashed_css = manifest["aliases"]["style.css"]
+    assert hashed_css.startswith("style.") and hashed_css.endswith(".css") and hashed_css != "style.css"
+    html = (out / "index.html").read_text()
+    assert f"/static/{hashed_css}" in html
+    assert f"/static/{manifest['aliases']['app.js']}" in html
+    assert "index.html" not in manifest["aliases"]
+
+    entry = manifest["assets"][hashed_css]
+    assert entry["immutable"] is True
+    assert gzip.decompress((out / entry["files"]["gzip"]).read_bytes()).decode() == CSS
+    assert entry["sizes"]["gzip"] < entry["sizes"]["identity"]
+    # Compression that does not shrink the file is dropped.
+    assert manifest["assets"][manifest["aliases"]["tiny.txt"]]["files"] == {
+        "identity": manifest["aliases"]["tiny.txt"]
+    }
+    assert json.loads((out / "manifest.json").read_text()) == manifest
+
+
+def test_build_is_reproducible(tmp_path):
+    src = tmp_path / "static"
+    src.mkdir()
+    (src / "style.css").write_text(CSS)
+    first = build(str(src), str(tmp_path / "a"))
+    second = build(str(src), str(tmp_path / "b"))
+    assert first == second
+
+
+def test_build_skips_brotli_when_unavailable(tmp_path, monkeypatch):
+    monkeypatch.setattr(static_assets, "available_encodings", lambda: ["gzip"])
+    manifest, _, _ = _site(tmp_path)
+    assert all("br" not in entry["files"] for entry in manifest["assets"].values())
+
+
+def test_negotiate():
+    available = ["identity", "gzip", "br"]
+    assert negotiate("gzip, deflate, br", available) == "br"
+    assert negotiate("gzip, deflate, br", ["identity", "gzip"]) == "gzip"
+    assert negotiate("br;q=0.5, gzip", available) == "gzip"
+    assert negotiate("br;q=0, gzip;q=0", available) == "identity"
+    assert negotiate("*", available) == "br"
+    assert negotiate(None, available) == "identity"
+    assert negotiate("", available) == "identity"
+
+
+def test_hashed_asset_is_immutable_and_precompressed(tmp_path):
+    manifest, _, client = _site(tmp_path)
+    hashed_css = manifest["aliases"]["style.css"]
+    etag = manifest["assets"][hashed_css]["etag"]
+
+    response = client.get(f"/static/{hashed_css}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == IMMUTABLE
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == f'"{etag}-gzip"'
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.text == CSS
+
+    plain = client.get(f"/static/{hashed_css}", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] == f'"{etag}"'
+    assert plain.text == CSS
+
+
+def test_unhashed_names_and_html_revalidate(tmp_path):
+    manifest, _, client = _site(tmp_path)
+    response = client.get("/static/style.css")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert response.text == CSS
+
+    html = client.get("/static/index.html")
+    assert html.headers["cache-control"] == "no-cache"
+    assert manifest["aliases"]["style.css"] in html.text
+
+
+def test_if_none_match_returns_304_without_reading_the_file(tmp_path):
+    manifest, out, client = _site(tmp_path)
+    hashed_css = manifest["aliases"]["style.css"]
+    etag = client.get(f"/static/{hashed_css}").headers["etag"]
+    # The 304 path must come from the manifest alone.
+    for name in manifest["assets"][hashed_css]["files"].values():
+        (out / name).unlink()
+
+    response = client.get(f"/static/{hashed_css}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["cache-control"] == IMMUTABLE
+
+    weak = client.get(f"/static/{hashed_css}", headers={"If-None-Match": f"W/{etag}"})
+    assert weak.status_code == 304
+
+
+def test_falls_back_to_source_files_without_a_build(tmp_path):
+    src = tmp_path / "static"
+    src.mkdir()
+    (src / "style.css").write_text(CSS)
+    files = PrecompressedStaticFiles(directory=str(src), build_dir=str(tmp_path / "missing"))
+    assert not files.is_built
+    client = TestClient(Starlette(routes=[Mount("/static", files)]))
+    response = client.get("/static/style.css")
+    assert response.status_code == 200
+    assert response.text == CSS
+    assert client.get("/static/nope.css").status_code == 404
@@ -0,0 +1,66 @@
+"""Tests for the shared dashboard stats stream."""
+import asyncio
+import json
+
+from my_agent.stats_broadcaster import QUEUE_SIZE, StatsBroadcaster, diff
+
+
+def _parse(frame):
+    event, data = frame.strip().split("\n")
+    return event[len("event: "):], json.loads(data[len("data: "):])
+
+
+def test_diff_reports_changed_and_removed_fields():
+    assert diff({"a": 1, "b": {"x": 1}, "c": 3}, {"a": 1, "b": {"x": 2}}) == {"b": {"x": 2}, "c": None}
+
+
+def test_one_snapshot_per_interval_shared_by_all_subscribers():
+    async def run():
+        counter = {"n": 0}
+
+        def snapshot():
+            counter["n"] += 1
+            return {"requests": counter["n"] // 2, "model": "gemini"}
+
+        broadcaster = StatsBroadcaster(snapshot, interval=0.02)
+        queues = [broadcaster.subscribe() for _ in range(50)]
+        await asyncio.sleep(0.11)
+        frames = [[_parse(q.get_nowait()) for _ in range(q.qsize())] for q in queues]
+        built = broadcaster.snapshots_built
+        for q in queues:
+            broadcaster.unsubscribe(q)
+        await asyncio.sleep(0.05)
+        return frames, built, broadcaster.snapshots_built
+
+    frames, built, built_after = asyncio.run(run())
+    assert 4 <= built <= 7  # initial + one per tick, not one per subscriber
+    assert built_after == built  # loop stops with the last subscriber
+    assert all(f == frames[0] for f in frames)
+    assert frames[0][0] == ("snapshot", {"requests": 0, "model": "gemini"})
+    for event, data in frames[0][1:]:
+        assert event == "delta"
+        assert set(data) == {"requests"}
+
+
+def test_slow_subscriber_is_resynced_with_a_snapshot():
+    async def run():
+        counter = {"n": 0}
+
+        def snapshot():
+            counter["n"] += 1
+            return {"n": counter["n"]}
+
+        broadcaster = StatsBroadcaster(snapshot, interval=0.001)
+        queue = broadcaster.subscribe()
+        await asyncio.sleep(0.1)
+        frames = [_parse(queue.get_nowait()) for _ in range(queue.qsize())]
+        built = broadcaster.snapshots_built
+        broadcaster.unsubscribe(queue)
+        return frames, built
+
+    frames, built = asyncio.run(run())
+    assert built > QUEUE_SIZE + 1
+    assert len(frames) <= QUEUE_SIZE
+    # The undrained backlog was replaced by a newer full snapshot.
+    event, data = frames[0]
+    assert event == "snapshot" and data["n"] > 1
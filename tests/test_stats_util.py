@@ -0,0 +1,10 @@
+"""Tests for the shared statistics helpers."""
+from my_agent.stats_util import percentile
+
+
+def test_percentile_nearest_rank():
+    values = [5.0, 1.0, 4.0, 2.0, 3.0]
+    assert percentile(values, 0.0) == 1.0
+    assert percentile(values, 0.5) == 3.0
+    assert percentile(values, 0.95) == 5.0
+    assert percentile([7.0], 0.99) == 7.0
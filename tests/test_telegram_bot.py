@@ -0,0 +1,218 @@
+"""Tests for the Telegram bot bridge."""
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import httpx
+
+from my_agent import telegram_bot
+
+
+def _agent_handler(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content)
+    if request.url.path == "/api/chat/stream":
+        lines = [{"delta": "echo: "}, {"delta": body["message"]},
+                 {"done": True, "response": f"echo: {body['message']}", "trace_id": "trace-1", "duration_ms": 12.5}]
+        return httpx.Response(200, content="".join(json.dumps(line) + "\n" for line in lines))
+    return httpx.Response(
+        200,
+        json={"response": f"echo: {body['message']}"},
+        headers={"X-Trace-Id": "trace-1", "Server-Timing": "app;dur=12.5", "X-Model-Calls": "3"},
+    )
+
+
+def _api_client(handler=_agent_handler):
+    return telegram_bot.AgentApiClient(
+        "http://agent", client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+
+def test_parse_server_timing():
+    assert telegram_bot._parse_server_timing("db;dur=3, app;dur=12.5") == 12.5
+    assert telegram_bot._parse_server_timing("app;desc=x") is None
+    assert telegram_bot._parse_server_timing(None) is None
+
+
+def test_agent_api_client_chat_reports_timings():
+    async def run():
+        client = _api_client()
+        try:
+            return await client.chat("hello", "tg_1")
+        finally:
+            await client.aclose()
+
+    reply = asyncio.run(run())
+
+    assert reply.text == "echo: hello"
+    assert reply.trace_id == "trace-1"
+    assert reply.timings["server_ms"] == 12.5
+    assert reply.timings["connect_ms"] == 0.0
+    assert reply.model_calls == 3
+    assert "total_ms" in reply.timings
+
+
+def test_agent_api_client_pool_settings(monkeypatch):
+    monkeypatch.setenv("AGENT_HTTP_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("AGENT_HTTP_MAX_KEEPALIVE", "3")
+    client = telegram_bot.AgentApiClient("http://agent")
+    pool = client.client._transport._pool
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    asyncio.run(client.aclose())
+
+
+def _update(text, user_id=42, chat_id=None):
+    chat = SimpleNamespace(id=chat_id or user_id)
+    sent = SimpleNamespace(edit_text=AsyncMock())
+    message = SimpleNamespace(text=text, reply_text=AsyncMock(return_value=sent), sent=sent, chat=chat)
+    return SimpleNamespace(message=message, effective_user=SimpleNamespace(id=user_id), effective_chat=chat)
+
+
+def test_agent_api_client_streams_deltas():
+    async def run():
+        client = _api_client()
+        deltas = []
+        try:
+            return deltas, await client.chat("hello", "tg_1", on_text=deltas.append)
+        finally:
+            await client.aclose()
+
+    deltas, reply = asyncio.run(run())
+
+    assert deltas == ["echo: ", "hello"]
+    assert reply.text == "echo: hello"
+    assert reply.trace_id == "trace-1"
+    assert reply.timings["server_ms"] == 12.5
+    assert "ttft_ms" in reply.timings
+
+
+def test_chat_command_reuses_application_client(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_EDIT_INTERVAL_SECONDS", "0")
+
+    async def run():
+        application = SimpleNamespace(bot_data={})
+        await telegram_bot._on_startup(application)
+        shared = application.bot_data["agent_client"]
+        shared.client = _api_client().client
+        context = SimpleNamespace(application=application)
+
+        first, second = _update("/chat hi"), _update("/chat again")
+        await telegram_bot.chat_command(first, context)
+        await telegram_bot.chat_command(second, context)
+
+        assert application.bot_data["agent_client"] is shared
+        await telegram_bot._on_shutdown(application)
+        assert shared.client.is_closed
+        return first, second
+
+    first, second = asyncio.run(run())
+    first.message.reply_text.assert_awaited_once_with("…")
+    first.message.sent.edit_text.assert_awaited_with("echo: hi")
+    second.message.reply_text.assert_awaited_once_with("…")
+    second.message.sent.edit_text.assert_awaited_with("echo: again")
+
+
+def test_in_process_transport_uses_chat_pipeline(monkeypatch):
+    import app
+
+    monkeypatch.setenv("ADK_TEST_MODE", "true")
+    monkeypatch.setenv("TELEGRAM_EDIT_INTERVAL_SECONDS", "0")
+
+    async def run():
+        application = SimpleNamespace(bot_data={})
+        transport = telegram_bot.InProcessAgentTransport(app.run_chat)
+        application.bot_data["agent_client"] = transport
+        await telegram_bot._on_startup(application)
+        assert application.bot_data["agent_client"] is transport
+
+        update = _update("/chat hi")
+        await telegram_bot.chat_command(update, SimpleNamespace(application=application))
+        return update, await transport.chat("direct", "tg_1")
+
+    update, reply = asyncio.run(run())
+    update.message.sent.edit_text.assert_awaited_with("[test-mode] hi")
+    assert reply.text == "[test-mode] direct"
+    assert reply.trace_id
+    assert reply.timings["connect_ms"] == 0.0
+    assert "server_ms" in reply.timings
+
+
+def test_build_application_without_updater():
+    transport = telegram_bot.InProcessAgentTransport(AsyncMock())
+    application = telegram_bot.build_application("123:abc", transport=transport, with_updater=False)
+    assert application.updater is None
+    assert application.bot_data["agent_client"] is transport
+    assert application.handlers[0][0].commands == frozenset({"chat"})
+
+
+def test_chat_command_coalesces_rapid_messages(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_EDIT_INTERVAL_SECONDS", "0")
+    monkeypatch.setenv("TELEGRAM_COALESCE_WINDOW_SECONDS", "0.05")
+
+    async def run():
+        reply = telegram_bot.AgentReply(text="merged reply", timings={"total_ms": 1.0, "connect_ms": 0.0}, model_calls=2)
+        transport = SimpleNamespace(chat=AsyncMock(return_value=reply))
+        application = telegram_bot.build_application("123:abc", transport=transport, with_updater=False)
+        context = SimpleNamespace(application=application)
+        first, second = _update("/chat hi"), _update("/chat there")
+        await telegram_bot.chat_command(first, context)
+        await telegram_bot.chat_command(second, context)
+        await asyncio.sleep(0.15)
+        return (
+            transport, first, second,
+            application.bot_data["coalescer"].get_stats(),
+            application.update_processor.get_stats(),
+        )
+
+    transport, first, second, stats, processor_stats = asyncio.run(run())
+    transport.chat.assert_awaited_once()
+    assert transport.chat.await_args.args[:2] == ("hi\nthere", "tg_42")
+    assert transport.chat.await_args.kwargs["user_id"] == "42"
+    first.message.reply_text.assert_not_awaited()
+    second.message.sent.edit_text.assert_awaited_with("merged reply")
+    assert stats["model_calls_per_message"] == 1.0
+    # The batch ran as an update of the processor, not as a free task.
+    assert processor_stats["processed"] == 1
+
+
+def test_coalescing_is_keyed_by_chat(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_EDIT_INTERVAL_SECONDS", "0")
+    monkeypatch.setenv("TELEGRAM_COALESCE_WINDOW_SECONDS", "0.05")
+
+    async def run():
+        reply = telegram_bot.AgentReply(text="ok", timings={"total_ms": 1.0, "connect_ms": 0.0})
+        transport = SimpleNamespace(chat=AsyncMock(return_value=reply))
+        application = telegram_bot.build_application("123:abc", transport=transport, with_updater=False)
+        context = SimpleNamespace(application=application)
+        for text, user in (("/chat a", 1), ("/chat b", 2), ("/chat c", 1)):
+            await telegram_bot.chat_command(_update(text, user_id=user, chat_id=-100), context)
+        await asyncio.sleep(0.15)
+        return transport, application.bot_data["coalescer"].get_stats()
+
+    transport, stats = asyncio.run(run())
+    assert stats["agent_turns"] == 1
+    assert [call.args[:2] for call in transport.chat.await_args_list] == [("a\nc", "tg_1"), ("b", "tg_2")]
+
+
+def test_root_bot_coalesces_by_chat_through_the_processor(monkeypatch):
+    import telegram_bot as root_bot
+
+    monkeypatch.setenv("TELEGRAM_EDIT_INTERVAL_SECONDS", "0")
+    monkeypatch.setenv("TELEGRAM_COALESCE_WINDOW_SECONDS", "0.05")
+
+    async def run():
+        reply = telegram_bot.AgentReply(text="ok", timings={"total_ms": 1.0, "connect_ms": 0.0}, model_calls=1)
+        client = SimpleNamespace(chat=AsyncMock(return_value=reply))
+        app = root_bot.build_app("123:abc", client)
+        context = SimpleNamespace(application=app)
+        for text, user in (("a", 1), ("b", 2), ("c", 1)):
+            await root_bot.handle_message(_update(text, user_id=user, chat_id=-100), context)
+        await asyncio.sleep(0.15)
+        return client, app.bot_data["coalescer"].get_stats(), app.update_processor.get_stats()
+
+    client, stats, processor_stats = asyncio.run(run())
+    assert [call.args[:2] for call in client.chat.await_args_list] == [("a\nc", "tg_1"), ("b", "tg_2")]
+    assert stats["agent_turns"] == 1
+    assert stats["model_calls"] == 2
+    assert processor_stats["processed"] == 1
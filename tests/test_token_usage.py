@@ -0,0 +1,58 @@
+"""Tests for token usage accounting."""
+from types import SimpleNamespace
+
+from my_agent import token_usage
+from my_agent.token_usage import TurnUsage, UsageLedger
+
+
+def _usage(prompt, completion, cached=None):
+    return SimpleNamespace(
+        prompt_token_count=prompt, candidates_token_count=completion, cached_content_token_count=cached
+    )
+
+
+def _event(author, usage, partial=False):
+    return SimpleNamespace(author=author, usage_metadata=usage, partial=partial)
+
+
+def test_record_event_adds_final_events_to_the_current_turn():
+    turn = TurnUsage()
+    token = token_usage.current_turn.set(turn)
+    try:
+        token_usage.record_event(_event("main", _usage(100, 20, 40)))
+        token_usage.record_event(_event("main", _usage(5, 5), partial=True))  # streaming chunk
+        token_usage.record_event(_event("main", None))
+        token_usage.record_event(_event("devops_agent", _usage(30, None)))
+    finally:
+        token_usage.current_turn.reset(token)
+
+    assert (turn.prompt_tokens, turn.completion_tokens, turn.cached_tokens) == (130, 20, 40)
+    assert turn.model_calls == 2
+    assert turn.by_agent["main"].total_tokens == 120
+    assert turn.by_agent["devops_agent"].total_tokens == 30
+
+
+def test_record_event_without_a_turn_is_a_no_op():
+    token_usage.record_event(_event("main", _usage(1, 1)))
+
+
+def test_ledger_aggregates_by_user_and_agent_with_cost():
+    ledger = UsageLedger(input_price=0.10, output_price=0.40)
+    for user, prompt in (("alice", 1000), ("bob", 10), ("alice", 500)):
+        turn = TurnUsage()
+        turn.add_usage("main", _usage(prompt, 100))
+        turn.add_usage("devops_agent", _usage(50, 10))
+        ledger.record_turn(user, turn)
+
+    stats = ledger.get_stats(top_users=1)
+    assert stats["turns"] == 3
+    assert stats["prompt_tokens"] == 1660
+    assert stats["completion_tokens"] == 330
+    assert stats["by_agent"]["devops_agent"]["model_calls"] == 3
+    assert list(stats["top_users"]) == ["alice"]
+    assert stats["users"] == 2
+    assert stats["cost_usd"] == round((1660 * 0.10 + 330 * 0.40) / 1e6, 6)
+
+
+def test_cost_is_omitted_without_prices():
+    assert UsageLedger().get_stats()["cost_usd"] is None
@@ -0,0 +1,78 @@
+"""Tests for per-tool call metrics."""
+import asyncio
+
+import pytest
+from google.adk.tools.function_tool import FunctionTool
+
+from my_agent.agent import agent, ask_devops, get_weather
+from my_agent.devops_agent import devops_agent
+from my_agent.tool_metrics import ToolMetrics, instrument_tool, instrument_tools
+
+
+def test_wrapped_tool_keeps_its_declaration():
+    metrics = ToolMetrics()
+    for func in (get_weather, ask_devops):
+        wrapped = instrument_tool("a", func, metrics)
+        assert wrapped.__name__ == func.__name__
+        assert FunctionTool(wrapped)._get_declaration() == FunctionTool(func)._get_declaration()
+
+
+def test_sync_tool_records_latency_and_result_size():
+    metrics = ToolMetrics()
+    wrapped = instrument_tool("main", get_weather, metrics)
+    result = wrapped(city="London")
+    assert result["status"] == "success"
+    stats = metrics.get_stats()["main"]["get_weather"]
+    assert stats["calls"] == 1
+    assert stats["errors"] == 0
+    assert stats["result_bytes_max"] > 50
+    assert sum(stats["latency_histogram_ms"].values()) == 1
+
+
+def test_async_tool_and_errors():
+    metrics = ToolMetrics()
+
+    async def slow(x: int) -> dict:
+        await asyncio.sleep(0.02)
+        if x < 0:
+            raise ValueError("negative")
+        if x == 0:
+            return {"status": "error", "error_message": "zero"}
+        return {"status": "success", "value": x}
+
+    wrapped = instrument_tool("devops", slow, metrics)
+    assert asyncio.iscoroutinefunction(wrapped)
+    asyncio.run(wrapped(1))
+    asyncio.run(wrapped(0))
+    with pytest.raises(ValueError):
+        asyncio.run(wrapped(-1))
+
+    stats = metrics.get_stats()["devops"]["slow"]
+    assert stats["calls"] == 3
+    assert stats["errors"] == 1
+    assert stats["error_results"] == 1
+    assert stats["last_error"] == "ValueError"
+    assert stats["latency_p50_ms"] >= 15
+    assert stats["latency_histogram_ms"]["le_25"] + stats["latency_histogram_ms"]["le_50"] == 3
+
+
+def test_totals_across_agents_and_ordering():
+    metrics = ToolMetrics()
+    metrics.record("main", "fast", 1.0, result={})
+    metrics.record("main", "slow", 900.0, result={})
+    metrics.record("devops", "fast", 2.0, result={})
+    assert metrics.calls_total == 3
+    assert metrics.calls_by_name() == {"fast": 2, "slow": 1}
+    assert list(metrics.get_stats()["main"]) == ["slow", "fast"]
+    assert metrics.get_stats()["main"]["slow"]["latency_histogram_ms"]["le_1000"] == 1
+
+
+def test_agents_are_instrumented():
+    for llm_agent in (agent, devops_agent):
+        assert llm_agent.tools
+        assert all(hasattr(tool, "__wrapped__") for tool in llm_agent.tools)
+
+
+def test_non_function_tools_pass_through():
+    tool = FunctionTool(get_weather)
+    assert instrument_tools("a", [tool]) == [tool]
@@ -0,0 +1,124 @@
+"""Tests for the in-process span API, exporters and ADK callbacks."""
+import asyncio
+import json
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions.in_memory_session_service import InMemorySessionService
+from google.genai import types
+
+from my_agent import tracing
+from my_agent.agent import get_weather
+from my_agent.fake_llm import FakeLlm
+
+
+def test_spans_nest_across_tasks():
+    async def child():
+        with tracing.span("child", kind="task"):
+            await asyncio.sleep(0)
+
+    async def run():
+        with tracing.span("root", trace_id="trace-nest") as root:
+            await asyncio.gather(child(), child())
+        return root
+
+    root = asyncio.run(run())
+    spans = tracing.tracer.get_trace("trace-nest")
+    assert [s["name"] for s in spans] == ["root", "child", "child"]
+    assert all(s["parent_id"] == root.span_id for s in spans[1:])
+    assert all(s["end_ns"] >= s["start_ns"] for s in spans)
+    assert tracing.current_span.get() is None
+
+
+def test_span_outside_a_trace_records_nothing():
+    started = tracing.tracer.spans_started
+    with tracing.span("orphan") as opened:
+        assert opened is None
+    assert tracing.tracer.spans_started == started
+
+
+def test_error_status_is_recorded():
+    try:
+        with tracing.span("root", trace_id="trace-error"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    (root,) = tracing.tracer.get_trace("trace-error")
+    assert root["status"] == "error"
+    assert root["attributes"]["error"] == "ValueError"
+
+
+def test_batch_exporter_writes_jsonl(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = tracing.BatchExporter(tracing.JsonlSink(str(path)), max_batch=2, interval=60)
+    exporter.submit([{"span_id": str(i)} for i in range(5)])
+    exporter.flush()
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["span_id"] for line in lines] == ["0", "1", "2", "3", "4"]
+    assert exporter.exported == 5
+
+
+def test_root_end_exports_the_whole_trace(monkeypatch):
+    written = []
+
+    class Sink:
+        def write(self, spans):
+            written.extend(spans)
+
+    exporter = tracing.BatchExporter(Sink(), interval=60)
+    monkeypatch.setattr(tracing.tracer, "exporter", exporter)
+    with tracing.span("chat", trace_id="trace-export"):
+        with tracing.span("tool:x"):
+            pass
+    exporter.flush()
+    assert sorted(s["name"] for s in written) == ["chat", "tool:x"]
+
+
+def test_to_otlp():
+    with tracing.span("chat", trace_id="0af7651916cd43dd-8448eb211c80319c", tokens=3):
+        pass
+    payload = tracing.to_otlp(tracing.tracer.get_trace("0af7651916cd43dd-8448eb211c80319c"))
+    (span,) = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert span["traceId"] == "0af7651916cd43dd8448eb211c80319c"
+    assert "parentSpanId" not in span
+    assert span["attributes"] == [{"key": "tokens", "value": {"intValue": "3"}}]
+
+
+def test_agent_callbacks_record_model_and_tool_spans():
+    llm = FakeLlm(
+        model="fake",
+        rules=[{"match": "weather", "call": "get_weather", "args": {"city": "London"}}],
+        first_token_delay=0,
+        token_delay=0,
+    )
+    agent = Agent(name="traced_agent", model=llm, instruction="t", tools=[get_weather], **tracing.AGENT_CALLBACKS)
+
+    async def run():
+        service = InMemorySessionService()
+        await service.create_session(app_name="t", user_id="u", session_id="s")
+        runner = Runner(app_name="t", agent=agent, session_service=service)
+        with tracing.span("chat", trace_id="trace-agent"):
+            async for _ in runner.run_async(
+                user_id="u",
+                session_id="s",
+                new_message=types.Content(role="user", parts=[types.Part(text="weather?")]),
+            ):
+                pass
+
+    asyncio.run(run())
+    spans = tracing.tracer.get_trace("trace-agent")
+    assert [s["name"] for s in spans] == ["chat", "model_call", "tool:get_weather", "model_call"]
+    root = spans[0]["span_id"]
+    assert all(s["parent_id"] == root for s in spans[1:])
+    assert spans[1]["attributes"]["function_calls"] == 1
+    assert "first_token_ms" in spans[1]["attributes"]
+    assert spans[3]["attributes"]["completion_tokens"] > 0
+    assert all(s["end_ns"] is not None for s in spans)
+
+
+def test_render_waterfall():
+    with tracing.span("chat", trace_id="trace-html"):
+        with tracing.span("tool:<x>"):
+            pass
+    page = tracing.render_waterfall("trace-html", tracing.tracer.get_trace("trace-html"))
+    assert "chat" in page and "tool:&lt;x&gt;" in page
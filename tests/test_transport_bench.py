@@ -0,0 +1,25 @@
+"""Tests for the bot transport benchmark."""
+import asyncio
+
+from my_agent import transport_bench
+from my_agent.telegram_bot import AgentReply
+
+
+class FakeTransport:
+    def __init__(self):
+        self.messages = []
+
+    async def chat(self, message, session_id):
+        self.messages.append((message, session_id))
+        await asyncio.sleep(0)
+        return AgentReply(text="ok")
+
+
+def test_measure_reports_percentiles():
+    transport = FakeTransport()
+    report = asyncio.run(transport_bench.measure(transport, requests=20, concurrency=4, warmup=2))
+    assert report["requests"] == 20
+    assert report["concurrency"] == 4
+    assert report["p50_ms"] <= report["p95_ms"] <= report["p99_ms"]
+    assert len(transport.messages) == 22
+    assert {s for _, s in transport.messages[2:]} == {"bench_0", "bench_1", "bench_2", "bench_3"}
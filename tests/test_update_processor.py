@@ -0,0 +1,102 @@
+"""Tests for per-chat ordered concurrent update processing."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from my_agent.telegram_bot import build_application
+from my_agent.update_processor import PerChatUpdateProcessor, stress
+
+
+def _update(chat_id):
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id))
+
+
+def test_same_chat_runs_in_order_and_other_chats_overtake():
+    async def run():
+        processor = PerChatUpdateProcessor(max_workers=4)
+        log = []
+        slow_started = asyncio.Event()
+
+        async def handle(name, delay, event=None):
+            if event:
+                event.set()
+            await asyncio.sleep(delay)
+            log.append(name)
+
+        tasks = [
+            asyncio.create_task(processor.process_update(_update(1), handle("a1", 0.05, slow_started))),
+            asyncio.create_task(processor.process_update(_update(1), handle("a2", 0))),
+            asyncio.create_task(processor.process_update(_update(2), handle("b1", 0))),
+        ]
+        await slow_started.wait()
+        stats = processor.get_stats()
+        await asyncio.gather(*tasks)
+        return log, stats, processor.get_stats()
+
+    log, during, after = asyncio.run(run())
+    assert log == ["b1", "a1", "a2"]
+    assert during["queue_depths"]["1"] == 2
+    assert during["waiting"] == 1
+    assert after["processed"] == 3
+    assert after["queue_depths"] == {}
+    assert after["waiting"] == after["active"] == 0
+
+
+def test_cancelled_update_keeps_chat_order():
+    async def run():
+        processor = PerChatUpdateProcessor(max_workers=2)
+        log = []
+
+        async def handle(name, delay):
+            await asyncio.sleep(delay)
+            log.append(name)
+
+        first = asyncio.create_task(processor.process_update(_update(1), handle("first", 0.05)))
+        second = asyncio.create_task(processor.process_update(_update(1), handle("second", 0)))
+        third = asyncio.create_task(processor.process_update(_update(1), handle("third", 0)))
+        await asyncio.sleep(0.01)
+        second.cancel()
+        await asyncio.gather(first, third, return_exceptions=True)
+        return log, processor.get_stats()
+
+    log, stats = asyncio.run(run())
+    assert log == ["first", "third"]
+    assert stats["waiting"] == 0
+
+
+def test_worker_bound_is_respected():
+    async def run():
+        processor = PerChatUpdateProcessor(max_workers=3)
+        peak = 0
+
+        async def handle():
+            nonlocal peak
+            peak = max(peak, processor.get_stats()["active"])
+            await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(processor.process_update(_update(i), handle()) for i in range(10)))
+        return peak
+
+    assert asyncio.run(run()) == 3
+
+
+def test_invalid_worker_count():
+    with pytest.raises(ValueError):
+        PerChatUpdateProcessor(max_workers=0)
+
+
+def test_stress_throughput_scales_with_workers():
+    """Simulated users: more workers -> more throughput, order preserved."""
+    single = asyncio.run(stress(users=20, messages=3, workers=1, handler_seconds=0.005))
+    pooled = asyncio.run(stress(users=20, messages=3, workers=10, handler_seconds=0.005))
+    assert single["in_order"] and pooled["in_order"]
+    assert pooled["updates_per_second"] > 3 * single["updates_per_second"]
+
+
+def test_bot_application_uses_processor(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_MAX_WORKERS", "5")
+    application = build_application("123:abc", with_updater=False)
+    assert isinstance(application.update_processor, PerChatUpdateProcessor)
+    assert application.update_processor.max_workers == 5
+    assert application.concurrent_updates
@@ -1,8 +1,30 @@
 """Unit tests for the Vertex AI tools."""
+import asyncio
+import threading
+import time
+
 import pytest
 from unittest.mock import MagicMock, patch
+from my_agent import vertex_tools
 from my_agent.vertex_tools import search_knowledge_base
 
+CONFIG = {
+    "GCP_PROJECT_ID": "test-project",
+    "GCP_LOCATION": "europe-west4",
+    "VERTEX_SEARCH_DATA_STORE_ID": "test-store"
+}
+
+
+@pytest.fixture(autouse=True)
+def reset_backends():
+    """Make every test build its own search client and start uncached."""
+    vertex_tools.reset_search_backends()
+    vertex_tools.search_cache.clear()
+    yield
+    vertex_tools.reset_search_backends()
+    vertex_tools.search_cache.clear()
+
+
 class TestVertexTools:
     """Test the Vertex AI tools."""
     
@@ -75,3 +97,186 @@ class TestVertexTools:
         # Verify
         assert result["status"] == "error"
         assert "Search API Error" in result["error_message"]
+
+
+class TestSearchBackendReuse:
+    """Test that the search client is built once per data store."""
+
+    @patch("my_agent.vertex_tools.discoveryengine")
+    @patch("my_agent.vertex_tools.os")
+    def test_client_reused_across_calls(self, mock_os, mock_discoveryengine):
+        """Repeated searches share one client and serving config."""
+        mock_os.getenv.side_effect = lambda key, default=None: CONFIG.get(key, default)
+        mock_client = MagicMock()
+        mock_client.search.return_value = MagicMock(results=[])
+        mock_discoveryengine.SearchServiceClient.return_value = mock_client
+
+        search_knowledge_base("first")
+        search_knowledge_base("second")
+
+        mock_discoveryengine.SearchServiceClient.assert_called_once()
+        mock_client.serving_config_path.assert_called_once()
+        assert mock_client.search.call_count == 2
+
+    @patch("my_agent.vertex_tools.discoveryengine")
+    def test_search_uses_deadline_and_page_size(self, mock_discoveryengine, monkeypatch):
+        """The RPC gets an explicit timeout and the configured page size."""
+        env = dict(CONFIG, VERTEX_SEARCH_PAGE_SIZE="5", VERTEX_SEARCH_TIMEOUT_SECONDS="2.5")
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        mock_client = MagicMock()
+        mock_client.search.return_value = MagicMock(results=[])
+        mock_discoveryengine.SearchServiceClient.return_value = mock_client
+
+        result = search_knowledge_base("query")
+
+        assert result["report"] == "No results found."
+        assert mock_client.search.call_args.kwargs["timeout"] == 2.5
+        _, request_kwargs = mock_discoveryengine.SearchRequest.call_args
+        assert request_kwargs["page_size"] == 5
+
+    @patch("my_agent.vertex_tools.discoveryengine")
+    @patch("my_agent.vertex_tools.os")
+    def test_warm_search_backend(self, mock_os, mock_discoveryengine):
+        """Warm-up builds the client before the first query."""
+        mock_os.getenv.side_effect = lambda key, default=None: CONFIG.get(key, default)
+
+        assert vertex_tools.warm_search_backend() is True
+        search_knowledge_base("query")
+
+        mock_discoveryengine.SearchServiceClient.assert_called_once()
+        assert vertex_tools.get_search_metrics()["client_init_count"] >= 1
+
+    @patch("my_agent.vertex_tools.os")
+    def test_warm_search_backend_unconfigured(self, mock_os):
+        """Warm-up is a no-op without a data store."""
+        mock_os.getenv.return_value = None
+        assert vertex_tools.warm_search_backend() is False
+
+    @patch("my_agent.vertex_tools.discoveryengine")
+    @patch("my_agent.vertex_tools.os")
+    def test_repeated_query_served_from_cache(self, mock_os, mock_discoveryengine):
+        """Equivalent queries hit the RPC once."""
+        mock_os.getenv.side_effect = lambda key, default=None: CONFIG.get(key, default)
+        mock_client = MagicMock()
+        mock_client.search.return_value = MagicMock(results=[])
+        mock_discoveryengine.SearchServiceClient.return_value = mock_client
+
+        search_knowledge_base("How do I deploy?")
+        search_knowledge_base("  how do i   DEPLOY? ")
+
+        assert mock_client.search.call_count == 1
+
+
+    def test_key_rotation_keeps_backends_in_use_open(self, monkeypatch):
+        """Only credentialed backends are dropped, and none is closed."""
+        bm25 = MagicMock(spec=["search", "close"])
+        dense_genai = MagicMock(embedder=MagicMock())
+        dense_genai.embedder.name = "genai"
+        dense_hashing = MagicMock(embedder=MagicMock())
+        dense_hashing.embedder.name = "hashing"
+        monkeypatch.setitem(vertex_tools._backends, ("p", "l", "d"), MagicMock())
+        monkeypatch.setitem(vertex_tools._local_backends, ("local", "bm25"), bm25)
+        monkeypatch.setitem(vertex_tools._local_backends, ("dense", "genai"), dense_genai)
+        monkeypatch.setitem(vertex_tools._local_backends, ("dense", "hashing"), dense_hashing)
+
+        vertex_tools.drop_credentialed_backends()
+
+        assert vertex_tools._backends == {}
+        assert set(vertex_tools._local_backends) == {("local", "bm25"), ("dense", "hashing")}
+        for backend in (bm25, dense_genai, dense_hashing):
+            backend.close.assert_not_called()
+
+
+class FakeBackend:
+    """Backend double that tracks peak concurrency."""
+
+    def __init__(self, hits_by_query):
+        self.hits_by_query = hits_by_query
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def search(self, query, page_size, timeout=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.05)
+        with self.lock:
+            self.active -= 1
+        if query not in self.hits_by_query:
+            raise RuntimeError("backend down")
+        return self.hits_by_query[query]
+
+
+def _hit(name):
+    return {"title": name, "snippet": f"about {name}", "link": f"http://docs/{name}"}
+
+
+class TestSearchKnowledgeBaseMany:
+    """Test the multi-query search tool."""
+
+    def test_reciprocal_rank_fusion_dedupes_by_link(self):
+        """Documents found by several queries rank first and appear once."""
+        merged = vertex_tools.reciprocal_rank_fusion(
+            [[_hit("a"), _hit("b")], [_hit("b"), _hit("c")], [_hit("c"), _hit("b")]]
+        )
+        assert [h["title"] for h in merged] == ["b", "c", "a"]
+
+    def test_runs_queries_concurrently_with_limit(self, monkeypatch):
+        """Queries run in parallel up to the configured limit."""
+        backend = FakeBackend({f"q{i}": [_hit("shared"), _hit(f"doc{i}")] for i in range(6)})
+        monkeypatch.setattr(vertex_tools, "_resolve_backend", lambda: (backend, "fake"))
+        monkeypatch.setenv("KNOWLEDGE_BASE_MAX_PARALLEL", "3")
+
+        start = time.perf_counter()
+        result = asyncio.run(vertex_tools.search_knowledge_base_many([f"q{i}" for i in range(6)]))
+        elapsed = time.perf_counter() - start
+
+        assert result["status"] == "success"
+        assert result["report"].count("Title: shared") == 1
+        assert result["report"].startswith("Title: shared")
+        assert backend.peak == 3
+        assert elapsed < 6 * 0.05
+
+    def test_partial_failure_is_reported(self, monkeypatch):
+        """Failed queries are noted without discarding other results."""
+        backend = FakeBackend({"good": [_hit("a")]})
+        monkeypatch.setattr(vertex_tools, "_resolve_backend", lambda: (backend, "fake"))
+
+        result = asyncio.run(vertex_tools.search_knowledge_base_many(["good", "bad"]))
+
+        assert result["status"] == "success"
+        assert "Title: a" in result["report"]
+        assert "bad: backend down" in result["report"]
+
+    def test_empty_queries(self):
+        """An empty query list is rejected."""
+        result = asyncio.run(vertex_tools.search_knowledge_base_many(["", "  "]))
+        assert result["status"] == "error"
+
+    def test_non_positive_parallel_limit_runs_one_at_a_time(self, monkeypatch):
+        """A limit of 0 or below is treated as 1 rather than hanging."""
+        backend = FakeBackend({"q1": [_hit("a")], "q2": [_hit("b")]})
+        monkeypatch.setattr(vertex_tools, "_resolve_backend", lambda: (backend, "fake"))
+        for value in ("0", "-2"):
+            vertex_tools.search_cache.clear()
+            monkeypatch.setenv("KNOWLEDGE_BASE_MAX_PARALLEL", value)
+            result = asyncio.run(asyncio.wait_for(vertex_tools.search_knowledge_base_many(["q1", "q2"]), 2))
+            assert result["status"] == "success"
+        assert backend.peak == 1
+
+    def test_search_many_backend_embeds_queries_in_one_call(self, monkeypatch):
+        """Backends with search_many get every uncached query in one call."""
+        backend = MagicMock(spec=["search", "search_many"])
+        backend.search_many.side_effect = lambda queries, page_size: [[_hit(q)] for q in queries]
+        monkeypatch.setattr(vertex_tools, "_resolve_backend", lambda: (backend, "dense"))
+
+        first = asyncio.run(vertex_tools.search_knowledge_base_many(["q1", "q2", "q3"]))
+        second = asyncio.run(vertex_tools.search_knowledge_base_many(["q1", "q3"]))
+
+        assert first["report"].count("Title: q") == 3
+        assert "Title: q3" in second["report"]
+        backend.search_many.assert_called_once()
+        assert backend.search_many.call_args.args[0] == ["q1", "q2", "q3"]
+        backend.search.assert_not_called()
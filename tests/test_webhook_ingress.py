@@ -0,0 +1,67 @@
+"""Tests for webhook update dedup and delivery metrics."""
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from telegram import Update, User
+from telegram.ext import ExtBot, TypeHandler
+
+from my_agent.telegram_bot import build_application
+from my_agent.webhook_ingress import IngressQueue, UpdateDeduplicator, WebhookIngress
+
+
+def _update(update_id):
+    return Update.de_json(
+        {"update_id": update_id, "message": {
+            "message_id": update_id, "date": 0, "chat": {"id": 1, "type": "private"}, "text": "hello",
+        }},
+        None,
+    )
+
+
+def test_deduplicator_window_slides():
+    dedup = UpdateDeduplicator(max_ids=2)
+    assert not dedup.seen(1)
+    assert dedup.seen(1)
+    assert not dedup.seen(2)
+    assert not dedup.seen(3)  # evicts 1
+    assert not dedup.seen(1)
+    assert dedup.hits == 1
+
+
+def test_standalone_application_drops_duplicates_on_intake_and_records_latency():
+    async def run():
+        application = build_application("123:abc")
+        handled = []
+
+        async def handler(update, context):
+            handled.append(update.update_id)
+
+        application.add_handler(TypeHandler(Update, handler), group=1)
+        bot_user = User(id=123, first_name="bot", is_bot=True, username="bot")
+        with patch.object(ExtBot, "get_me", AsyncMock(return_value=bot_user)):
+            async with application:
+                # The updater's webhook server and poller put updates here.
+                for update_id in (10, 10, 11):
+                    await application.update_queue.put(_update(update_id))
+                queued = application.update_queue.qsize()
+                await asyncio.sleep(0.02)  # time spent queued counts as latency
+                while not application.update_queue.empty():
+                    await application.process_update(application.update_queue.get_nowait())
+        return queued, handled, application.bot_data["ingress"].get_stats()
+
+    queued, handled, stats = asyncio.run(run())
+    assert queued == 2
+    assert handled == [10, 11]
+    assert stats["received"] == 3
+    assert stats["dedup_hits"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["latency_max_ms"] >= 20
+
+
+def test_in_process_application_relies_on_accept():
+    application = build_application("123:abc", with_updater=False)
+    ingress: WebhookIngress = application.bot_data["ingress"]
+    assert not isinstance(application.update_queue, IngressQueue)
+    assert ingress.accept(_update(5))
+    assert not ingress.accept(_update(5))
+    assert ingress.get_stats()["in_flight"] == 1